@@ -0,0 +1,82 @@
+"""Per-job overhead of the subprocess and in-process upload backends.
+
+Uploads many small files, one job each, to benchmarks/mock_hub.py and reports
+the mean time per job. The in-process backend needs huggingface_hub; the
+subprocess backend uses the real ``hf``/``huggingface-cli`` executable pointed
+at the mock Hub through HF_ENDPOINT and is skipped if neither is on PATH.
+Usage:
+
+    python benchmarks/bench_backends.py [--jobs 100] [--workers 1]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_hub import MockHub  # noqa: E402
+from upload_backends import CliUploadBackend, HubApiUploadBackend  # noqa: E402
+from upload_engine import UploadJob, UploadWorkerPool  # noqa: E402
+
+FAKE_TOKEN = "hf_benchmarkTokenNotReal"
+
+
+def make_files(directory, count):
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"config_{index}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"index": %d}\n' % index)
+        paths.append(path)
+    return paths
+
+
+def run_jobs(backend, paths, workers):
+    failures = []
+    pool = UploadWorkerPool(run_job=backend.run, max_workers=workers,
+                            on_job_finished=lambda job, ok, msg: ok or failures.append(msg))
+    started = time.perf_counter()
+    for job_id, path in enumerate(paths, start=1):
+        pool.submit(UploadJob(id=job_id, repository="bench/small-files", subfolder="configs",
+                              file_paths_display_str=path))
+    pool.wait_until_idle()
+    elapsed = time.perf_counter() - started
+    if failures:
+        print(f"  {len(failures)} job(s) failed, first error:\n  {failures[0]}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir, MockHub() as hub:
+        paths = make_files(tmp_dir, args.jobs)
+        os.environ["HF_ENDPOINT"] = hub.url
+        os.environ["HF_TOKEN"] = FAKE_TOKEN
+        print(f"{args.jobs} single-file jobs, {args.workers} worker(s), mock Hub at {hub.url}")
+
+        backends = [("in-process", lambda: HubApiUploadBackend(endpoint=hub.url, token=FAKE_TOKEN))]
+        cli = shutil.which("hf") or shutil.which("huggingface-cli")
+        if cli:
+            backends.insert(0, ("subprocess", lambda: CliUploadBackend((cli,))))
+        else:
+            print("subprocess: skipped (no hf/huggingface-cli on PATH)")
+
+        for label, factory in backends:
+            backend = factory()
+            commits_before = hub.commits
+            elapsed = run_jobs(backend, paths, args.workers)
+            backend.close()
+            print(f"{label:<11} total={elapsed:7.2f}s per_job={elapsed / args.jobs * 1000:8.1f}ms "
+                  f"commits={hub.commits - commits_before}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Check bandwidth caps against the rate a local mock Hub actually receives.
+
+Uploads a few files to benchmarks/mock_hub.py under different caps and
+prints the cap next to the rate measured by the server from the request
+bodies it read:
+
+* a global cap shared by several parallel in-process jobs,
+* a per-job cap with two in-process jobs running,
+* the global cap through the ``hf``/``huggingface-cli`` subprocess and the
+  throttling proxy (this and the next are skipped if neither is on PATH),
+* a cap raised while subprocess jobs are running (measured in windows
+  before and after the change).
+
+The in-process backend charges a regular file by its base64 size before the
+commit request is sent, so its rate is only meaningful over whole jobs; the
+proxy paces the stream itself. Rates are measured from the first to the last
+byte received, so subprocess start-up is not counted. Needs huggingface_hub.
+Usage:
+
+    python benchmarks/bench_bandwidth.py [--megabytes 2] [--rate 2] [--jobs 3]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_hub import MockHub  # noqa: E402
+from upload_backends import CliUploadBackend, HubApiUploadBackend  # noqa: E402
+from upload_bandwidth import BYTES_PER_MB, BandwidthLimiter, format_rate  # noqa: E402
+from upload_engine import UploadJob, UploadWorkerPool  # noqa: E402
+
+FAKE_TOKEN = "hf_benchmarkTokenNotReal"
+
+
+def make_files(directory, count, megabytes):
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"shard_{index}.bin")
+        with open(path, "wb") as f:
+            f.write(os.urandom(int(megabytes * BYTES_PER_MB)))
+        paths.append(path)
+    return paths
+
+
+def run_jobs(hub, backend, paths, workers, during=None):
+    """Upload ``paths`` one job each; returns (elapsed seconds, time.monotonic() at start)."""
+    failures = []
+    pool = UploadWorkerPool(run_job=backend.run, max_workers=workers,
+                            on_job_finished=lambda job, ok, msg: ok or failures.append(msg))
+    started = time.monotonic()
+    for job_id, path in enumerate(paths, start=1):
+        pool.submit(UploadJob(id=job_id, repository="bench/bandwidth", subfolder="shards",
+                              file_paths_display_str=path))
+    if during:
+        threading.Thread(target=during, daemon=True).start()
+    pool.wait_until_idle()
+    if failures:
+        print(f"  {len(failures)} job(s) failed, first error:\n  {failures[0]}")
+    return time.monotonic() - started, started
+
+
+def report(label, cap, hub, since=None, until=None):
+    measured = hub.received_rate(since=since, until=until)
+    print(f"{label:<38} cap={format_rate(cap):<12} received={measured / BYTES_PER_MB:6.2f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megabytes", type=float, default=2.0, help="size of each file")
+    parser.add_argument("--rate", type=float, default=2.0, help="cap in MB/s")
+    parser.add_argument("--jobs", type=int, default=3)
+    args = parser.parse_args()
+    cap = int(args.rate * BYTES_PER_MB)
+
+    with tempfile.TemporaryDirectory() as tmp_dir, MockHub() as hub:
+        paths = make_files(tmp_dir, args.jobs, args.megabytes)
+        os.environ["HF_ENDPOINT"] = hub.url
+        os.environ["HF_TOKEN"] = FAKE_TOKEN
+        print(f"{args.jobs} x {args.megabytes:g} MB files, mock Hub at {hub.url}")
+
+        limiter = BandwidthLimiter(global_limit=cap)
+        backend = HubApiUploadBackend(endpoint=hub.url, token=FAKE_TOKEN, limiter=limiter)
+        hub.receive_log.clear()
+        run_jobs(hub, backend, paths, args.jobs)
+        report(f"in-process, global, {args.jobs} workers", cap, hub)
+
+        backend.limiter = BandwidthLimiter(per_job_limit=cap // 2)
+        hub.receive_log.clear()
+        run_jobs(hub, backend, paths[:2], 2)
+        report("in-process, cap/2 per job, 2 workers", cap, hub)
+        backend.close()
+
+        cli = shutil.which("hf") or shutil.which("huggingface-cli")
+        if not cli:
+            print("subprocess: skipped (no hf/huggingface-cli on PATH)")
+            return
+        cli_backend = CliUploadBackend((cli,), limiter=limiter)
+        hub.receive_log.clear()
+        run_jobs(hub, cli_backend, paths, args.jobs)
+        report(f"subprocess via proxy, {args.jobs} workers", cap, hub)
+
+        limiter.set_global_limit(cap // 2)
+        switch_after = 3.0
+        raise_cap = lambda: (time.sleep(switch_after), limiter.set_global_limit(cap * 2))  # noqa: E731
+        hub.receive_log.clear()
+        _elapsed, started = run_jobs(hub, cli_backend, paths, args.jobs, during=raise_cap)
+        report("subprocess, before live change", cap // 2, hub, started + 1.5, started + switch_after)
+        report("subprocess, after live change", cap * 2, hub, started + switch_after + 0.2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""How fast cancel and pause take effect on running subprocess uploads.
+
+Runs --rounds rounds of: start two slow uploads through ``CliUploadBackend``
+and benchmarks/fake_hf_cli.py (each takes --latency seconds) on a pool with
+one worker, wait until the first is running, then cancel it (or pause it).
+Reports, per action:
+
+* slot: time until the second job starts on the freed worker;
+* stopped: time until the first job's worker has returned (the CLI
+  process has exited and ``on_job_finished``/``on_job_paused`` fired).
+
+Every paused job is then resumed and must run to completion. Both times
+should stay well under a second.
+
+Usage:
+
+    python benchmarks/bench_cancel.py [--rounds 10] [--latency 30]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_backends import CliUploadBackend  # noqa: E402
+from upload_engine import JOB_CANCELLED, JOB_SUCCEEDED, UploadJob, UploadWorkerPool  # noqa: E402
+
+FAKE_CLI = (sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_hf_cli.py"))
+
+
+class Timeline:
+    """Records when each job id hits each event, and lets the caller wait for one."""
+
+    def __init__(self):
+        self.times = {}
+        self._condition = threading.Condition()
+
+    def mark(self, event, job):
+        with self._condition:
+            self.times[(event, job.id)] = time.perf_counter()
+            self._condition.notify_all()
+
+    def wait(self, event, job_id, timeout=60):
+        with self._condition:
+            if not self._condition.wait_for(lambda: (event, job_id) in self.times, timeout):
+                raise TimeoutError(f"job {job_id} never reached {event!r}")
+            return self.times[(event, job_id)]
+
+
+def run_round(pool, timeline, action, first_id, path):
+    first, second = (UploadJob(id=job_id, repository="bench/model", subfolder="",
+                               file_paths_display_str=path) for job_id in (first_id, first_id + 1))
+    pool.submit(first)
+    pool.submit(second)
+    timeline.wait("started", first.id)
+    time.sleep(0.3)  # let the CLI get going
+    requested = time.perf_counter()
+    if action == "cancel":
+        pool.cancel([first.id])
+        stopped = timeline.wait("finished", first.id)
+        assert first.status == JOB_CANCELLED, first.status
+    else:
+        pool.pause([first.id])
+        stopped = timeline.wait("paused", first.id)
+    slot = timeline.wait("started", second.id)
+    pool.cancel([second.id])
+    timeline.wait("finished", second.id)
+    return slot - requested, stopped - requested, first
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=30, help="seconds each fake upload takes")
+    args = parser.parse_args()
+
+    timeline = Timeline()
+    backend = CliUploadBackend(FAKE_CLI)
+    pool = UploadWorkerPool(run_job=backend.run, max_workers=1,
+                            on_job_started=lambda job: timeline.mark("started", job),
+                            on_job_paused=lambda job, message: timeline.mark("paused", job),
+                            on_job_finished=lambda job, success, message: timeline.mark("finished", job))
+    path = os.path.abspath(__file__)
+    os.environ["FAKE_HF_LATENCY"] = str(args.latency)
+    os.environ["FAKE_HF_STEPS"] = str(max(1, int(args.latency * 10)))
+    paused = []
+    job_id = 1
+    for action in ("cancel", "pause"):
+        slots, stops = [], []
+        for _ in range(args.rounds):
+            slot, stopped, first = run_round(pool, timeline, action, job_id, path)
+            slots.append(slot)
+            stops.append(stopped)
+            if action == "pause":
+                paused.append(first)
+            job_id += 2
+        print(f"{action:<7} slot: median {statistics.median(slots) * 1000:6.1f}ms max {max(slots) * 1000:6.1f}ms   "
+              f"stopped: median {statistics.median(stops) * 1000:6.1f}ms max {max(stops) * 1000:6.1f}ms")
+
+    os.environ["FAKE_HF_LATENCY"] = "0.2"
+    started = time.perf_counter()
+    pool.resume([job.id for job in paused])
+    pool.wait_until_idle()
+    resumed_ok = sum(job.status == JOB_SUCCEEDED for job in paused)
+    print(f"resumed {len(paused)} paused job(s): {resumed_ok} succeeded in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
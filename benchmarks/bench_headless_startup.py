@@ -0,0 +1,62 @@
+"""Cold-start time of the headless runner.
+
+Spawns ``python -m upload_headless`` with an empty manifest --runs times (in a
+scratch directory so the saved queue and caches start empty) and reports the
+mean wall time, the import time of upload_headless alone, and whether any GUI
+or optional heavy modules were imported. Usage:
+
+    python benchmarks/bench_headless_startup.py [--runs 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UNWANTED_MODULES = ("tkinter", "tkinterdnd2", "huggingface_hub")
+
+IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import upload_headless
+elapsed = time.perf_counter() - started
+print(json.dumps({{"import_seconds": elapsed,
+                  "loaded": [m for m in {UNWANTED_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=REPO_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, "-m", "upload_headless", "-"], input=b"", cwd=tmp_dir, env=env,
+                           stdout=subprocess.DEVNULL, check=False)
+            timings.append(time.perf_counter() - started)
+
+        baseline = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, "-c", "pass"], cwd=tmp_dir, check=True)
+            baseline.append(time.perf_counter() - started)
+
+        probe = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=tmp_dir, env=env,
+                               capture_output=True, text=True, check=True)
+        probe_result = json.loads(probe.stdout)
+
+    print(f"bare interpreter      {sum(baseline) / len(baseline) * 1000:7.1f} ms")
+    print(f"headless empty run    {sum(timings) / len(timings) * 1000:7.1f} ms (mean of {args.runs})")
+    print(f"import upload_headless {probe_result['import_seconds'] * 1000:6.1f} ms")
+    print(f"unwanted modules loaded: {probe_result['loaded'] or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
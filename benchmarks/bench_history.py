@@ -0,0 +1,91 @@
+"""Job history recording and repository autocomplete over a long history.
+
+Records --records finished jobs spread over --repos repositories (a few
+used far more often than the rest) into a fresh ``UploadHistory`` and
+reports:
+
+* the caller's cost per ``record`` (what a worker or UI thread pays) and the
+  time until the writer thread has them all on disk;
+* reopening the store (what app start-up pays for the repository index);
+* ``suggest`` latency for an empty prefix, one letter, a user name and a
+  full repository name, and the top suggestions for one prefix;
+* ``events`` for one repository, through the repository/time index.
+
+Usage:
+
+    python benchmarks/bench_history.py [--records 100000] [--repos 5000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_engine import JOB_FAILED, JOB_SUCCEEDED  # noqa: E402
+from upload_history import JobEvent, UploadHistory  # noqa: E402
+
+USERS = ["alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi"]
+
+
+def make_events(records, repos, seed):
+    rng = random.Random(seed)
+    names = [f"{USERS[index % len(USERS)]}/model-{index}" for index in range(repos)]
+    weights = [1.0 / (rank + 1) for rank in range(repos)]  # Zipf-like: a few repositories get most jobs
+    start = time.time() - 180 * 24 * 3600
+    for job_id in range(1, records + 1):
+        repository = rng.choices(names, weights)[0]
+        duration = rng.uniform(1, 600)
+        total_bytes = rng.randint(1, 10 ** 9)
+        yield JobEvent(recorded_at=start + job_id * 150, job_id=job_id, parent_id=None, repository=repository,
+                       subfolder="ckpt", paths=f"out/step_{job_id}", files=rng.randint(1, 500),
+                       total_bytes=total_bytes, bytes_sent=total_bytes, duration=duration,
+                       bytes_per_second=total_bytes / duration, retries=rng.randint(0, 2),
+                       outcome=JOB_SUCCEEDED if rng.random() < 0.9 else JOB_FAILED,
+                       message=f"Job ID:{job_id} Upload successful.")
+
+
+def timed(function, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--repos", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "history.sqlite3")
+        history = UploadHistory(db_path, legacy_file=None)
+        events = list(make_events(args.records, args.repos, args.seed))
+        started = time.perf_counter()
+        for event in events:
+            history.record(event)
+        recorded = time.perf_counter() - started
+        history.flush()
+        written = time.perf_counter() - started
+        print(f"record: {recorded / len(events) * 1e6:.1f}us per event on the caller, "
+              f"all {len(events)} written after {written:.2f}s")
+        history.close()
+
+        history, elapsed = timed(lambda: UploadHistory(db_path, legacy_file=None))
+        print(f"reopen with {len(history.suggest(limit=args.repos))} repositories: {elapsed * 1000:.1f}ms")
+        for prefix in ("", "a", "carol/", "carol/model-2"):
+            suggestions, elapsed = timed(lambda: history.suggest(prefix), repeat=200)
+            print(f"suggest({prefix!r:<16}) {elapsed * 1e6:8.1f}us  {len(suggestions)} result(s)")
+        print("top for 'b':", ", ".join(history.suggest("b", limit=5)))
+        repository = history.suggest(limit=1)[0]
+        rows, elapsed = timed(lambda: history.events(repository=repository, limit=1000), repeat=20)
+        print(f"events({repository!r}, limit=1000): {elapsed * 1000:.2f}ms, {len(rows)} row(s)")
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
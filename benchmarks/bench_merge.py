@@ -0,0 +1,101 @@
+"""Commits and wall time when small queued jobs are merged into one commit.
+
+Queues --jobs single-file jobs (small config/tokenizer-sized files spread
+over --repos repositories) on a worker pool uploading to
+benchmarks/mock_hub.py, once per --merge limit (1 = every job is its own
+commit, as before merging). Reports wall time, commits received by the mock
+Hub and that every file arrived. The mock Hub adds --latency seconds to
+each request to stand in for the Hub's commit latency.
+
+The in-process backend needs huggingface_hub; the subprocess backend uses
+the real ``huggingface-cli`` executable pointed at the mock Hub through
+HF_ENDPOINT and is skipped if it is not on PATH (the newer ``hf`` command
+takes ``--include`` once per pattern, unlike the CLI the backend drives).
+Usage:
+
+    python benchmarks/bench_merge.py [--jobs 200] [--repos 2] [--workers 2] [--merge 1 10 50]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_hub import MockHub  # noqa: E402
+from upload_backends import CliUploadBackend, HubApiUploadBackend  # noqa: E402
+from upload_engine import UploadJob, UploadWorkerPool  # noqa: E402
+from upload_merge import MERGE_MAX_BYTES, CommitMerger  # noqa: E402
+
+FAKE_TOKEN = "hf_benchmarkTokenNotReal"
+
+
+def make_files(directory, count):
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"tokenizer_{index}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"index": %d, "vocab": "%s"}\n' % (index, "x" * (index % 2000)))
+        paths.append(path)
+    return paths
+
+
+def run_jobs(backend, paths, repos, workers, merge_jobs):
+    failures = []
+    finished = []
+    pool = UploadWorkerPool(run_job=backend.run, max_workers=workers,
+                            merger=CommitMerger(merge_jobs, MERGE_MAX_BYTES),
+                            run_merged=backend.run_merged, merge_key=backend.merge_key,
+                            on_job_finished=lambda job, ok, msg: finished.append(job.id) if ok
+                            else failures.append(msg))
+    started = time.perf_counter()
+    for job_id, path in enumerate(paths, start=1):
+        pool.submit(UploadJob(id=job_id, repository=f"bench/model-{job_id % repos}", subfolder="tokenizer",
+                              file_paths_display_str=path, total_bytes=os.path.getsize(path)))
+    pool.wait_until_idle()
+    elapsed = time.perf_counter() - started
+    if failures:
+        print(f"  {len(failures)} job(s) failed, first error:\n  {failures[0]}")
+    return elapsed, len(finished)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--repos", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock Hub seconds per request")
+    parser.add_argument("--merge", type=int, nargs="+", default=[1, 10, 50], help="max jobs per commit")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir, MockHub(latency=args.latency) as hub:
+        paths = make_files(tmp_dir, args.jobs)
+        os.environ["HF_ENDPOINT"] = hub.url
+        os.environ["HF_TOKEN"] = FAKE_TOKEN
+        print(f"{args.jobs} single-file jobs over {args.repos} repo(s), {args.workers} worker(s), "
+              f"mock Hub at {hub.url} with {args.latency * 1000:.0f} ms per request")
+
+        backends = [("in-process", lambda: HubApiUploadBackend(endpoint=hub.url, token=FAKE_TOKEN))]
+        cli = shutil.which("huggingface-cli")
+        if cli:
+            backends.insert(0, ("subprocess", lambda: CliUploadBackend((cli,))))
+        else:
+            print("subprocess: skipped (no huggingface-cli on PATH)")
+
+        for label, factory in backends:
+            for merge_jobs in args.merge:
+                backend = factory()
+                commits_before = hub.commits
+                paths_before = len(hub.committed_paths)
+                elapsed, succeeded = run_jobs(backend, paths, args.repos, args.workers, merge_jobs)
+                backend.close()
+                files = len(hub.committed_paths) - paths_before
+                print(f"{label:<11} merge<={merge_jobs:<4} total={elapsed:7.2f}s "
+                      f"commits={hub.commits - commits_before:<5} files={files:<5} succeeded={succeeded}")
+
+
+if __name__ == "__main__":
+    main()
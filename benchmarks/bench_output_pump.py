@@ -0,0 +1,81 @@
+"""Stress the CLI backend's output handling with a very chatty subprocess.
+
+The fake CLI writes FAKE_HF_STDOUT_BYTES to stdout and then
+FAKE_HF_STDERR_BYTES to stderr before exiting. Reading one pipe to EOF before
+the other deadlocks on this once the OS pipe buffer fills; the output pump
+must finish, keep its captured log bounded, and collapse the flood of
+callbacks into a handful of UI updates. Usage:
+
+    python benchmarks/bench_output_pump.py [--megabytes 32] [--ui-rate 10]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_backends import CliUploadBackend  # noqa: E402
+from upload_engine import CoalescingEventQueue, UploadJob  # noqa: E402
+
+FAKE_CLI = (sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_hf_cli.py"))
+TIMEOUT_SECONDS = 120
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megabytes", type=int, default=32, help="bytes written to each stream")
+    parser.add_argument("--ui-rate", type=int, default=10, help="UI drains per second")
+    args = parser.parse_args()
+
+    flood_bytes = args.megabytes * 1024 * 1024
+    os.environ.update(FAKE_HF_STDOUT_BYTES=str(flood_bytes), FAKE_HF_STDERR_BYTES=str(flood_bytes),
+                      FAKE_HF_LATENCY="0.2", FAKE_HF_STEPS="100")
+
+    events = CoalescingEventQueue()
+    counts = {"callbacks": 0, "ui_updates": 0}
+    finished = threading.Event()
+    result = {}
+
+    def count(*_args):
+        counts["ui_updates"] += 1
+
+    def on_status(message):
+        counts["callbacks"] += 1
+        events.post(count, key="status")
+
+    def on_progress(percentage):
+        counts["callbacks"] += 1
+        events.post(count, key="progress")
+
+    def worker():
+        job = UploadJob(id=1, repository="bench/chatty", subfolder="", file_paths_display_str="model.bin")
+        result["outcome"] = CliUploadBackend(FAKE_CLI).run(job, on_status, on_progress)
+        finished.set()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    threading.Thread(target=worker, daemon=True).start()
+    while not finished.wait(1 / args.ui_rate):
+        for callback, callback_args in events.drain():
+            callback(*callback_args)
+        if time.perf_counter() - started > TIMEOUT_SECONDS:
+            print(f"FAIL: no completion after {TIMEOUT_SECONDS}s (deadlock?)")
+            sys.exit(1)
+    for callback, callback_args in events.drain():
+        callback(*callback_args)
+    elapsed = time.perf_counter() - started
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    success, message = result["outcome"]
+    print(f"{args.megabytes} MiB on each of stdout/stderr: success={success} wall={elapsed:.2f}s")
+    print(f"peak traced memory={peak / 1024 / 1024:.1f} MiB "
+          f"({2 * args.megabytes} MiB of output), message length={len(message)}")
+    print(f"backend callbacks={counts['callbacks']} -> UI updates={counts['ui_updates']}")
+
+
+if __name__ == "__main__":
+    main()
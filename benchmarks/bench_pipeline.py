@@ -0,0 +1,375 @@
+"""End-to-end benchmark of the upload pipeline against the stub CLI and the mock Hub.
+
+Queues workloads through ``UploadManager``, the pipeline behind
+HuggingFaceUploaderApp and upload_headless (pre-flight checks, folder
+planning, the upload cache, the queue store, the worker pool, merging,
+retries, metrics and history), wired to the UI the way the app does it:
+every callback is posted to a ``CoalescingEventQueue`` that a stand-in UI
+thread drains UI_UPDATES_PER_SECOND times a second, reading the queue as the
+app's handlers do.
+
+Workloads (--workload, all by default):
+
+* small: --small-files files of 1-8 KiB, one job each (config/tokenizer drops);
+* huge: --huge-files files of --huge-mb MiB, one job each;
+* mixed: both, interleaved, plus a folder of --folder-files small files that
+  is split into parts.
+
+Backends (--backend, all available by default):
+
+* null: succeeds at once without uploading, so the run measures the pipeline
+  alone;
+* cli: ``CliUploadBackend`` running benchmarks/fake_hf_cli.py, which takes
+  --latency seconds per job plus the job's bytes at --bandwidth and fails
+  --fail-rate of the attempts with a retryable 429;
+* hub: ``HubApiUploadBackend`` against benchmarks/mock_hub.py, which adds
+  --latency to every request, receives at --bandwidth over one shared link
+  and answers --fail-rate of the commits with a 503. Needs huggingface_hub.
+
+For every run it reports wall time, MB/s and jobs/s; the caller's time in
+``enqueue`` per job; per-job overhead (the time between a job's start and
+finish not spent inside the backend call: cache checks, scheduling, store
+writes and callbacks); retries and failures; UI events posted by the
+workers against callbacks actually run on the UI thread, the number of
+drains and the UI thread's busy time; and memory (RSS growth, and the
+traced peak with --tracemalloc).
+
+--profile PATH writes cProfile stats of all threads (upload_profiling) for
+``python -m pstats``/snakeviz and prints the top --profile-top functions;
+--tracemalloc also prints the top allocation sites after each run.
+
+Usage:
+
+    python benchmarks/bench_pipeline.py [--workload small huge mixed] [--backend null cli hub]
+        [--latency 0.05] [--bandwidth 50] [--fail-rate 0.1] [--workers 4]
+        [--profile pipeline.pstats] [--tracemalloc]
+"""
+import argparse
+import importlib.util
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_hub import MockHub  # noqa: E402
+from upload_backends import UploadBackend, CliUploadBackend, HubApiUploadBackend  # noqa: E402
+from upload_bandwidth import BYTES_PER_MB  # noqa: E402
+from upload_engine import CoalescingEventQueue  # noqa: E402
+from upload_manager import UploadManager, quote_paths  # noqa: E402
+from upload_profiling import MemoryTracker, ThreadProfiler, current_rss  # noqa: E402
+from upload_retry import RetryPolicy  # noqa: E402
+
+FAKE_CLI = (sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_hf_cli.py"))
+FAKE_TOKEN = "hf_benchmarkTokenNotReal"
+UI_UPDATES_PER_SECOND = 10  # as in huggingface_upload_tool.py, which can't be imported without a display
+WORKLOADS = ("small", "huge", "mixed")
+BACKENDS = ("null", "cli", "hub")
+REPOSITORIES = ("bench/model", "bench/dataset")
+
+
+class NullBackend(UploadBackend):
+    """Reports every job as uploaded straight away."""
+
+    name = "null"
+
+    def run(self, job, on_status, on_progress):
+        on_progress(100)
+        return True, f"Job ID:{job.id} Upload successful."
+
+    def merge_key(self, job):
+        return job.repository
+
+    def run_merged(self, jobs, on_status, on_progress):
+        return [self.run(job, lambda message, job=job: on_status(job, message),
+                         lambda percentage, job=job: on_progress(job, percentage)) for job in jobs]
+
+
+class TimedBackend(UploadBackend):
+    """Wraps a backend and records how long the latest call for each job took."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+        self.seconds = {}  # job id -> seconds inside the backend, last attempt
+
+    def run(self, job, on_status, on_progress):
+        started = time.perf_counter()
+        try:
+            return self.backend.run(job, on_status, on_progress)
+        finally:
+            self.seconds[job.id] = time.perf_counter() - started
+
+    def merge_key(self, job):
+        return self.backend.merge_key(job)
+
+    def run_merged(self, jobs, on_status, on_progress):
+        started = time.perf_counter()
+        try:
+            return self.backend.run_merged(jobs, on_status, on_progress)
+        finally:
+            elapsed = time.perf_counter() - started
+            for job in jobs:
+                self.seconds[job.id] = elapsed
+
+    def close(self):
+        self.backend.close()
+
+
+class UiThread:
+    """Drains the app's event queue like the Tk loop and counts what it runs."""
+
+    def __init__(self, manager, events):
+        self.manager = manager
+        self.events = events
+        self.posted = {}
+        self.run = {}
+        self.drains = 0
+        self.busy = 0.0
+        self.started = {}  # job id -> perf_counter() of its last start (worker side)
+        self.finished = {}
+        self.retries = 0
+        self.failures = []
+        self._count_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="ui", daemon=True)
+
+    # Worker side: the same posts as HuggingFaceUploaderApp's callbacks.
+    def post(self, kind, *args, key=None):
+        with self._count_lock:
+            self.posted[kind] = self.posted.get(kind, 0) + 1
+        self.events.post(self._handle, kind, *args, key=key)
+
+    def on_job_started(self, job):
+        self.started[job.id] = time.perf_counter()
+        self.post("started", job)
+
+    def on_job_finished(self, job, success, message):
+        self.finished[job.id] = time.perf_counter()
+        if not success and job.parent_id is None:
+            self.failures.append(message)
+        self.post("finished", job)
+
+    def on_job_retry(self, job, delay, message):
+        with self._count_lock:
+            self.retries += 1
+        self.post("retry", job)
+
+    def callbacks(self):
+        return dict(on_job_queued=lambda job: self.post("queue", key="queue"),
+                    on_job_started=self.on_job_started,
+                    on_job_status=lambda job, message: self.post("status", key="status"),
+                    on_job_progress=lambda job, percentage: self.post("progress", key="progress"),
+                    on_job_finished=self.on_job_finished,
+                    on_job_retry=self.on_job_retry)
+
+    # UI side
+    def _handle(self, kind, *_args):
+        self.run[kind] = self.run.get(kind, 0) + 1
+        pool = self.manager.pool
+        if kind == "progress":
+            running = pool.running_jobs()
+            sum(job.progress for job in running)
+        elif kind != "status":
+            pool.running_jobs(), self.manager.planning_jobs(), pool.pending_jobs(), self.manager.paused_jobs()
+
+    def _loop(self):
+        while not self._stop.wait(1 / UI_UPDATES_PER_SECOND):
+            self.drain()
+        self.drain()
+
+    def drain(self):
+        started = time.perf_counter()
+        events = self.events.drain()
+        for callback, args in events:
+            callback(*args)
+        if events:
+            self.drains += 1
+            self.busy += time.perf_counter() - started
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def make_workload(root, name, args, rng):
+    """A list of ``(repository, subfolder, paths)`` jobs, creating their files under ``root``."""
+    os.makedirs(root)
+    jobs = []
+
+    def small_file(index):
+        path = os.path.join(root, f"config_{index}.json")
+        with open(path, "wb") as f:
+            f.write(os.urandom(rng.randint(1024, 8192)))
+        return path
+
+    def huge_file(index):
+        path = os.path.join(root, f"shard_{index}.safetensors")
+        chunk = os.urandom(BYTES_PER_MB)
+        with open(path, "wb") as f:
+            for _ in range(args.huge_mb):
+                f.write(chunk)
+        return path
+
+    if name in ("small", "mixed"):
+        jobs += [(REPOSITORIES[index % 2], "configs", [small_file(index)]) for index in range(args.small_files)]
+    if name in ("huge", "mixed"):
+        huge = [(REPOSITORIES[index % 2], "weights", [huge_file(index)]) for index in range(args.huge_files)]
+        for position, job in enumerate(huge):
+            jobs.insert(position * len(jobs) // len(huge), job)
+    if name == "mixed":
+        folder = os.path.join(root, "run")
+        os.makedirs(folder)
+        for index in range(args.folder_files):
+            with open(os.path.join(folder, f"step_{index}.json"), "wb") as f:
+                f.write(os.urandom(rng.randint(256, 4096)))
+        jobs.insert(len(jobs) // 2, (REPOSITORIES[0], "runs", [folder]))
+    return jobs
+
+
+def total_size(jobs):
+    size = 0
+    for _repository, _subfolder, paths in jobs:
+        for path in paths:
+            if os.path.isdir(path):
+                size += sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+            else:
+                size += os.path.getsize(path)
+    return size
+
+
+def make_backend(name, args, hub):
+    if name == "null":
+        return NullBackend()
+    if name == "cli":
+        os.environ.update(FAKE_HF_LATENCY=str(args.latency), FAKE_HF_STEPS=str(args.steps),
+                          FAKE_HF_BANDWIDTH=str(args.bandwidth * BYTES_PER_MB),
+                          FAKE_HF_FAIL_RATE=str(args.fail_rate),
+                          FAKE_HF_ERROR="429 Client Error: Too Many Requests")
+        return CliUploadBackend(FAKE_CLI)
+    hub.latency = args.latency
+    hub.bandwidth = args.bandwidth * BYTES_PER_MB
+    hub.fail_rate = args.fail_rate
+    return HubApiUploadBackend(endpoint=hub.url, token=FAKE_TOKEN)
+
+
+def run_pipeline(backend, jobs, args, tmp_dir):
+    """Queue ``jobs`` on a fresh UploadManager using ``backend``; returns the UI thread and timings."""
+    events = CoalescingEventQueue()
+    ui = None
+    callbacks = {}
+
+    def forward(name):
+        return lambda *callback_args: callbacks[name](*callback_args)
+
+    manager = UploadManager(max_workers=args.workers, queue_db_path=os.path.join(tmp_dir, "queue.sqlite3"),
+                            hash_cache_path=os.path.join(tmp_dir, "cache.sqlite3"),
+                            sync_manifest_path=os.path.join(tmp_dir, "sync.sqlite3"),
+                            history_db_path=os.path.join(tmp_dir, "history.sqlite3"), legacy_history_file=None,
+                            merge_max_jobs=args.merge_jobs,
+                            **{name: forward(name) for name in ("on_job_queued", "on_job_started", "on_job_status",
+                                                                "on_job_progress", "on_job_finished",
+                                                                "on_job_retry")})
+    ui = UiThread(manager, events)
+    callbacks.update(ui.callbacks())
+    timed = TimedBackend(backend)
+    manager.backends[timed.name] = timed
+    manager.set_backend(timed.name)
+    manager.pool.retry_policy = RetryPolicy(max_retries=args.max_retries, base_delay=0.05, max_delay=0.5)
+
+    ui.start()
+    started = time.perf_counter()
+    enqueue_seconds = 0.0
+    for repository, subfolder, paths in jobs:
+        enqueue_started = time.perf_counter()
+        manager.enqueue(repository, subfolder, quote_paths(paths))
+        enqueue_seconds += time.perf_counter() - enqueue_started
+    manager.wait_until_idle()
+    wall = time.perf_counter() - started
+    ui.stop()
+    manager.close()
+    overheads = [ui.finished[job_id] - ui.started[job_id] - seconds for job_id, seconds in timed.seconds.items()
+                 if job_id in ui.started and job_id in ui.finished]
+    return ui, wall, enqueue_seconds, overheads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workload", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--backend", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--small-files", type=int, default=300)
+    parser.add_argument("--huge-files", type=int, default=4)
+    parser.add_argument("--huge-mb", type=int, default=32)
+    parser.add_argument("--folder-files", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--merge-jobs", type=int, default=50, help="max jobs per commit (1 = no merging)")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="seconds per CLI job / per mock Hub request")
+    parser.add_argument("--bandwidth", type=float, default=0, help="MB/s the uploads get (0 = unlimited)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of attempts that fail and are retried")
+    parser.add_argument("--max-retries", type=int, default=10)
+    parser.add_argument("--steps", type=int, default=20, help="progress lines printed by the stub CLI per job")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--profile", default="", help="write cProfile stats of every thread to this file")
+    parser.add_argument("--profile-top", type=int, default=25, help="functions to print with --profile")
+    parser.add_argument("--tracemalloc", action="store_true", help="trace Python allocations (slow)")
+    args = parser.parse_args()
+
+    backends = list(args.backend)
+    if "hub" in backends and importlib.util.find_spec("huggingface_hub") is None:
+        print("hub: skipped (huggingface_hub is not installed)")
+        backends.remove("hub")
+
+    profiler = ThreadProfiler().start() if args.profile else None
+    memory = MemoryTracker().start() if args.tracemalloc else None
+    rng = random.Random(args.seed)
+    print(f"{'workload':<8} {'backend':<5} {'jobs':>5} {'MB':>8} {'wall s':>8} {'MB/s':>8} {'jobs/s':>8} "
+          f"{'enqueue':>9} {'overhead':>9} {'retries':>7} {'failed':>6} {'posted':>7} {'ui run':>7} "
+          f"{'drains':>6} {'ui busy':>8} {'rss +MB':>8}" + (f" {'traced':>8}" if memory else ""))
+    with tempfile.TemporaryDirectory() as tmp_dir, MockHub() as hub:
+        os.environ["HF_TOKEN"] = FAKE_TOKEN
+        for workload in args.workload:
+            jobs = make_workload(os.path.join(tmp_dir, workload), workload, args, rng)
+            size = total_size(jobs)
+            for backend_name in backends:
+                run_dir = tempfile.mkdtemp(dir=tmp_dir)
+                backend = make_backend(backend_name, args, hub)
+                rss_before = current_rss()
+                if memory:
+                    memory.reset_peak()
+                ui, wall, enqueue_seconds, overheads = run_pipeline(backend, jobs, args, run_dir)
+                rss_after = current_rss()
+                overhead = statistics.mean(overheads) if overheads else 0.0
+                line = (f"{workload:<8} {backend_name:<5} {len(jobs):>5} {size / BYTES_PER_MB:>8.1f} {wall:>8.2f} "
+                        f"{size / BYTES_PER_MB / wall:>8.2f} {len(jobs) / wall:>8.1f} "
+                        f"{enqueue_seconds / len(jobs) * 1e6:>7.0f}us {overhead * 1000:>7.2f}ms "
+                        f"{ui.retries:>7} {len(ui.failures):>6} {sum(ui.posted.values()):>7} "
+                        f"{sum(ui.run.values()):>7} {ui.drains:>6} {ui.busy * 1000:>6.0f}ms "
+                        f"{((rss_after or 0) - (rss_before or 0)) / BYTES_PER_MB:>8.1f}")
+                if memory:
+                    line += f" {memory.peak()[1] / BYTES_PER_MB:>6.1f}MB"
+                print(line)
+                if ui.failures:
+                    print(f"  first failure: {ui.failures[0].splitlines()[0]}")
+                if memory:
+                    print(memory.report())
+    if memory:
+        memory.stop()
+    if profiler:
+        profiler.stop()
+        profiler.dump(args.profile)
+        print(f"\ncProfile stats of all threads written to {args.profile}")
+        print(profiler.report(args.profile_top))
+
+
+if __name__ == "__main__":
+    main()
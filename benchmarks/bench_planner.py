@@ -0,0 +1,82 @@
+"""Folder scan and batch planning on a large tree of small files.
+
+Creates --files files spread over nested directories, then times a serial
+os.walk + os.stat baseline against upload_planner.scan_folder at several
+worker counts, and plan_batches on the result. Peak Python memory of the
+scan is measured with tracemalloc in a separate, untimed run (tracing slows
+allocation-heavy code several times over). Usage:
+
+    python benchmarks/bench_planner.py [--files 100000] [--per-dir 200] [--workers 1 4 8 16]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_engine import format_bytes  # noqa: E402
+from upload_planner import PLAN_MAX_BYTES_PER_BATCH, PLAN_MAX_FILES_PER_BATCH, plan_batches, scan_folder  # noqa: E402
+
+
+def build_tree(root, file_count, per_dir):
+    for index in range(file_count):
+        dir_index = index // per_dir
+        dir_path = os.path.join(root, f"group_{dir_index % 10}", f"dir_{dir_index}")
+        if index % per_dir == 0:
+            os.makedirs(dir_path, exist_ok=True)
+        with open(os.path.join(dir_path, f"file_{index}.bin"), "wb") as f:
+            f.write(b"x" * (index % 4096))
+
+
+def walk_baseline(root):
+    files = []
+    for dir_path, _dir_names, file_names in os.walk(root):
+        for file_name in file_names:
+            file_path = os.path.join(dir_path, file_name)
+            files.append((os.path.relpath(file_path, root), os.stat(file_path).st_size))
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--per-dir", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--batch-files", type=int, default=PLAN_MAX_FILES_PER_BATCH)
+    parser.add_argument("--batch-bytes", type=int, default=PLAN_MAX_BYTES_PER_BATCH)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        started = time.perf_counter()
+        build_tree(tmp_dir, args.files, args.per_dir)
+        print(f"built {args.files} files in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        walk_baseline(tmp_dir)
+        print(f"{'os.walk + stat':<22} {time.perf_counter() - started:7.3f}s")
+
+        files = []
+        for workers in args.workers:
+            started = time.perf_counter()
+            files = scan_folder(tmp_dir, workers=workers)
+            print(f"{f'scan_folder x{workers}':<22} {time.perf_counter() - started:7.3f}s")
+
+        tracemalloc.start()
+        scan_folder(tmp_dir, workers=args.workers[-1])
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{'scan peak memory':<22} {format_bytes(peak)} for {len(files)} files")
+
+        started = time.perf_counter()
+        batches = plan_batches(files, args.batch_files, args.batch_bytes)
+        elapsed = time.perf_counter() - started
+        batch_bytes = [sum(f.size for f in batch) for batch in batches]
+        print(f"{'plan_batches':<22} {elapsed:7.3f}s  {len(batches)} batches, "
+              f"{format_bytes(min(batch_bytes))}..{format_bytes(max(batch_bytes))} per batch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Caller-thread cost of queueing large drops, and pre-flight check time.
+
+Creates --jobs drops, each of --files loose files plus --folders folders of
+--per-folder files, and:
+
+* checks every drop's paths one after another on the calling thread (what
+  a synchronous check in ``enqueue`` would cost the UI thread) and with
+  ``preflight_paths`` on a thread pool;
+* queues every drop on an UploadManager (whose uploads are replaced by a
+  no-op) and reports how long ``enqueue`` blocked the caller in total and
+  how long until the last job passed its pre-flight check.
+
+Usage:
+
+    python benchmarks/bench_preflight.py [--jobs 20] [--files 500] [--folders 2] [--per-folder 5000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_manager import UploadManager, quote_paths  # noqa: E402
+from upload_preflight import check_path, preflight_paths  # noqa: E402
+
+
+def make_drop(root, files, folders, per_folder):
+    os.makedirs(root)
+    paths = []
+    for index in range(files):
+        path = os.path.join(root, f"file_{index}.json")
+        with open(path, "wb") as f:
+            f.write(b"x" * (1 + index % 1000))
+        paths.append(path)
+    for folder_index in range(folders):
+        folder = os.path.join(root, f"folder_{folder_index}")
+        for index in range(per_folder):
+            sub_dir = os.path.join(folder, f"dir_{index // 200}")
+            if index % 200 == 0:
+                os.makedirs(sub_dir)
+            with open(os.path.join(sub_dir, f"part_{index}.bin"), "wb") as f:
+                f.write(b"y" * (1 + index % 4096))
+        paths.append(folder)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--files", type=int, default=500, help="loose files per drop")
+    parser.add_argument("--folders", type=int, default=2, help="folders per drop")
+    parser.add_argument("--per-folder", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        started = time.perf_counter()
+        drops = [make_drop(os.path.join(tmp_dir, f"drop_{index}"), args.files, args.folders, args.per_folder)
+                 for index in range(args.jobs)]
+        total_files = args.jobs * (args.files + args.folders * args.per_folder)
+        print(f"built {args.jobs} drops, {total_files} files in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        for paths in drops:
+            for path in paths:
+                check_path(path)
+        print(f"{'sequential check':<28} {time.perf_counter() - started:7.3f}s")
+        started = time.perf_counter()
+        for paths in drops:
+            result = preflight_paths(paths)
+            assert result.ok and result.file_count == args.files + args.folders * args.per_folder
+        print(f"{'preflight_paths (parallel)':<28} {time.perf_counter() - started:7.3f}s")
+
+        all_checked = threading.Event()
+        checked = []
+
+        def on_job_started(job):
+            checked.append(job.id)
+            if len(checked) == args.jobs:
+                all_checked.set()
+
+        manager = UploadManager(queue_db_path=os.path.join(tmp_dir, "queue.sqlite3"),
+                                hash_cache_path=os.path.join(tmp_dir, "cache.sqlite3"),
+                                sync_manifest_path=os.path.join(tmp_dir, "sync.sqlite3"),
+                                history_db_path=os.path.join(tmp_dir, "history.sqlite3"), legacy_history_file=None,
+                                skip_unchanged=False, on_job_started=on_job_started)
+        manager.pool.set_run_job(lambda job, on_status, on_progress: (True, f"Job ID:{job.id} done"))
+        blocked = 0.0
+        started = time.perf_counter()
+        for paths in drops:
+            enqueue_started = time.perf_counter()
+            manager.enqueue("bench/model", "", quote_paths(paths))
+            blocked += time.perf_counter() - enqueue_started
+        all_checked.wait()
+        print(f"{'enqueue (caller blocked)':<28} {blocked:7.3f}s")
+        print(f"{'all jobs checked and queued':<28} {time.perf_counter() - started:7.3f}s")
+        manager.wait_until_idle()
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Latency of queue store operations with a large job history.
+
+Fills a JobQueueStore with --history finished jobs plus --queued queued jobs,
+then times add, status update, reorder, remove and the start-up restore.
+Usage:
+
+    python benchmarks/bench_queue_store.py [--history 50000] [--queued 1000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_engine import JOB_RUNNING, JOB_SUCCEEDED, UploadJob  # noqa: E402
+from upload_queue_store import JobQueueStore  # noqa: E402
+
+
+def timed(label, count, func):
+    started = time.perf_counter()
+    for index in range(count):
+        func(index)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22} {elapsed / count * 1e6:9.1f} us/op ({count} ops)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history", type=int, default=50000)
+    parser.add_argument("--queued", type=int, default=1000)
+    parser.add_argument("--ops", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = JobQueueStore(os.path.join(tmp_dir, "queue.sqlite3"))
+        started = time.perf_counter()
+        for job_id in range(1, args.history + 1):
+            store.add(UploadJob(job_id, "bench/history", "", f"file-{job_id}.bin"))
+        store._conn.execute("UPDATE jobs SET status = ?", (JOB_SUCCEEDED,))
+        store._conn.commit()
+        print(f"seeded {args.history} finished jobs in {time.perf_counter() - started:.1f}s")
+
+        next_id = args.history + 1
+        queued_ids = list(range(next_id, next_id + args.queued))
+        for job_id in queued_ids:
+            store.add(UploadJob(job_id, "bench/queued", "", f"file-{job_id}.bin"))
+        next_id += args.queued
+
+        timed("add", args.ops, lambda i: store.add(UploadJob(next_id + i, "bench/new", "", "new.bin")))
+        timed("set_status", args.ops, lambda i: store.set_status(random.choice(queued_ids), JOB_RUNNING))
+        timed("move_before", args.ops, lambda i: store.move_before(random.choice(queued_ids[1:]), queued_ids[0]))
+        timed("mark_removed", args.ops, lambda i: store.mark_removed([next_id + i]))
+        started = time.perf_counter()
+        restored = store.load_unfinished()
+        print(f"{'load_unfinished':<22} {(time.perf_counter() - started) * 1000:9.1f} ms ({len(restored)} jobs)")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""UI update latency of the queue view with tens of thousands of queued jobs.
+
+Fills the queue with --jobs N (default 10000 and 50000) and times the
+operations the GUI performs on each event:
+
+* queue model: removing one job, bumping 100 jobs to the front and moving a
+  job before another, on ``UploadWorkerPool`` (``JobQueue``) versus the old
+  deque, where each operation copied or scanned the queue;
+* Tk view (skipped without a display): a job starting, a job finishing, a
+  job being added, removing two far-apart rows, bumping 100 rows and a
+  progress refresh, each followed by ``update_idletasks`` so the redraw is
+  included. The old ``Listbox`` rebuild is timed for comparison.
+
+Usage:
+
+    python benchmarks/bench_queue_view.py [--jobs 10000 50000]
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_engine import UploadJob, UploadWorkerPool  # noqa: E402
+
+
+def make_jobs(count, first_id=1):
+    return [UploadJob(id=job_id, repository=f"bench/repo-{job_id % 7}", subfolder="shards",
+                      file_paths_display_str=f"/data/shards/shard-{job_id:06d}.safetensors")
+            for job_id in range(first_id, first_id + count)]
+
+
+def timed(action, repeat=5):
+    """Best of ``repeat`` runs of ``action()``, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        action()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def idle_pool(jobs):
+    # Placed straight into the pending queue, bypassing submit(), so no job starts.
+    pool = UploadWorkerPool(run_job=lambda job, on_status, on_progress: (True, ""))
+    with pool._lock:
+        for job in jobs:
+            pool._pending.append(job)
+    return pool
+
+
+def bench_model(count):
+    jobs = make_jobs(count)
+    pool = idle_pool(jobs)
+    middle, last = jobs[count // 2].id, jobs[-1].id
+    bump = [job.id for job in jobs[-100:]]
+    new_ms = {
+        "remove one": timed(lambda: (pool.remove_pending(middle), pool._pending.append(jobs[count // 2]))),
+        "bump 100 to front": timed(lambda: pool.move_pending_to_front(bump)),
+        "move one before another": timed(lambda: pool.move_pending(last, middle)),
+    }
+
+    old_queue = deque(jobs)
+
+    def old_remove():
+        items = list(old_queue)
+        job = next(job for job in items if job.id == middle)
+        items.remove(job)
+        old_queue.clear()
+        old_queue.extend(items)
+        old_queue.append(job)
+
+    def old_bump():
+        for job_id in reversed(bump):
+            job = next(job for job in old_queue if job.id == job_id)
+            old_queue.remove(job)
+            old_queue.appendleft(job)
+
+    def old_move():
+        jobs_by_id = {job.id: job for job in old_queue}
+        job = jobs_by_id[last]
+        old_queue.remove(job)
+        old_queue.insert(old_queue.index(jobs_by_id[middle]), job)
+
+    old_ms = {"remove one": timed(old_remove), "bump 100 to front": timed(old_bump),
+              "move one before another": timed(old_move)}
+    print(f"queue model, {count} pending jobs")
+    for name in new_ms:
+        print(f"  {name:<26} JobQueue {new_ms[name]:9.3f} ms   deque {old_ms[name]:9.3f} ms")
+
+
+def bench_view(count):
+    import tkinter as tk
+
+    from upload_queue_view import QueueTreeView
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Tk view, {count} jobs: skipped ({e})")
+        return
+    root.geometry("800x400")
+    view = QueueTreeView(root, height=20)
+    view.tree.pack(fill=tk.BOTH, expand=True)
+    listbox = tk.Listbox(root, height=5)
+    listbox.pack(fill=tk.X)
+    root.update()
+
+    jobs = make_jobs(count)
+    running, pending = [], list(jobs)
+    new_ids = itertools.count(count + 1)
+
+    def sync():
+        view.sync(running, [], pending)
+        root.update_idletasks()
+
+    def start_head():
+        running.append(pending.pop(0))
+        running[-1].progress = 0.0
+        sync()
+
+    def finish_running():
+        running.pop(0)
+        sync()
+
+    def add_job():
+        pending.extend(make_jobs(1, first_id=next(new_ids)))
+        sync()
+
+    def remove_far_rows():
+        for job in (pending[1], pending[-2]):
+            pending.remove(job)
+        sync()
+
+    def bump_rows():
+        moved = pending[-100:]
+        del pending[-100:]
+        pending[0:0] = moved
+        view.move_rows([job.id for job in moved], pending[100].id)
+        sync()
+
+    def refresh_progress():
+        for job in running:
+            job.progress += 1
+        view.refresh_rows(running)
+        root.update_idletasks()
+
+    def old_rebuild():
+        listbox.delete(0, tk.END)
+        for job in running:
+            listbox.insert(tk.END, f"[Running {job.progress:.0f}%] {job}")
+        for job in pending:
+            listbox.insert(tk.END, str(job))
+        root.update_idletasks()
+
+    initial_ms = timed(sync, repeat=1)
+    print(f"Tk view, {count} jobs (initial fill {initial_ms:.0f} ms)")
+    for name, action in (("job started", start_head), ("job finished", finish_running), ("job added", add_job),
+                         ("remove 2 far-apart rows", remove_far_rows), ("bump 100 rows", bump_rows),
+                         ("progress refresh", refresh_progress)):
+        start_head()  # keep a few jobs running for the finish/progress cases
+        print(f"  {name:<26} {timed(action):9.3f} ms")
+    print(f"  {'old Listbox rebuild':<26} {timed(old_rebuild, repeat=1):9.3f} ms")
+    root.destroy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, nargs="+", default=[10000, 50000])
+    args = parser.parse_args()
+    for count in args.jobs:
+        bench_model(count)
+    for count in args.jobs:
+        bench_view(count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Queue drain under injected rate limiting, with and without retries.
+
+Runs --jobs uploads through UploadWorkerPool against benchmarks/fake_hf_cli.py
+with FAKE_HF_FAIL_RATE of the attempts failing with "429 Too Many Requests"
+and one repository that always fails with a 404. Reports how many jobs end up
+succeeded/failed, how many retries were scheduled, and the wall time. With
+retries on, every 429 job should eventually succeed, the 404 jobs should fail
+without being retried, and jobs waiting to retry must not stall the rest of
+the queue. Usage:
+
+    python benchmarks/bench_retry.py [--jobs 40] [--fail-rate 0.3] [--workers 4]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_backends import CliUploadBackend  # noqa: E402
+from upload_engine import UploadJob, UploadWorkerPool  # noqa: E402
+from upload_retry import RetryPolicy  # noqa: E402
+
+FAKE_CLI = (sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_hf_cli.py"))
+FATAL_REPO = "bench/missing"
+
+
+def run_queue(num_jobs, workers, policy):
+    results = {"succeeded": 0, "failed": 0, "retries": 0, "fatal_retries": 0}
+    lock = threading.Lock()
+
+    def on_finished(job, success, message):
+        with lock:
+            results["succeeded" if success else "failed"] += 1
+
+    def on_retry(job, delay, message):
+        with lock:
+            results["retries"] += 1
+            if job.repository == FATAL_REPO:
+                results["fatal_retries"] += 1
+
+    pool = UploadWorkerPool(run_job=CliUploadBackend(FAKE_CLI).run, max_workers=workers,
+                            on_job_finished=on_finished, retry_policy=policy, on_job_retry=on_retry)
+    started = time.perf_counter()
+    for job_id in range(1, num_jobs + 1):
+        repository = FATAL_REPO if job_id % 10 == 0 else f"bench/repo-{job_id % 3}"
+        pool.submit(UploadJob(id=job_id, repository=repository, subfolder="",
+                              file_paths_display_str=f"shard-{job_id}.bin"))
+    pool.wait_until_idle()
+    results["wall"] = time.perf_counter() - started
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--fail-rate", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--base-delay", type=float, default=0.2)
+    args = parser.parse_args()
+
+    os.environ.update(FAKE_HF_LATENCY=str(args.latency), FAKE_HF_FAIL_RATE=str(args.fail_rate),
+                      FAKE_HF_ERROR="429 Client Error: Too Many Requests for url: https://huggingface.co/api",
+                      FAKE_HF_FATAL_REPOS=FATAL_REPO)
+    print(f"{args.jobs} jobs, {args.fail_rate:.0%} of attempts rate limited, every 10th job targets a missing repo")
+    for label, policy in (("no retry", None),
+                          ("retry", RetryPolicy(max_retries=20, base_delay=args.base_delay, max_delay=2.0))):
+        r = run_queue(args.jobs, args.workers, policy)
+        print(f"{label:<9} succeeded={r['succeeded']:<4d} failed={r['failed']:<4d} retries={r['retries']:<4d} "
+              f"404 retries={r['fatal_retries']:<3d} wall={r['wall']:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
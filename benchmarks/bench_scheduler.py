@@ -0,0 +1,137 @@
+"""Queue wait under each scheduling policy, in a simulated mixed workload.
+
+Discrete-event simulation (no uploads, no sleeping) of --workers parallel
+uploads, each sending at --mbps with a fixed per-job overhead. The policies
+from upload_scheduler.py pick the next job exactly as they do inside
+UploadWorkerPool. The workload:
+
+* a bulk dataset push of --bulk shards of 200 MB, all queued at t=0;
+* small urgent fixes (model cards, configs; priority 5) arriving at random
+  across several model repositories;
+* medium checkpoints (2-4 GB) arriving at random in one repository.
+
+For every policy it prints the mean and 95th-percentile queue wait (start
+minus enqueue) for all jobs and per job class, and the time until the
+last job finished. Usage:
+
+    python benchmarks/bench_scheduler.py [--bulk 500] [--workers 4] [--seed 1]
+"""
+import argparse
+import heapq
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_engine import JobQueue, UploadJob  # noqa: E402
+from upload_scheduler import POLICY_FAIR_SHARE, POLICY_NAMES, create_policy  # noqa: E402
+
+MB = 1024 * 1024
+JOB_OVERHEAD_SECONDS = 2.0
+
+
+def make_workload(bulk, seed):
+    """Return ``[(arrival_seconds, job_class, UploadJob)]`` sorted by arrival."""
+    rng = random.Random(seed)
+    arrivals = []
+    job_ids = iter(range(1, 10 ** 9))
+    for index in range(bulk):
+        arrivals.append((0.0, "bulk", UploadJob(id=next(job_ids), repository="team/dataset", subfolder="data",
+                                                file_paths_display_str=f"shard-{index:05d}.parquet",
+                                                total_bytes=200 * MB)))
+    clock = 0.0
+    for _ in range(60):
+        clock += rng.expovariate(1 / 30)
+        arrivals.append((clock, "small", UploadJob(id=next(job_ids), repository=f"team/model-{rng.randint(1, 5)}",
+                                                   subfolder="", file_paths_display_str="README.md",
+                                                   total_bytes=rng.randint(2, 64) * 1024, priority=5)))
+    clock = 0.0
+    for index in range(15):
+        clock += rng.expovariate(1 / 120)
+        arrivals.append((clock, "medium", UploadJob(id=next(job_ids), repository="team/checkpoints",
+                                                    subfolder="ckpt", file_paths_display_str=f"step-{index}.bin",
+                                                    total_bytes=rng.randint(2048, 4096) * MB)))
+    arrivals.sort(key=lambda item: item[0])
+    return arrivals
+
+
+def simulate(policy, workload, workers, bytes_per_second, per_repo_limit):
+    pending = JobQueue()
+    running = []  # heap of (finish_time, job_id, repository)
+    running_per_repo = {}
+    waits = {}
+    enqueued_at = {}
+    job_classes = {}
+    decisions = 0
+    decision_seconds = 0.0
+    clock = 0.0
+    arrivals = list(workload)
+    arrivals.reverse()
+
+    def runnable(job):
+        return not per_repo_limit or running_per_repo.get(job.repository, 0) < per_repo_limit
+
+    while arrivals or pending or running:
+        next_arrival = arrivals[-1][0] if arrivals else float("inf")
+        next_finish = running[0][0] if running else float("inf")
+        clock = min(next_arrival, next_finish)
+        while arrivals and arrivals[-1][0] <= clock:
+            arrived_at, job_class, job = arrivals.pop()
+            enqueued_at[job.id] = arrived_at
+            job_classes[job.id] = job_class
+            pending.append(job)
+        while running and running[0][0] <= clock:
+            _finished_at, _job_id, repository = heapq.heappop(running)
+            running_per_repo[repository] -= 1
+        while len(running) < workers:
+            started = time.perf_counter()
+            job = policy.select(pending, runnable)
+            decision_seconds += time.perf_counter() - started
+            decisions += 1
+            if job is None:
+                break
+            pending.remove(job.id)
+            policy.job_started(job)
+            waits[job.id] = clock - enqueued_at[job.id]
+            running_per_repo[job.repository] = running_per_repo.get(job.repository, 0) + 1
+            heapq.heappush(running, (clock + JOB_OVERHEAD_SECONDS + job.total_bytes / bytes_per_second,
+                                     job.id, job.repository))
+    return waits, job_classes, clock, decision_seconds / max(1, decisions)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bulk", type=int, default=500, help="shards in the bulk dataset push")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--mbps", type=float, default=50.0, help="MB/s per running upload")
+    parser.add_argument("--per-repo", type=int, default=0, help="per-repository limit (0 = none)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{args.bulk} bulk shards + 60 small fixes + 15 checkpoints, {args.workers} workers at "
+          f"{args.mbps:g} MB/s, {JOB_OVERHEAD_SECONDS:g}s per-job overhead")
+    print(f"{'policy':<15} {'all mean/p95 (s)':>18} {'small mean/p95':>18} {'medium mean/p95':>18} "
+          f"{'bulk mean/p95':>18} {'makespan':>9} {'pick':>8}")
+    for name in POLICY_NAMES:
+        # Fair-share gives the bulk push the same weight as each other repository.
+        policy = create_policy(name, {"team/dataset": 1} if name == POLICY_FAIR_SHARE else None)
+        waits, job_classes, makespan, per_decision = simulate(
+            policy, make_workload(args.bulk, args.seed), args.workers, args.mbps * MB, args.per_repo)
+        columns = []
+        for job_class in (None, "small", "medium", "bulk"):
+            values = [wait for job_id, wait in waits.items() if job_class in (None, job_classes[job_id])]
+            columns.append(f"{statistics.mean(values):8.1f} /{percentile(values, 0.95):8.1f}")
+        print(f"{name:<15} {columns[0]:>18} {columns[1]:>18} {columns[2]:>18} {columns[3]:>18} "
+              f"{makespan:8.0f}s {per_decision * 1e6:6.1f}us")
+
+
+if __name__ == "__main__":
+    main()
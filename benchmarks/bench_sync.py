@@ -0,0 +1,116 @@
+"""Incremental sync diff on a large tree against its manifest index.
+
+Creates --files small files spread over nested directories, indexes them as
+a first sync would (hash everything, stage, commit) and then times
+``SyncManifest.diff``:
+
+* with nothing changed, which should only walk the tree and read the index;
+* after touching --touch files (new mtime, same content), modifying
+  --modify, deleting --delete and adding --add files, where only the
+  touched, modified and added files are hashed.
+
+The first sync's full hash pass is printed for comparison; it is what every
+run cost when each sync re-hashed (or re-uploaded) the whole folder. Usage:
+
+    python benchmarks/bench_sync.py [--files 200000] [--per-dir 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_engine import UploadJob, format_bytes  # noqa: E402
+from upload_manager import quote_paths  # noqa: E402
+from upload_sync import SyncManifest, sync_target  # noqa: E402
+
+
+def build_tree(root, file_count, per_dir):
+    paths = []
+    for index in range(file_count):
+        dir_index = index // per_dir
+        dir_path = os.path.join(root, f"group_{dir_index % 10}", f"dir_{dir_index}")
+        if index % per_dir == 0:
+            os.makedirs(dir_path, exist_ok=True)
+        path = os.path.join(dir_path, f"file_{index}.bin")
+        with open(path, "wb") as f:
+            f.write(b"x" * (index % 4096))
+        paths.append(path)
+    return paths
+
+
+def timed_diff(manifest, job):
+    started = time.perf_counter()
+    diff = manifest.diff(job)
+    return diff, time.perf_counter() - started
+
+
+def report(label, diff, elapsed):
+    print(f"{label:<26} {elapsed:7.3f}s  {diff.summary()}, {diff.hashed} hashed, "
+          f"{len(diff.touched)} touched, {format_bytes(diff.bytes_to_send)} to send")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=200000)
+    parser.add_argument("--per-dir", type=int, default=200)
+    parser.add_argument("--touch", type=int, default=1000)
+    parser.add_argument("--modify", type=int, default=100)
+    parser.add_argument("--delete", type=int, default=50)
+    parser.add_argument("--add", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        folder = os.path.join(tmp_dir, "run")
+        started = time.perf_counter()
+        paths = build_tree(folder, args.files, args.per_dir)
+        print(f"built {args.files} files in {time.perf_counter() - started:.1f}s")
+
+        manifest = SyncManifest(os.path.join(tmp_dir, "sync.sqlite3"))
+        job = UploadJob(id=1, repository="bench/model", subfolder="outputs",
+                        file_paths_display_str=quote_paths([folder]), sync=True)
+        diff, elapsed = timed_diff(manifest, job)
+        report("first sync (hash all)", diff, elapsed)
+        started = time.perf_counter()
+        manifest.stage(job.id, job.repository, sync_target(job), diff.changed)
+        manifest.commit_staged(job.id)
+        print(f"{'index first sync':<26} {time.perf_counter() - started:7.3f}s")
+
+        diff, elapsed = timed_diff(manifest, job)
+        report("no changes", diff, elapsed)
+        assert not diff.changed and not diff.deleted and diff.hashed == 0
+
+        step = max(1, len(paths) // max(1, args.touch + args.modify + args.delete))
+        chosen = paths[::step]
+        touched = chosen[:args.touch]
+        modified = chosen[args.touch:args.touch + args.modify]
+        deleted = chosen[args.touch + args.modify:args.touch + args.modify + args.delete]
+        for path in touched:
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        for path in modified:
+            with open(path, "ab") as f:
+                f.write(b"changed")
+        for path in deleted:
+            os.remove(path)
+        for index in range(args.add):
+            with open(os.path.join(folder, f"new_{index}.bin"), "wb") as f:
+                f.write(b"y" * 1024)
+
+        diff, elapsed = timed_diff(manifest, job)
+        report("after edits", diff, elapsed)
+        assert (len(diff.added), len(diff.modified), len(diff.deleted), len(diff.touched)) == (
+            args.add, len(modified), len(deleted), len(touched))
+        manifest.record(job.repository, sync_target(job), diff.touched)
+        manifest.stage(job.id, job.repository, sync_target(job), diff.changed, diff.deleted)
+        manifest.commit_staged(job.id)
+
+        diff, elapsed = timed_diff(manifest, job)
+        report("no changes (again)", diff, elapsed)
+        manifest.close()
+
+
+if __name__ == "__main__":
+    main()
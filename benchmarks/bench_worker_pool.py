@@ -0,0 +1,50 @@
+"""Wall-clock time of a queue of uploads as the worker count grows.
+
+Runs the UploadWorkerPool against benchmarks/fake_hf_cli.py, which sleeps for
+FAKE_HF_LATENCY seconds per job, so the numbers reflect scheduling rather than
+network speed. Usage:
+
+    python benchmarks/bench_worker_pool.py [--jobs 16] [--latency 0.5] [--workers 1 2 4 8]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_backends import CliUploadBackend  # noqa: E402
+from upload_engine import UploadJob, UploadWorkerPool  # noqa: E402
+
+FAKE_CLI = (sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_hf_cli.py"))
+
+
+def run_queue(num_jobs, workers, repos):
+    pool = UploadWorkerPool(run_job=CliUploadBackend(FAKE_CLI).run, max_workers=workers)
+    started = time.perf_counter()
+    for job_id in range(1, num_jobs + 1):
+        pool.submit(UploadJob(id=job_id, repository=f"bench/repo-{job_id % repos}",
+                              subfolder="", file_paths_display_str=f"shard-{job_id}.bin"))
+    pool.wait_until_idle()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--repos", type=int, default=4)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    os.environ["FAKE_HF_LATENCY"] = str(args.latency)
+    print(f"{args.jobs} jobs, {args.latency:.2f}s simulated latency each")
+    baseline = None
+    for workers in args.workers:
+        elapsed = run_queue(args.jobs, workers, args.repos)
+        baseline = baseline or elapsed
+        print(f"workers={workers:<3d} wall={elapsed:7.2f}s speedup={baseline / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Stand-in for ``huggingface-cli`` used by the benchmarks.
+
+Accepts the same ``upload <repo> <paths...> <path_in_repo>`` arguments, prints
+tqdm-style progress lines to stderr and exits. Behaviour is tuned through
+environment variables so the benchmarks can drive it without extra flags:
+
+FAKE_HF_LATENCY      total seconds the "upload" takes (default 0.5)
+FAKE_HF_BANDWIDTH    bytes/sec the local paths (only the --include'd files of
+                     a folder) are "sent" at, on top of the latency
+                     (default 0 = instant)
+FAKE_HF_STEPS        number of progress lines to emit (default 10)
+FAKE_HF_EXIT_CODE    exit status to return (default 0)
+FAKE_HF_STDOUT_BYTES write this many bytes of log lines to stdout before
+                     any progress output (default 0)
+FAKE_HF_STDERR_BYTES write this many bytes of log lines to stderr after the
+                     stdout flood (default 0)
+FAKE_HF_FAIL_RATE    probability of failing with FAKE_HF_ERROR after the
+                     progress output (default 0)
+FAKE_HF_ERROR        error line printed on failure (default
+                     "Error: simulated failure")
+FAKE_HF_FATAL_REPOS  comma-separated repos that always fail with a 404
+FAKE_HF_LOG_FILE     append the local paths of each successful upload to this
+                     file, one per line (default: no log)
+"""
+import glob
+import os
+import random
+import sys
+import time
+
+
+def flood(stream, num_bytes):
+    line = "x" * 99 + "\n"
+    for _ in range(num_bytes // len(line)):
+        stream.write(line)
+    stream.flush()
+
+
+def split_args(argv):
+    """``(positional, options)`` where options maps ``--flag`` to the values that follow it."""
+    positional, options, values = [], {}, None
+    for arg in argv:
+        if arg.startswith("--"):
+            values = options.setdefault(arg, [])
+        elif values is not None:
+            values.append(arg)
+        else:
+            positional.append(arg)
+    return positional, options
+
+
+def local_size(paths, include=None):
+    total = 0
+    for path in paths:
+        if os.path.isdir(path) and include:
+            total += sum(os.path.getsize(match) for pattern in include
+                         for match in glob.glob(os.path.join(path, pattern)))
+        elif os.path.isdir(path):
+            for dir_path, _dir_names, file_names in os.walk(path):
+                total += sum(os.path.getsize(os.path.join(dir_path, name)) for name in file_names)
+        elif os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def main(argv):
+    argv, options = split_args(argv)
+    if len(argv) < 4 or argv[0] != "upload":
+        print("usage: fake_hf_cli.py upload <repo> <paths...> <path_in_repo>", file=sys.stderr)
+        return 2
+    latency = float(os.environ.get("FAKE_HF_LATENCY", "0.5"))
+    bandwidth = float(os.environ.get("FAKE_HF_BANDWIDTH", "0"))
+    if bandwidth > 0:
+        latency += local_size(argv[2:-1], options.get("--include")) / bandwidth
+    steps = max(1, int(os.environ.get("FAKE_HF_STEPS", "10")))
+    flood(sys.stdout, int(os.environ.get("FAKE_HF_STDOUT_BYTES", "0")))
+    flood(sys.stderr, int(os.environ.get("FAKE_HF_STDERR_BYTES", "0")))
+    for step in range(1, steps + 1):
+        time.sleep(latency / steps)
+        percentage = step * 100 // steps
+        sys.stderr.write(f"Uploading files: {percentage:3d}%|{'#' * (percentage // 10):<10}| {step}/{steps}\n")
+        sys.stderr.flush()
+    exit_code = int(os.environ.get("FAKE_HF_EXIT_CODE", "0"))
+    error = os.environ.get("FAKE_HF_ERROR", "Error: simulated failure")
+    if argv[1] in os.environ.get("FAKE_HF_FATAL_REPOS", "").split(","):
+        exit_code, error = 1, f"404 Client Error: Repository Not Found for url: https://huggingface.co/{argv[1]}"
+    elif random.random() < float(os.environ.get("FAKE_HF_FAIL_RATE", "0")):
+        exit_code = exit_code or 1
+    if exit_code == 0:
+        log_file = os.environ.get("FAKE_HF_LOG_FILE")
+        if log_file:
+            with open(log_file, "a", encoding="utf-8") as f:
+                f.writelines(f"{path}\n" for path in argv[2:-1])
+        print(f"https://huggingface.co/{argv[1]}/blob/main/{argv[-1]}")
+    else:
+        print(error, file=sys.stderr)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
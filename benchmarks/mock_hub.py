@@ -0,0 +1,180 @@
+"""Minimal local stand-in for the Hugging Face Hub HTTP API.
+
+Implements just enough of the endpoints used by ``HfApi.upload_file`` /
+``upload_folder`` / ``create_commit`` for small ("regular" mode) files:
+
+    POST /api/<type>s/<repo_id>/preupload/<revision>
+    POST /api/<type>s/<repo_id>/commit/<revision>
+    POST /api/repos/create  (used by ``hf upload``; always succeeds)
+
+Every file is reported as a regular (non-LFS) upload, so file contents arrive
+base64-encoded in the commit payload. The server counts requests, commits and
+received bytes so benchmarks can report them, and timestamps every chunk of
+request body it reads so ``received_rate`` can report the incoming bytes/sec.
+``bandwidth`` (bytes/sec) paces reading request bodies as if every client
+shared one link of that speed, and ``fail_rate`` answers that share of commits
+with "503 Service Unavailable" (counted in ``failures``).
+Request targets in absolute form (as sent through an HTTP proxy) are
+accepted. Start it with ``MockHub().start()`` and point
+``HfApi(endpoint=hub.url)`` at it.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+RECEIVE_CHUNK_SIZE = 64 * 1024
+
+_PREUPLOAD_RE = re.compile(r"^/api/(models|datasets|spaces)/(.+)/preupload/([^/]+)$")
+_COMMIT_RE = re.compile(r"^/api/(models|datasets|spaces)/(.+)/commit/([^/]+)$")
+
+
+class MockHub:
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0, bandwidth=0, fail_rate=0.0, seed=None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.fail_rate = fail_rate
+        self._random = random.Random(seed)
+        self._link_free_at = 0.0  # time.monotonic() when the shared link has sent what it was given
+        self.requests = 0
+        self.commits = 0
+        self.failures = 0
+        self.bytes_received = 0
+        self.committed_paths = []
+        self.receive_log = []  # (time.monotonic(), bytes) per chunk of request body read
+        self._lock = threading.Lock()
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0) or 0)
+                chunks = []
+                while length > 0:
+                    chunk = self.rfile.read(min(RECEIVE_CHUNK_SIZE, length))
+                    if not chunk:
+                        break
+                    hub._record_chunk(len(chunk))
+                    chunks.append(chunk)
+                    length -= len(chunk)
+                body = b"".join(chunks)
+                hub._record(len(body))
+                if hub.latency:
+                    time.sleep(hub.latency)
+                path = urlsplit(self.path).path
+                if path == "/api/repos/create":
+                    request = json.loads(body or b"{}")
+                    repo_id = "/".join(filter(None, [request.get("organization"), request.get("name", "")]))
+                    self._send_json({"url": f"{hub.url}/{repo_id}", "name": repo_id})
+                    return
+                if _PREUPLOAD_RE.match(path):
+                    files = json.loads(body or b"{}").get("files", [])
+                    self._send_json({"files": [{"path": f["path"], "uploadMode": "regular",
+                                                "shouldIgnore": False, "oid": None} for f in files]})
+                    return
+                match = _COMMIT_RE.match(path)
+                if match and hub._should_fail():
+                    self._send_json({"error": "mock hub: 503 Service Unavailable"}, status=503)
+                    return
+                if match:
+                    paths = []
+                    for line in body.splitlines():
+                        if not line.strip():
+                            continue
+                        entry = json.loads(line)
+                        if entry.get("key") == "file":
+                            paths.append(entry["value"]["path"])
+                    commit_oid = hub._record_commit(paths)
+                    self._send_json({"commitUrl": f"{hub.url}/{match.group(2)}/commit/{commit_oid}",
+                                     "commitOid": commit_oid, "pullRequestUrl": None})
+                    return
+                self._send_json({"error": f"mock hub: unsupported endpoint {path}"}, status=404)
+
+            def do_GET(self):
+                hub._record(0)
+                self._send_json({"error": f"mock hub: unsupported endpoint {self.path}"}, status=404)
+
+            def _send_json(self, payload, status=200):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _record(self, num_bytes):
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += num_bytes
+
+    def _record_chunk(self, num_bytes):
+        delay = 0.0
+        with self._lock:
+            now = time.monotonic()
+            if self.bandwidth:
+                self._link_free_at = max(now, self._link_free_at) + num_bytes / self.bandwidth
+                delay = self._link_free_at - now
+            self.receive_log.append((now + delay, num_bytes))
+        if delay > 0:
+            time.sleep(delay)
+
+    def _should_fail(self):
+        with self._lock:
+            if self.fail_rate and self._random.random() < self.fail_rate:
+                self.failures += 1
+                return True
+            return False
+
+    def received_rate(self, since=None, until=None):
+        """Bytes/sec of request body received between ``since`` and ``until`` (time.monotonic()).
+
+        Without bounds, the span from the first to the last chunk received is used.
+        """
+        with self._lock:
+            chunks = [(t, n) for t, n in self.receive_log
+                      if (since is None or t >= since) and (until is None or t <= until)]
+        if not chunks:
+            return 0.0
+        start = since if since is not None else chunks[0][0]
+        end = until if until is not None else chunks[-1][0]
+        if end <= start:
+            return 0.0
+        received = sum(n for _t, n in chunks) - (chunks[0][1] if since is None else 0)
+        return received / (end - start)
+
+    def _record_commit(self, paths):
+        with self._lock:
+            self.commits += 1
+            self.committed_paths.extend(paths)
+            return f"{self.commits:040x}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
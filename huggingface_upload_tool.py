@@ -1,43 +1,54 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, END, W, filedialog
 from tkinterdnd2 import TkinterDnD, DND_FILES
-import subprocess
-import os
-import threading
 import shlex
-from collections import deque
-import re
-import traceback
-from dataclasses import dataclass
+import time
+from upload_engine import (UploadJob, CoalescingEventQueue,
+                           DEFAULT_MAX_WORKERS, DEFAULT_PER_REPO_LIMIT, JOB_CANCELLED, JOB_RUNNING, format_bytes)
+from upload_backends import BACKEND_CLI, BACKEND_NAMES
+from upload_bandwidth import format_rate, mb_to_bytes, parse_repo_limits, parse_schedule
+from upload_manager import UploadManager
+from upload_merge import MERGE_MAX_JOBS
+from upload_metrics import format_duration
+from upload_queue_view import SECTION_PAUSED, SECTION_PENDING, SECTION_RUNNING, QueueTreeView
+from upload_retry import DEFAULT_MAX_RETRIES
+from upload_scheduler import DEFAULT_POLICY, POLICY_NAMES, parse_repo_weights
 
 # --- Constants ---
-HISTORY_FILE = "upload_history.txt"
-MAX_HISTORY_ITEMS = 10
 APP_TITLE = "Hugging Face Upload Tool (Modernized) with Queue" # Keep as is or change if preferred
-
-@dataclass
-class UploadJob:
-    id: int
-    repository: str
-    subfolder: str
-    file_paths_display_str: str
-
-    def __str__(self):
-        files_preview = self.file_paths_display_str
-        if len(files_preview) > 40:
-            files_preview = files_preview[:37] + "..."
-        sub = self.subfolder if self.subfolder else "<root>"
-        return f"ID:{self.id} Repo: {self.repository}, Sub: {sub}, Files: {files_preview}"
+MAX_WORKERS_LIMIT = 16
+UI_UPDATES_PER_SECOND = 10
+MAX_RETRIES_LIMIT = 20
+MAX_NOTIFICATION_LINES = 500
+MAX_RATE_MB_LIMIT = 10000
+MAX_PRIORITY = 9
+MAX_MERGE_JOBS_LIMIT = 500
+METRICS_REFRESH_MS = 1000
+GRAPH_SECONDS = 60
+GRAPH_HEIGHT = 40
 
 class HuggingFaceUploaderApp:
     def __init__(self, root_window):
         self.root = root_window
         self.root.title(APP_TITLE)
 
-        self.upload_queue = deque()
-        self.current_job_id_counter = 0
-        self.current_processing_job: UploadJob | None = None
-        self.is_processing_lock = threading.Lock()
+        # Worker callbacks arrive on pool threads. They are posted to ui_events, which the Tk
+        # thread drains UI_UPDATES_PER_SECOND times a second; status and progress updates coalesce.
+        self.ui_events = CoalescingEventQueue()
+        self.upload_manager = UploadManager(
+            backend_name=BACKEND_CLI,
+            max_workers=DEFAULT_MAX_WORKERS,
+            per_repo_limit=DEFAULT_PER_REPO_LIMIT,
+            on_job_queued=lambda job: self.ui_events.post(self._update_queue_display, key="queue"),
+            on_job_started=lambda job: self.ui_events.post(self._on_job_started, job),
+            on_job_status=lambda job, msg: self.ui_events.post(self._update_status, msg, True, key="status"),
+            on_job_progress=lambda job, pct: self.ui_events.post(self._on_job_progress, key="progress"),
+            on_job_finished=lambda job, ok, msg: self.ui_events.post(self._handle_job_completion, job, ok, msg),
+            on_job_retry=lambda job, delay, msg: self.ui_events.post(self._handle_job_retry, job, delay, msg),
+            on_job_paused=lambda job, msg: self.ui_events.post(self._handle_job_paused, job, msg),
+            on_history_error=lambda e: self.ui_events.post(
+                self._update_status, f"Error writing upload history: {e}", False, False, True))
+        self.worker_pool = self.upload_manager.pool
 
         style = ttk.Style()
         # style.theme_use('clam') # Uncomment if you prefer this theme
@@ -45,15 +56,34 @@ class HuggingFaceUploaderApp:
         self.repository_var = tk.StringVar()
         self.subfolder_var = tk.StringVar()
         self.file_paths_var = tk.StringVar()
+        self.include_globs_var = tk.StringVar()
+        self.exclude_globs_var = tk.StringVar()
         self.status_var = tk.StringVar(value="Ready") # English: Initial status
+        self.throughput_var = tk.StringVar(value="Idle")
         self.progress_var = tk.DoubleVar(value=0.0)
-
-        self.repository_history = deque(maxlen=MAX_HISTORY_ITEMS)
+        self.max_workers_var = tk.IntVar(value=DEFAULT_MAX_WORKERS)
+        self.per_repo_limit_var = tk.IntVar(value=DEFAULT_PER_REPO_LIMIT)
+        self.backend_var = tk.StringVar(value=BACKEND_CLI)
+        self.skip_unchanged_var = tk.BooleanVar(value=True)
+        self.max_retries_var = tk.IntVar(value=DEFAULT_MAX_RETRIES)
+        self.merge_jobs_var = tk.IntVar(value=MERGE_MAX_JOBS)
+        self.global_rate_var = tk.DoubleVar(value=0.0)
+        self.job_rate_var = tk.DoubleVar(value=0.0)
+        self.repo_rates_var = tk.StringVar()
+        self.rate_schedule_var = tk.StringVar()
+        self.priority_var = tk.IntVar(value=0)
+        self.sync_var = tk.BooleanVar(value=False)
+        self.sync_delete_var = tk.BooleanVar(value=False)
+        self.policy_var = tk.StringVar(value=DEFAULT_POLICY)
+        self.repo_weights_var = tk.StringVar()
 
         self._setup_ui()
-        self._load_history()
         self._update_repository_dropdown()
         self._update_queue_buttons_state()
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        self._poll_ui_events()
+        self._refresh_metrics()
+        self._restore_saved_queue()
 
     def _setup_ui(self):
         outer_frame = ttk.Frame(self.root, padding="5")
@@ -70,6 +100,7 @@ class HuggingFaceUploaderApp:
         self.repository_dropdown.grid(row=0, column=1, padx=5, pady=5, sticky=(W, tk.E))
         self.repository_dropdown.bind('<<ComboboxSelected>>', self._on_repo_selected)
         self.repository_dropdown.bind('<Return>', lambda e: self._on_repo_selected(e, enter_key=True))
+        self.repository_dropdown.bind('<KeyRelease>', self._on_repository_typed)
 
         ttk.Label(input_frame, text='Subfolder (in-repo path, optional):').grid(row=1, column=0, padx=5, pady=5, sticky=W)
         self.subfolder_entry = ttk.Entry(input_frame, textvariable=self.subfolder_var)
@@ -92,29 +123,62 @@ class HuggingFaceUploaderApp:
         self.browse_folder_button = ttk.Button(file_path_controls_frame, text="Browse Folder", command=self._browse_for_folder, width=12)
         self.browse_folder_button.grid(row=0, column=2, padx=(5, 0), sticky=W)
 
-        self.add_to_queue_button = ttk.Button(input_frame, text='Add to Queue', command=self._add_to_queue)
-        self.add_to_queue_button.grid(row=3, column=0, columnspan=2, pady=10)
+        ttk.Label(input_frame, text='Folder filters (optional globs):').grid(row=3, column=0, padx=5, pady=5, sticky=W)
+
+        glob_controls_frame = ttk.Frame(input_frame)
+        glob_controls_frame.grid(row=3, column=1, padx=5, pady=5, sticky=(W, tk.E))
+        glob_controls_frame.columnconfigure(1, weight=1)
+        glob_controls_frame.columnconfigure(3, weight=1)
+
+        ttk.Label(glob_controls_frame, text="Include:").grid(row=0, column=0, sticky=W)
+        ttk.Entry(glob_controls_frame, textvariable=self.include_globs_var).grid(row=0, column=1, padx=(2, 10), sticky=(W, tk.E))
+        ttk.Label(glob_controls_frame, text="Exclude:").grid(row=0, column=2, sticky=W)
+        ttk.Entry(glob_controls_frame, textvariable=self.exclude_globs_var).grid(row=0, column=3, padx=(2, 0), sticky=(W, tk.E))
+
+        add_controls_frame = ttk.Frame(input_frame)
+        add_controls_frame.grid(row=4, column=0, columnspan=2, pady=10)
+        ttk.Checkbutton(add_controls_frame, text="Sync (only changed files)", variable=self.sync_var,
+                        command=self._on_sync_toggled).pack(side=tk.LEFT, padx=(0, 5))
+        self.sync_delete_checkbutton = ttk.Checkbutton(add_controls_frame, text="Delete removed files",
+                                                       variable=self.sync_delete_var, state=tk.DISABLED)
+        self.sync_delete_checkbutton.pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(add_controls_frame, text="Priority:").pack(side=tk.LEFT, padx=(0, 2))
+        ttk.Spinbox(add_controls_frame, from_=-MAX_PRIORITY, to=MAX_PRIORITY, width=4,
+                    textvariable=self.priority_var).pack(side=tk.LEFT, padx=(0, 10))
+        self.add_to_queue_button = ttk.Button(add_controls_frame, text='Add to Queue', command=self._add_to_queue)
+        self.add_to_queue_button.pack(side=tk.LEFT)
 
         self.progress_bar = ttk.Progressbar(input_frame, orient=tk.HORIZONTAL,
                                             length=300, mode='determinate',
                                             variable=self.progress_var)
-        self.progress_bar.grid(row=4, column=0, columnspan=2, sticky=(W, tk.E), pady=(5,0))
+        self.progress_bar.grid(row=5, column=0, columnspan=2, sticky=(W, tk.E), pady=(5,0))
 
         self.status_label = ttk.Label(input_frame, textvariable=self.status_var, relief=tk.SUNKEN, anchor=W, wraplength=480)
-        self.status_label.grid(row=5, column=0, columnspan=2, sticky=(W, tk.E), pady=(5,0))
+        self.status_label.grid(row=6, column=0, columnspan=2, sticky=(W, tk.E), pady=(5,0))
+
+        metrics_frame = ttk.Frame(input_frame)
+        metrics_frame.grid(row=7, column=0, columnspan=2, sticky=(W, tk.E), pady=(5,0))
+        metrics_frame.columnconfigure(1, weight=1)
+        ttk.Label(metrics_frame, textvariable=self.throughput_var, width=34).grid(row=0, column=0, sticky=W)
+        self.throughput_canvas = tk.Canvas(metrics_frame, height=GRAPH_HEIGHT, background="white",
+                                           highlightthickness=1, highlightbackground="grey")
+        self.throughput_canvas.grid(row=0, column=1, sticky=(W, tk.E), padx=5)
+        ttk.Button(metrics_frame, text="Export Metrics...", command=self._export_metrics).grid(row=0, column=2)
 
         queue_frame = ttk.LabelFrame(outer_frame, text="Upload Queue", padding="10")
         queue_frame.grid(row=1, column=0, sticky=(W, tk.E, tk.N, tk.S), pady=(10,0))
         outer_frame.rowconfigure(1, weight=1)
         queue_frame.columnconfigure(0, weight=1)
 
-        self.queue_listbox = tk.Listbox(queue_frame, height=6, selectmode=tk.SINGLE)
-        self.queue_listbox.grid(row=0, column=0, columnspan=2, sticky=(W, tk.E, tk.N, tk.S), pady=5)
+        # Rows are keyed by job id and patched incrementally; drag selected queued rows to reorder them.
+        self.queue_view = QueueTreeView(queue_frame, height=8, on_select=self._update_queue_buttons_state,
+                                        on_move=self._on_rows_dragged)
+        self.queue_view.tree.grid(row=0, column=0, columnspan=2, sticky=(W, tk.E, tk.N, tk.S), pady=5)
         queue_frame.rowconfigure(0, weight=1)
 
-        scrollbar = ttk.Scrollbar(queue_frame, orient=tk.VERTICAL, command=self.queue_listbox.yview)
+        scrollbar = ttk.Scrollbar(queue_frame, orient=tk.VERTICAL, command=self.queue_view.tree.yview)
         scrollbar.grid(row=0, column=2, sticky=(tk.N, tk.S, W), pady=5)
-        self.queue_listbox.config(yscrollcommand=scrollbar.set)
+        self.queue_view.tree.config(yscrollcommand=scrollbar.set)
 
         queue_button_frame = ttk.Frame(queue_frame)
         queue_button_frame.grid(row=1, column=0, columnspan=2, sticky=(W, tk.E))
@@ -122,9 +186,123 @@ class HuggingFaceUploaderApp:
         self.remove_button = ttk.Button(queue_button_frame, text="Remove Selected", command=self._remove_selected_from_queue)
         self.remove_button.pack(side=tk.LEFT, padx=5)
 
+        self.move_top_button = ttk.Button(queue_button_frame, text="Move to Top", command=lambda: self._move_selected(True))
+        self.move_top_button.pack(side=tk.LEFT, padx=5)
+
+        self.move_bottom_button = ttk.Button(queue_button_frame, text="Move to Bottom", command=lambda: self._move_selected(False))
+        self.move_bottom_button.pack(side=tk.LEFT, padx=5)
+
+        self.raise_priority_button = ttk.Button(queue_button_frame, text="Priority +1", command=lambda: self._change_selected_priority(1))
+        self.raise_priority_button.pack(side=tk.LEFT, padx=5)
+
+        self.lower_priority_button = ttk.Button(queue_button_frame, text="Priority -1", command=lambda: self._change_selected_priority(-1))
+        self.lower_priority_button.pack(side=tk.LEFT, padx=5)
+
+        self.pause_button = ttk.Button(queue_button_frame, text="Pause", command=self._pause_selected)
+        self.pause_button.pack(side=tk.LEFT, padx=5)
+
+        self.resume_button = ttk.Button(queue_button_frame, text="Resume", command=self._resume_selected)
+        self.resume_button.pack(side=tk.LEFT, padx=5)
+
+        self.cancel_button = ttk.Button(queue_button_frame, text="Cancel", command=self._cancel_selected)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+
         self.clear_button = ttk.Button(queue_button_frame, text="Clear Queue", command=self._clear_queue)
         self.clear_button.pack(side=tk.LEFT, padx=5)
 
+        queue_options_frame = ttk.Frame(queue_frame)
+        queue_options_frame.grid(row=2, column=0, columnspan=2, sticky=(W, tk.E), pady=(5, 0))
+
+        ttk.Label(queue_options_frame, text="Parallel uploads:").pack(side=tk.LEFT, padx=(5, 2))
+        ttk.Spinbox(queue_options_frame, from_=1, to=MAX_WORKERS_LIMIT, width=4,
+                    textvariable=self.max_workers_var,
+                    command=self._on_concurrency_changed).pack(side=tk.LEFT)
+
+        ttk.Label(queue_options_frame, text="Per repo (0 = no limit):").pack(side=tk.LEFT, padx=(10, 2))
+        ttk.Spinbox(queue_options_frame, from_=0, to=MAX_WORKERS_LIMIT, width=4,
+                    textvariable=self.per_repo_limit_var,
+                    command=self._on_concurrency_changed).pack(side=tk.LEFT)
+
+        ttk.Label(queue_options_frame, text="Backend:").pack(side=tk.LEFT, padx=(10, 2))
+        self.backend_dropdown = ttk.Combobox(queue_options_frame, textvariable=self.backend_var,
+                                             values=list(BACKEND_NAMES), state="readonly", width=16)
+        self.backend_dropdown.pack(side=tk.LEFT)
+        self.backend_dropdown.bind('<<ComboboxSelected>>', self._on_backend_selected)
+
+        ttk.Checkbutton(queue_options_frame, text="Skip files already uploaded",
+                        variable=self.skip_unchanged_var,
+                        command=self._on_skip_unchanged_toggled).pack(side=tk.LEFT, padx=(10, 0))
+
+        ttk.Label(queue_options_frame, text="Retries:").pack(side=tk.LEFT, padx=(10, 2))
+        ttk.Spinbox(queue_options_frame, from_=0, to=MAX_RETRIES_LIMIT, width=4,
+                    textvariable=self.max_retries_var,
+                    command=self._on_max_retries_changed).pack(side=tk.LEFT)
+
+        ttk.Label(queue_options_frame, text="Jobs per commit (1 = no merging):").pack(side=tk.LEFT, padx=(10, 2))
+        ttk.Spinbox(queue_options_frame, from_=1, to=MAX_MERGE_JOBS_LIMIT, width=4,
+                    textvariable=self.merge_jobs_var,
+                    command=self._on_merge_jobs_changed).pack(side=tk.LEFT)
+
+        bandwidth_frame = ttk.Frame(queue_frame)
+        bandwidth_frame.grid(row=3, column=0, columnspan=2, sticky=(W, tk.E), pady=(5, 0))
+        bandwidth_frame.columnconfigure(5, weight=1)
+        bandwidth_frame.columnconfigure(7, weight=1)
+
+        ttk.Label(bandwidth_frame, text="Upload MB/s (0 = no limit):").grid(row=0, column=0, padx=(5, 2), sticky=W)
+        global_rate_spinbox = ttk.Spinbox(bandwidth_frame, from_=0, to=MAX_RATE_MB_LIMIT, increment=0.5, width=6,
+                                          textvariable=self.global_rate_var, command=self._on_bandwidth_changed)
+        global_rate_spinbox.grid(row=0, column=1, sticky=W)
+        ttk.Label(bandwidth_frame, text="Per job:").grid(row=0, column=2, padx=(10, 2), sticky=W)
+        job_rate_spinbox = ttk.Spinbox(bandwidth_frame, from_=0, to=MAX_RATE_MB_LIMIT, increment=0.5, width=6,
+                                       textvariable=self.job_rate_var, command=self._on_bandwidth_changed)
+        job_rate_spinbox.grid(row=0, column=3, sticky=W)
+        ttk.Label(bandwidth_frame, text="Per repo (repo=MB/s):").grid(row=0, column=4, padx=(10, 2), sticky=W)
+        repo_rates_entry = ttk.Entry(bandwidth_frame, textvariable=self.repo_rates_var)
+        repo_rates_entry.grid(row=0, column=5, sticky=(W, tk.E))
+        ttk.Label(bandwidth_frame, text="Schedule (22:00-07:00=0, ...):").grid(row=0, column=6, padx=(10, 2), sticky=W)
+        rate_schedule_entry = ttk.Entry(bandwidth_frame, textvariable=self.rate_schedule_var)
+        rate_schedule_entry.grid(row=0, column=7, sticky=(W, tk.E))
+        ttk.Button(bandwidth_frame, text="Apply", command=self._on_bandwidth_changed,
+                   width=6).grid(row=0, column=8, padx=(5, 0))
+        for widget in (global_rate_spinbox, job_rate_spinbox, repo_rates_entry, rate_schedule_entry):
+            widget.bind('<Return>', lambda e: self._on_bandwidth_changed())
+
+        scheduling_frame = ttk.Frame(queue_frame)
+        scheduling_frame.grid(row=4, column=0, columnspan=2, sticky=(W, tk.E), pady=(5, 0))
+        scheduling_frame.columnconfigure(3, weight=1)
+
+        ttk.Label(scheduling_frame, text="Run next by:").grid(row=0, column=0, padx=(5, 2), sticky=W)
+        policy_dropdown = ttk.Combobox(scheduling_frame, textvariable=self.policy_var, values=list(POLICY_NAMES),
+                                       state="readonly", width=14)
+        policy_dropdown.grid(row=0, column=1, sticky=W)
+        policy_dropdown.bind('<<ComboboxSelected>>', lambda e: self._on_scheduling_changed())
+        ttk.Label(scheduling_frame, text="Fair-share weights (repo=weight):").grid(row=0, column=2, padx=(10, 2), sticky=W)
+        repo_weights_entry = ttk.Entry(scheduling_frame, textvariable=self.repo_weights_var)
+        repo_weights_entry.grid(row=0, column=3, sticky=(W, tk.E))
+        repo_weights_entry.bind('<Return>', lambda e: self._on_scheduling_changed())
+        ttk.Button(scheduling_frame, text="Apply", command=self._on_scheduling_changed,
+                   width=6).grid(row=0, column=4, padx=(5, 0))
+
+        # Job results go to this log instead of modal dialogs, so an unattended queue keeps draining.
+        notification_frame = ttk.LabelFrame(outer_frame, text="Notifications", padding="10")
+        notification_frame.grid(row=2, column=0, sticky=(W, tk.E, tk.N, tk.S), pady=(10,0))
+        outer_frame.rowconfigure(2, weight=1)
+        notification_frame.columnconfigure(0, weight=1)
+        notification_frame.rowconfigure(0, weight=1)
+
+        self.notification_text = tk.Text(notification_frame, height=6, wrap=tk.WORD, state=tk.DISABLED)
+        self.notification_text.grid(row=0, column=0, sticky=(W, tk.E, tk.N, tk.S), pady=5)
+        self.notification_text.tag_configure("success", foreground="green")
+        self.notification_text.tag_configure("error", foreground="red")
+        self.notification_text.tag_configure("retry", foreground="darkorange")
+
+        notification_scrollbar = ttk.Scrollbar(notification_frame, orient=tk.VERTICAL, command=self.notification_text.yview)
+        notification_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S, W), pady=5)
+        self.notification_text.config(yscrollcommand=notification_scrollbar.set)
+
+        ttk.Button(notification_frame, text="Clear Notifications",
+                   command=self._clear_notifications).grid(row=1, column=0, sticky=W, padx=5)
+
     def _browse_for_file(self):
         filepath = filedialog.askopenfilename(
             title="Select file to upload"
@@ -146,6 +324,11 @@ class HuggingFaceUploaderApp:
         if enter_key:
             self.subfolder_entry.focus()
 
+    def _on_repository_typed(self, event):
+        if event.keysym in ("Return", "Up", "Down", "Escape", "Tab"):
+            return
+        self.repository_dropdown["values"] = self.upload_manager.history.suggest(self.repository_var.get())
+
     def _on_drop_files(self, event):
         self.file_paths_var.set("")
         try:
@@ -157,181 +340,200 @@ class HuggingFaceUploaderApp:
             self._update_status(f"Drop processing error: {e}", error=True)
 
     def _add_to_queue(self):
-        repository_value = self.repository_var.get().strip()
-        file_paths_display_str = self.file_paths_var.get().strip()
-        subfolder_value = self.subfolder_var.get().strip()
+        try:
+            job = self.upload_manager.enqueue(self.repository_var.get(),
+                                              self.subfolder_var.get(),
+                                              self.file_paths_var.get(),
+                                              include_globs=shlex.split(self.include_globs_var.get()),
+                                              exclude_globs=shlex.split(self.exclude_globs_var.get()),
+                                              priority=self.priority_var.get(),
+                                              sync=self.sync_var.get(),
+                                              sync_delete=self.sync_delete_var.get())
+        except (tk.TclError, ValueError) as e:
+            messagebox.showerror("Input Error", str(e))
+            return
+        self._update_queue_display()
+        self._update_status(f"Job ID:{job.id} added to queue.", processing=True)
+
+    def _on_sync_toggled(self):
+        self.sync_delete_checkbutton.config(state=tk.NORMAL if self.sync_var.get() else tk.DISABLED)
 
-        if not repository_value:
-            messagebox.showerror("Input Error", "Please specify the Repository (e.g., YourUsername/RepoName).")
+    def _on_concurrency_changed(self):
+        try:
+            max_workers = int(self.max_workers_var.get())
+            per_repo_limit = int(self.per_repo_limit_var.get())
+        except (tk.TclError, ValueError):
             return
-        
-        # Removed repository format warning
+        self.upload_manager.set_limits(max_workers=max_workers, per_repo_limit=per_repo_limit)
 
-        if not file_paths_display_str:
-            messagebox.showerror("Input Error", "Please specify or drag & drop/select File/Folder Paths.")
+    def _on_backend_selected(self, event=None):
+        backend_name = self.backend_var.get()
+        try:
+            self.upload_manager.set_backend(backend_name)
+        except ImportError as e:
+            messagebox.showerror("Backend Error", str(e))
+            self.backend_var.set(self.upload_manager.backend_name)
             return
+        self._update_status(f"Upload backend: {backend_name}. Applies to jobs started from now on.")
 
-        self.current_job_id_counter += 1
-        job = UploadJob(id=self.current_job_id_counter,
-                        repository=repository_value,
-                        subfolder=subfolder_value,
-                        file_paths_display_str=file_paths_display_str)
-        self.upload_queue.append(job)
-        self._update_queue_listbox_display()
-        self._update_status(f"Job ID:{job.id} added to queue.", processing=True)
-        
-        self._process_next_in_queue_if_idle()
-
-    def _process_next_in_queue_if_idle(self):
-        with self.is_processing_lock:
-            if self.current_processing_job is None and self.upload_queue:
-                self.current_processing_job = self.upload_queue.popleft()
-                self._update_queue_listbox_display()
-                
-                self.progress_var.set(0)
-                self._update_status(f"Processing queue: Job ID:{self.current_processing_job.id} ({self.current_processing_job.repository})", processing=True)
-
-                thread = threading.Thread(target=self._execute_upload_command_for_job,
-                                          args=(self.current_processing_job,),
-                                          daemon=True)
-                thread.start()
-            elif not self.upload_queue and self.current_processing_job is None:
-                 self._update_status("Queue is empty. Ready.", processing=False)
-
-    def _execute_upload_command_for_job(self, job: UploadJob):
-        all_stdout_lines = []
-        all_stderr_lines = []
-        process = None
-        success = False
-        message = ""
+    def _on_skip_unchanged_toggled(self):
+        self.upload_manager.set_skip_unchanged(self.skip_unchanged_var.get())
+
+    def _on_bandwidth_changed(self):
         try:
-            repository = job.repository
-            file_paths_display_str = job.file_paths_display_str
-            subfolder_val = job.subfolder
-
-            command_parts = ["huggingface-cli", "upload"]
-            command_parts.append(repository)
-            actual_paths = shlex.split(file_paths_display_str)
-            
-            if not actual_paths:
-                message = f"Job ID:{job.id} Error: No files specified for upload."
-                self.root.after(0, self._handle_job_completion, job, False, message)
-                return
-
-            path_in_repo_str = ""
-            if len(actual_paths) == 1:
-                local_item_path = actual_paths[0]
-                base_item_name = os.path.basename(local_item_path)
-                if subfolder_val.strip():
-                    clean_subfolder = subfolder_val.strip().replace("\\", "/")
-                    if not clean_subfolder.endswith('/'):
-                        clean_subfolder += '/'
-                    path_in_repo_str = clean_subfolder + base_item_name
-                else:
-                    path_in_repo_str = base_item_name
-            elif len(actual_paths) > 1:
-                path_in_repo_str = subfolder_val.strip().replace("\\", "/") if subfolder_val.strip() else "."
-                if not path_in_repo_str: path_in_repo_str = "."
-            else:
-                 message = f"Job ID:{job.id} Error: Parsed file paths are empty."
-                 self.root.after(0, self._handle_job_completion, job, False, message)
-                 return
-
-            command_parts.extend(actual_paths)
-            command_parts.append(path_in_repo_str)
-            
-            # print(f"DEBUG: Executing for Job ID:{job.id}: {command_parts}") 
-
-            display_command_str = " ".join([shlex.quote(part) for part in command_parts])
-            self.root.after(0, lambda cmd_str=display_command_str, jid=job.id: self._update_status(f"Job ID:{jid} Executing: {cmd_str}"))
-            self.root.after(0, self.progress_var.set, 0)
-
-            progress_regex = re.compile(r"(\d{1,3})\s*%\|")
-
-            process = subprocess.Popen(command_parts, shell=False,
-                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                       text=True, encoding='utf-8', errors='replace', bufsize=1)
-
-            if process.stderr:
-                for line in iter(process.stderr.readline, ''):
-                    line_strip = line.strip()
-                    all_stderr_lines.append(line)
-                    current_status_message = f"Job ID:{job.id} Processing: {line_strip[:80]}"
-                    if len(line_strip) > 80: current_status_message += "..."
-                    self.root.after(0, lambda msg=current_status_message: self._update_status(msg, processing=True))
-                    match = progress_regex.search(line_strip)
-                    if match:
-                        percentage = int(match.group(1))
-                        self.root.after(0, self.progress_var.set, percentage)
-                process.stderr.close()
-            
-            if process.stdout:
-                for line in iter(process.stdout.readline, ''):
-                    all_stdout_lines.append(line)
-                process.stdout.close()
-
-            process.wait()
-            return_code = process.returncode
-            final_stdout = "".join(all_stdout_lines)
-            final_stderr = "".join(all_stderr_lines)
-
-            if return_code == 0:
-                success = True
-                message_detail = final_stdout.strip()
-                if not message_detail and final_stderr.strip():
-                    message_detail = final_stderr.strip()
-                message = f"Job ID:{job.id} Upload successful.\n{message_detail}"
-                message = message[:1000] + "..." if len(message) > 1000 else message
+            global_limit = mb_to_bytes(self.global_rate_var.get())
+            per_job_limit = mb_to_bytes(self.job_rate_var.get())
+            repo_limits = parse_repo_limits(self.repo_rates_var.get())
+            schedule = parse_schedule(self.rate_schedule_var.get())
+        except (tk.TclError, ValueError) as e:
+            self._update_status(f"Bandwidth settings not applied: {e}", error=True)
+            return
+        self.upload_manager.set_bandwidth_limits(global_limit=global_limit, per_job_limit=per_job_limit,
+                                                 repo_limits=repo_limits, schedule=schedule)
+        current_limit = self.upload_manager.bandwidth_limiter.effective_global_limit()
+        self._update_status(f"Upload limit now {format_rate(current_limit)} in total, "
+                            f"{format_rate(per_job_limit)} per job.")
+
+    def _on_scheduling_changed(self):
+        try:
+            repo_weights = parse_repo_weights(self.repo_weights_var.get())
+        except ValueError as e:
+            self._update_status(f"Scheduling not changed: {e}", error=True)
+            return
+        self.upload_manager.set_scheduling_policy(self.policy_var.get(), repo_weights)
+        self._update_status(f"Next jobs are picked by {self.policy_var.get()}.")
+
+    def _on_max_retries_changed(self):
+        try:
+            max_retries = int(self.max_retries_var.get())
+        except (tk.TclError, ValueError):
+            return
+        self.upload_manager.set_max_retries(max_retries)
+
+    def _on_merge_jobs_changed(self):
+        try:
+            max_jobs = int(self.merge_jobs_var.get())
+        except (tk.TclError, ValueError):
+            return
+        self.upload_manager.set_merge_limits(max_jobs=max_jobs)
+
+    def _restore_saved_queue(self):
+        restored_jobs = self.upload_manager.restore()
+        if restored_jobs:
+            self._update_queue_display()
+            self._update_status(f"Resumed {len(restored_jobs)} job(s) from the previous session.", processing=True)
+
+    def _on_close(self):
+        self.upload_manager.close()
+        self.root.destroy()
+
+    def _on_job_started(self, job: UploadJob):
+        self._update_queue_display()
+        self._update_overall_progress()
+        self._update_status(f"Processing queue: Job ID:{job.id} ({job.repository})", processing=True)
+
+    def _poll_ui_events(self):
+        try:
+            for callback, args in self.ui_events.drain():
+                callback(*args)
+        finally:
+            self.root.after(1000 // UI_UPDATES_PER_SECOND, self._poll_ui_events)
+
+    def _refresh_metrics(self):
+        try:
+            metrics = self.upload_manager.metrics
+            rate = metrics.current_rate()
+            if self.upload_manager.is_idle():
+                self.throughput_var.set("Idle")
             else:
-                error_details = final_stderr.strip()
-                if not error_details and final_stdout.strip():
-                    error_details = final_stdout.strip()
-                error_message_content = f"Error (code: {return_code}):\n{error_details}"
-                message = f"Job ID:{job.id} {error_message_content}"
-                message = message[:1000] + "..." if len(message) > 1000 else message
-                # print(f"--- UPLOAD FAILED (Job ID:{job.id}) ---\nFull error message:\n{error_message_content}\nSTDOUT:\n{final_stdout}\n------------------------------------")
-
-        except FileNotFoundError:
-            message = f"Job ID:{job.id} Error: huggingface-cli not found. Check your PATH."
-            # print(f"--- ERROR (Job ID:{job.id}): huggingface-cli not found ---")
-            traceback.print_exc()
-        except Exception as e:
-            # print(f"--- AN UNEXPECTED ERROR OCCURRED (Job ID:{job.id}) ---")
-            traceback.print_exc()
-            tb_str = traceback.format_exc()
-            error_msg_for_dialog = f"Unexpected Error:\n{e}\n\nTraceback (first 500 chars):\n{tb_str[:500]}..." if len(tb_str) > 500 else f"Unexpected Error:\n{e}\n\nTraceback:\n{tb_str}"
-            message = f"Job ID:{job.id} {error_msg_for_dialog}"
+                self.throughput_var.set(f"{format_bytes(rate) + '/s' if rate else 'Starting...'}  "
+                                        f"ETA {format_duration(self.upload_manager.eta_seconds())}")
+            self._draw_throughput_graph(metrics.throughput_series(GRAPH_SECONDS))
         finally:
-            rc = process.returncode if process and hasattr(process, 'returncode') else -1
-            current_progress = self.progress_var.get()
-            if success and current_progress < 100 :
-                 self.root.after(0, self.progress_var.set, 100)
-            elif not success and current_progress > 0 :
-                 self.root.after(0, self.progress_var.set, 0)
-            self.root.after(0, self._handle_job_completion, job, success, message)
+            self.root.after(METRICS_REFRESH_MS, self._refresh_metrics)
+
+    def _draw_throughput_graph(self, series):
+        canvas = self.throughput_canvas
+        canvas.delete("all")
+        width = canvas.winfo_width()
+        peak = max(series, default=0)
+        if width < 2 or not peak:
+            return
+        step = width / max(1, len(series) - 1)
+        points = []
+        for index, num_bytes in enumerate(series):
+            points.extend((index * step, GRAPH_HEIGHT - 2 - (GRAPH_HEIGHT - 4) * num_bytes / peak))
+        canvas.create_line(*points, fill="steelblue", width=2)
+        canvas.create_text(4, 2, anchor=tk.NW, text=f"peak {format_bytes(peak)}/s", fill="grey")
+
+    def _export_metrics(self):
+        path = filedialog.asksaveasfilename(title="Export upload metrics", defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            self.upload_manager.metrics.export(path)
+        except OSError as e:
+            messagebox.showerror("Export Error", f"Could not write {path}: {e}")
+            return
+        self._update_status(f"Metrics exported to {path}.")
+
+    def _on_job_progress(self):
+        self._refresh_running_rows()
+        self._update_overall_progress()
+
+    def _update_overall_progress(self):
+        running_jobs = self.worker_pool.running_jobs()
+        if running_jobs:
+            self.progress_var.set(sum(job.progress for job in running_jobs) / len(running_jobs))
 
     def _handle_job_completion(self, job: UploadJob, success: bool, message: str):
-        with self.is_processing_lock:
-            if self.current_processing_job and self.current_processing_job.id == job.id:
-                self.current_processing_job = None
-            # else:
-                # print(f"Warning: Job completion for ID:{job.id} but current_processing_job is {self.current_processing_job}")
+        self._update_queue_display()
+        queue_drained = self.upload_manager.is_idle()
 
         if success:
-            self.root.after(0, self.progress_var.set, 100)
             self._update_status(f"Job ID:{job.id} Upload successful!", success=True)
-            if not self.upload_queue:
-                messagebox.showinfo(f"Job ID:{job.id} Upload Successful", message)
-            self._add_to_history(job.repository)
-            self._save_history()
             self._update_repository_dropdown()
+        elif job.status == JOB_CANCELLED:
+            self._update_status(f"Job ID:{job.id} Cancelled.")
         else:
-            if self.progress_var.get() > 0:
-                self.root.after(0, self.progress_var.set, 0)
             self._update_status(f"Job ID:{job.id} Upload failed.", error=True)
-            messagebox.showerror(f"Job ID:{job.id} Upload Failed", message)
-        
-        self._process_next_in_queue_if_idle()
+
+        if queue_drained:
+            self.progress_var.set(100 if success else 0)
+        else:
+            self._update_overall_progress()
+
+        if job.parent_id is not None:
+            return  # parts of a split folder upload are reported once, by their parent job
+        self._notify(message, "success" if success else None if job.status == JOB_CANCELLED else "error")
+        if queue_drained:
+            self._notify("Queue finished.")
+
+    def _handle_job_retry(self, job: UploadJob, delay: float, message: str):
+        self._update_queue_display()
+        self._update_status(f"Job ID:{job.id} failed, retrying in {delay:.0f}s (retry {job.attempt}).", processing=True)
+        self._notify(f"Job ID:{job.id} will be retried in {delay:.0f}s (retry {job.attempt}): {message}", "retry")
+
+    def _handle_job_paused(self, job: UploadJob, message: str):
+        self._update_queue_display()
+        self._update_status(f"Job ID:{job.id} Paused.")
+        if job.parent_id is None:
+            self._notify(message)
+
+    def _notify(self, message, level=None):
+        self.notification_text.config(state=tk.NORMAL)
+        self.notification_text.insert(END, f"[{time.strftime('%H:%M:%S')}] {message.strip()}\n", level or ())
+        line_count = int(self.notification_text.index("end-1c").split(".")[0]) - 1
+        if line_count > MAX_NOTIFICATION_LINES:
+            self.notification_text.delete("1.0", f"{line_count - MAX_NOTIFICATION_LINES + 1}.0")
+        self.notification_text.see(END)
+        self.notification_text.config(state=tk.DISABLED)
+
+    def _clear_notifications(self):
+        self.notification_text.config(state=tk.NORMAL)
+        self.notification_text.delete("1.0", END)
+        self.notification_text.config(state=tk.DISABLED)
 
     def _update_status(self, message, processing=False, success=False, error=False):
         self.status_var.set(message)
@@ -352,109 +554,115 @@ class HuggingFaceUploaderApp:
             fg_color = "blue"
         self.status_label.config(foreground=fg_color)
 
-    def _load_history(self):
-        try:
-            if os.path.exists(HISTORY_FILE):
-                with open(HISTORY_FILE, "r", encoding='utf-8') as f:
-                    loaded_history = []
-                    seen = set()
-                    for line in reversed(f.readlines()):
-                        repo = line.strip()
-                        if repo and repo not in seen:
-                            loaded_history.append(repo)
-                            seen.add(repo)
-                            if len(loaded_history) >= MAX_HISTORY_ITEMS:
-                                break
-                    self.repository_history.clear()
-                    for repo in reversed(loaded_history):
-                         self.repository_history.append(repo)
-        except IOError as e:
-            self._update_status(f"Error loading history file: {e}", error=True)
-
-    def _add_to_history(self, repository_name):
-        if repository_name in self.repository_history:
-            self.repository_history.remove(repository_name)
-        self.repository_history.append(repository_name)
-
-    def _save_history(self):
-        try:
-            with open(HISTORY_FILE, "w", encoding='utf-8') as f:
-                for repo in list(self.repository_history):
-                    f.write(f"{repo}\n")
-        except IOError as e:
-            self._update_status(f"Error writing history file: {e}", error=True)
-
     def _update_repository_dropdown(self):
-        history_list = list(self.repository_history)
-        self.repository_dropdown["values"] = list(reversed(history_list))
-        current_repo_val = self.repository_var.get()
-        if history_list:
-            if not current_repo_val or current_repo_val not in history_list:
-                last_used_repo = history_list[-1]
-                self.repository_var.set(last_used_repo)
-        elif not current_repo_val:
-             self.repository_var.set("")
-             self.repository_dropdown["values"] = []
-
-    def _update_queue_listbox_display(self):
-        self.queue_listbox.delete(0, END)
-        if self.current_processing_job:
-            self.queue_listbox.insert(END, f"[Processing] {str(self.current_processing_job)}")
-        for job in self.upload_queue:
-            self.queue_listbox.insert(END, str(job))
+        history = self.upload_manager.history
+        self.repository_dropdown["values"] = history.suggest(self.repository_var.get())
+        if not self.repository_var.get().strip():
+            self.repository_var.set(history.most_recent() or "")
+
+    def _update_queue_display(self):
+        self.queue_view.sync(self.worker_pool.running_jobs(), self.upload_manager.planning_jobs(),
+                             self.worker_pool.pending_jobs(), self.upload_manager.paused_jobs())
         self._update_queue_buttons_state()
 
+    def _refresh_running_rows(self):
+        # Only the running rows change on progress; the view skips rows whose text is unchanged.
+        self.queue_view.refresh_rows(self.worker_pool.running_jobs())
+
     def _remove_selected_from_queue(self):
-        selected_indices = self.queue_listbox.curselection()
-        if not selected_indices:
+        selected_ids = self.queue_view.selected_ids()
+        if not selected_ids:
             messagebox.showwarning("Deletion Error", "Please select an item from the queue to remove.")
             return
+        pending_ids = self.queue_view.selected_pending_ids()
+        if not pending_ids:
+            messagebox.showinfo("Information", "A running job cannot be removed. Please wait for completion.")
+            return
 
-        selected_index_in_listbox = selected_indices[0]
-        if self.current_processing_job and selected_index_in_listbox == 0:
-             messagebox.showinfo("Information", "The currently processing job cannot be removed. Please wait for completion.")
-             return
-
-        actual_deque_index = selected_index_in_listbox
-        if self.current_processing_job:
-            actual_deque_index -=1
-
-        if 0 <= actual_deque_index < len(self.upload_queue):
-            temp_list = list(self.upload_queue)
-            job_to_remove = temp_list.pop(actual_deque_index)
-            self.upload_queue = deque(temp_list)
-            self._update_queue_listbox_display()
-            self._update_status(f"Job ID:{job_to_remove.id} removed from queue.", processing=True)
+        removed_jobs = self.upload_manager.remove_pending_many(pending_ids)
+        self.queue_view.remove_rows([job.id for job in removed_jobs])
+        self._update_queue_display()
+        if len(removed_jobs) == 1:
+            self._update_status(f"Job ID:{removed_jobs[0].id} removed from queue.", processing=True)
+        elif removed_jobs:
+            self._update_status(f"{len(removed_jobs)} jobs removed from queue.", processing=True)
         else:
-            messagebox.showerror("Error", "Could not remove selected item from queue. Index out of range.")
-        self._update_queue_buttons_state()
+            messagebox.showerror("Error", "Could not remove selected item from queue. It may have already started.")
+
+    def _move_selected(self, to_front):
+        pending_ids = self.queue_view.selected_pending_ids()
+        if to_front:
+            first_job = next(iter(self.worker_pool.pending_jobs()), None)
+            moved_ids = self.upload_manager.move_pending_to_front(pending_ids)
+            self.queue_view.move_rows(moved_ids, first_job.id if first_job else None)
+        else:
+            moved_ids = self.upload_manager.move_pending(pending_ids)
+            self.queue_view.move_rows(moved_ids)
+        self._update_queue_display()
+
+    def _change_selected_priority(self, delta):
+        ids_by_priority = {}
+        for job_id in self.queue_view.selected_pending_ids():
+            job = self.worker_pool.pending_job(job_id)
+            if job is not None:
+                priority = max(-MAX_PRIORITY, min(MAX_PRIORITY, job.priority + delta))
+                ids_by_priority.setdefault(priority, []).append(job_id)
+        for priority, job_ids in ids_by_priority.items():
+            self.queue_view.refresh_rows(self.upload_manager.set_priority(job_ids, priority), SECTION_PENDING)
+
+    def _on_rows_dragged(self, job_ids, before_job_id):
+        moved_ids = self.upload_manager.move_pending(job_ids, before_job_id)
+        self.queue_view.move_rows(moved_ids, before_job_id)
+        self._update_queue_display()
+
+    def _pause_selected(self):
+        paused, stopping = self.upload_manager.pause(self.queue_view.selected_ids_in(SECTION_RUNNING, SECTION_PENDING))
+        self._update_queue_display()
+        if stopping:
+            self._update_status(f"Stopping {len(stopping)} running job(s) to pause them...", processing=True)
+        elif paused:
+            self._update_status(f"{len(paused)} job(s) paused.")
+
+    def _resume_selected(self):
+        resumed = self.upload_manager.resume(self.queue_view.selected_ids_in(SECTION_PAUSED))
+        self._update_queue_display()
+        if resumed:
+            self._update_status(f"{len(resumed)} job(s) resumed.", processing=True)
+
+    def _cancel_selected(self):
+        job_ids = self.queue_view.selected_ids_in(SECTION_RUNNING, SECTION_PENDING, SECTION_PAUSED)
+        if not job_ids or not messagebox.askyesno("Cancel Jobs", f"Cancel {len(job_ids)} selected job(s)?\n"
+                                                                  "Running uploads are stopped straight away."):
+            return
+        affected = self.upload_manager.cancel(job_ids)
+        self.queue_view.remove_rows([job.id for job in affected if job.status != JOB_RUNNING])
+        self._update_queue_display()
+        self._update_status(f"{len(affected)} job(s) cancelled.", processing=True)
 
     def _clear_queue(self):
-        if not self.upload_queue:
+        if not self.worker_pool.pending_count():
             messagebox.showinfo("Information", "The pending queue is already empty.")
             return
-        if messagebox.askyesno("Clear Queue", "Are you sure you want to remove all pending jobs from the queue?\n(The currently processing job will not be removed.)"):
-            self.upload_queue.clear()
-            self._update_queue_listbox_display()
+        if messagebox.askyesno("Clear Queue", "Are you sure you want to remove all pending jobs from the queue?\n(Running jobs will not be removed.)"):
+            removed_jobs = self.upload_manager.clear_pending()
+            self.queue_view.remove_rows([job.id for job in removed_jobs])
+            self._update_queue_display()
             self._update_status("Pending queue cleared.", processing=True)
-            if not self.current_processing_job:
+            if self.upload_manager.is_idle():
                  self._update_status("Ready", processing=False)
         self._update_queue_buttons_state()
 
     def _update_queue_buttons_state(self):
-        has_selection_in_listbox = bool(self.queue_listbox.curselection())
-        can_remove_selected = False
-        if has_selection_in_listbox:
-            selected_index_in_listbox = self.queue_listbox.curselection()[0]
-            if self.current_processing_job and selected_index_in_listbox == 0:
-                can_remove_selected = False
-            else:
-                actual_deque_index = selected_index_in_listbox
-                if self.current_processing_job: actual_deque_index -= 1
-                if 0 <= actual_deque_index < len(self.upload_queue):
-                    can_remove_selected = True
-        self.remove_button.config(state=tk.NORMAL if can_remove_selected else tk.DISABLED)
-        self.clear_button.config(state=tk.NORMAL if len(self.upload_queue) > 0 else tk.DISABLED)
+        selection_state = tk.NORMAL if self.queue_view.selected_pending_ids() else tk.DISABLED
+        for button in (self.remove_button, self.move_top_button, self.move_bottom_button,
+                       self.raise_priority_button, self.lower_priority_button):
+            button.config(state=selection_state)
+        selected = {self.queue_view.section_of(job_id) for job_id in self.queue_view.selected_ids()}
+        self.pause_button.config(state=tk.NORMAL if selected & {SECTION_RUNNING, SECTION_PENDING} else tk.DISABLED)
+        self.resume_button.config(state=tk.NORMAL if SECTION_PAUSED in selected else tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL if selected & {SECTION_RUNNING, SECTION_PENDING, SECTION_PAUSED}
+                                  else tk.DISABLED)
+        self.clear_button.config(state=tk.NORMAL if self.worker_pool.pending_count() > 0 else tk.DISABLED)
 
 if __name__ == '__main__':
     root = TkinterDnD.Tk() # This is the main window from TkinterDnD
@@ -0,0 +1,8 @@
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+# benchmarks/fake_hf_cli.py stands in for huggingface-cli.
+FAKE_CLI = (sys.executable, os.path.join(REPO_DIR, "benchmarks", "fake_hf_cli.py"))
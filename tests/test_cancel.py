@@ -0,0 +1,188 @@
+"""Cancel, pause and resume take effect within a second, for queued and running jobs.
+
+Jobs run through ``UploadManager`` and ``CliUploadBackend`` with
+benchmarks/fake_hf_cli.py, each taking far longer than the tests wait.
+"""
+import shlex
+import threading
+import time
+
+import pytest
+
+from conftest import FAKE_CLI
+from upload_backends import CliUploadBackend
+from upload_engine import JOB_CANCELLED, JOB_PAUSED, JOB_QUEUED, JOB_REMOVED, JOB_SUCCEEDED
+from upload_manager import UploadManager
+
+LATENCY_BOUND_SECONDS = 1.0
+WAIT_SECONDS = 30
+
+
+class Timeline:
+    """When each job hit each event (``started``, ``paused``, ``finished``), in order."""
+
+    def __init__(self):
+        self.times = {}
+        self._condition = threading.Condition()
+
+    def mark(self, event, job):
+        with self._condition:
+            self.times.setdefault((event, job.id), []).append(time.perf_counter())
+            self._condition.notify_all()
+
+    def wait(self, event, job_id, count=1):
+        """Time of the ``count``-th ``event`` of ``job_id``."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: len(self.times.get((event, job_id), ())) >= count,
+                                            WAIT_SECONDS):
+                raise TimeoutError(f"job {job_id} never reached {event!r} #{count}")
+            return self.times[(event, job_id)][count - 1]
+
+
+def wait_for(predicate):
+    deadline = time.monotonic() + WAIT_SECONDS
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError("condition not met")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def timeline():
+    return Timeline()
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch, timeline):
+    monkeypatch.setenv("FAKE_HF_LATENCY", "60")
+    monkeypatch.setenv("FAKE_HF_STEPS", "600")
+    manager = UploadManager(max_workers=1, merge_max_jobs=1,
+                            queue_db_path=str(tmp_path / "queue.sqlite3"),
+                            hash_cache_path=str(tmp_path / "cache.sqlite3"),
+                            history_db_path=str(tmp_path / "history.sqlite3"), legacy_history_file=None,
+                            sync_manifest_path=str(tmp_path / "sync.sqlite3"),
+                            on_job_started=lambda job: timeline.mark("started", job),
+                            on_job_paused=lambda job, message: timeline.mark("paused", job),
+                            on_job_finished=lambda job, success, message: timeline.mark("finished", job))
+    backend = CliUploadBackend(FAKE_CLI, limiter=manager.bandwidth_limiter)
+    manager.backends[backend.name] = backend
+    manager.set_backend(backend.name)
+    yield manager
+    manager.cancel([job.id for job in manager.pool.pending_jobs() + manager.pool.running_jobs()
+                    + manager.paused_jobs()])
+    manager.wait_until_idle(WAIT_SECONDS)
+    manager.close()
+
+
+@pytest.fixture
+def jobs(tmp_path, manager, timeline):
+    """A running job and a job queued behind it."""
+    paths = []
+    for name in ("first.bin", "second.bin"):
+        paths.append(tmp_path / name)
+        paths[-1].write_bytes(name.encode() * 1000)
+    # Jobs are planned concurrently, so the second is only queued once the first is running.
+    first = manager.enqueue("test/model", "", str(paths[0]))
+    timeline.wait("started", first.id)
+    second = manager.enqueue("test/model", "", str(paths[1]))
+    wait_for(lambda: manager.pool.pending_job(second.id) is not None)
+    time.sleep(0.3)  # let the CLI get going
+    return first, second
+
+
+def test_cancel_running_job(manager, timeline, jobs):
+    first, second = jobs
+    requested = time.perf_counter()
+    manager.cancel([first.id])
+    assert timeline.wait("finished", first.id) - requested < LATENCY_BOUND_SECONDS
+    assert timeline.wait("started", second.id) - requested < LATENCY_BOUND_SECONDS
+    assert first.status == JOB_CANCELLED
+
+
+def test_pause_and_resume_running_job(manager, timeline, jobs):
+    first, second = jobs
+    requested = time.perf_counter()
+    manager.pause([first.id])
+    assert timeline.wait("paused", first.id) - requested < LATENCY_BOUND_SECONDS
+    assert timeline.wait("started", second.id) - requested < LATENCY_BOUND_SECONDS
+    assert first.status == JOB_PAUSED
+    assert [job.id for job in manager.paused_jobs()] == [first.id]
+
+    manager.cancel([second.id])
+    timeline.wait("finished", second.id)
+    requested = time.perf_counter()
+    manager.resume([first.id])
+    assert timeline.wait("started", first.id, count=2) - requested < LATENCY_BOUND_SECONDS
+    assert not manager.paused_jobs()
+
+
+def test_pause_and_resume_queued_job(manager, timeline, jobs):
+    first, second = jobs
+    requested = time.perf_counter()
+    manager.pause([second.id])
+    assert timeline.wait("paused", second.id) - requested < LATENCY_BOUND_SECONDS
+    assert second.status == JOB_PAUSED
+    assert manager.pool.pending_job(second.id) is None
+
+    requested = time.perf_counter()
+    manager.resume([second.id])
+    assert time.perf_counter() - requested < LATENCY_BOUND_SECONDS
+    assert second.status == JOB_QUEUED
+    assert manager.pool.pending_job(second.id) is second
+
+    requested = time.perf_counter()
+    manager.cancel([first.id])
+    assert timeline.wait("started", second.id) - requested < LATENCY_BOUND_SECONDS
+
+
+def test_cancel_queued_and_paused_jobs(manager, timeline, jobs):
+    first, second = jobs
+    requested = time.perf_counter()
+    manager.cancel([second.id])
+    assert time.perf_counter() - requested < LATENCY_BOUND_SECONDS
+    assert second.status == JOB_REMOVED
+    assert manager.pool.pending_job(second.id) is None
+
+    manager.pause([first.id])
+    timeline.wait("paused", first.id)
+    requested = time.perf_counter()
+    manager.cancel([first.id])
+    assert timeline.wait("finished", first.id) - requested < LATENCY_BOUND_SECONDS
+    assert first.status == JOB_CANCELLED
+    assert manager.pool.is_idle()
+
+
+def test_resume_skips_finished_items(tmp_path, monkeypatch, manager, timeline):
+    log_file = tmp_path / "uploaded.log"
+    monkeypatch.setenv("FAKE_HF_LOG_FILE", str(log_file))
+    monkeypatch.setenv("FAKE_HF_LATENCY", "2")
+    monkeypatch.setenv("FAKE_HF_STEPS", "20")
+    paths = []
+    for name in ("a.bin", "b.bin", "c.bin"):
+        paths.append(str(tmp_path / name))
+        (tmp_path / name).write_bytes(name.encode() * 1000)
+    job = manager.enqueue("test/model", "", shlex.join(paths))
+    timeline.wait("started", job.id)
+    wait_for(lambda: job.completed_paths)
+    manager.pause([job.id])
+    timeline.wait("paused", job.id)
+    assert job.completed_paths == {paths[0]}
+
+    monkeypatch.setenv("FAKE_HF_LATENCY", "0.1")
+    manager.resume([job.id])
+    timeline.wait("finished", job.id)
+    assert job.status == JOB_SUCCEEDED
+    assert log_file.read_text(encoding="utf-8").splitlines() == paths
+
+
+def test_cancelling_parts_cancels_split_job(tmp_path, manager, timeline):
+    folder = tmp_path / "folder"
+    folder.mkdir()
+    for name in ("a.bin", "b.bin"):
+        (folder / name).write_bytes(name.encode() * 1000)
+    manager.set_batch_limits(max_files_per_batch=1)
+    parent = manager.enqueue("test/model", "", str(folder))
+    wait_for(lambda: manager.pool.running_jobs() and manager.pool.pending_jobs())
+    manager.cancel([job.id for job in manager.pool.running_jobs() + manager.pool.pending_jobs()])
+    timeline.wait("finished", parent.id)
+    assert parent.status == JOB_CANCELLED
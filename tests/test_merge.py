@@ -0,0 +1,50 @@
+"""Queued jobs that write overlapping repo paths are never merged into one commit."""
+import pytest
+
+from upload_engine import UploadJob
+from upload_merge import CommitMerger, RepoPaths
+
+
+def merge_key(job):
+    return job.repository
+
+
+def make_job(job_id, paths, subfolder=""):
+    job = UploadJob(id=job_id, repository="test/model", subfolder=subfolder, file_paths_display_str=paths,
+                    total_bytes=100)
+    CommitMerger.prepare(job, merge_key)
+    return job
+
+
+def followers(leader, queued):
+    merged = CommitMerger(max_jobs=10).collect(leader, queued, lambda job: True, merge_key)
+    return [job.id for job in merged]
+
+
+@pytest.mark.parametrize("first, second, overlap", [
+    ("config.json", "config.json", True),
+    ("data", "data/train.bin", True),
+    ("data/train.bin", "data", True),
+    ("", "data/train.bin", True),
+    ("data", "data2/train.bin", False),
+    ("data/a.bin", "data/b.bin", False),
+])
+def test_repo_paths_overlap(first, second, overlap):
+    assert RepoPaths([first]).overlaps(RepoPaths([second])) is overlap
+    assert RepoPaths([second]).overlaps(RepoPaths([first])) is overlap
+
+
+def test_job_writing_into_leaders_folder_is_not_merged(tmp_path):
+    leader = make_job(1, str(tmp_path / "data"))
+    inside = make_job(2, str(tmp_path / "train.bin"), subfolder="data")
+    beside = make_job(3, str(tmp_path / "tokenizer.json"))
+    assert followers(leader, [inside, beside]) == [3]
+
+
+def test_job_overlapping_a_passed_over_job_is_not_merged(tmp_path):
+    leader = make_job(1, str(tmp_path / "config.json"))
+    passed_over = make_job(2, str(tmp_path / "data"))
+    passed_over.total_bytes = None  # never merged, so it stays queued ahead of the jobs behind it
+    behind = make_job(3, str(tmp_path / "train.bin"), subfolder="data/")
+    unrelated = make_job(4, str(tmp_path / "vocab.txt"))
+    assert followers(leader, [passed_over, behind, unrelated]) == [4]
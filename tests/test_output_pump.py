@@ -0,0 +1,39 @@
+"""The CLI backend drains a very chatty subprocess without stalling or buffering its output."""
+import threading
+import tracemalloc
+
+from conftest import FAKE_CLI
+from upload_backends import CliUploadBackend
+from upload_engine import UploadJob
+
+FLOOD_BYTES = 32 * 1024 * 1024  # per stream
+TIMEOUT_SECONDS = 60
+MAX_PEAK_BYTES = 8 * 1024 * 1024
+
+
+def test_floods_on_stdout_and_stderr(monkeypatch):
+    monkeypatch.setenv("FAKE_HF_STDOUT_BYTES", str(FLOOD_BYTES))
+    monkeypatch.setenv("FAKE_HF_STDERR_BYTES", str(FLOOD_BYTES))
+    monkeypatch.setenv("FAKE_HF_LATENCY", "0.1")
+    monkeypatch.setenv("FAKE_HF_STEPS", "10")
+    job = UploadJob(id=1, repository="test/chatty", subfolder="", file_paths_display_str="model.bin")
+    result = {}
+    progress = []
+
+    def worker():
+        result["outcome"] = CliUploadBackend(FAKE_CLI).run(job, lambda message: None, progress.append)
+
+    tracemalloc.start()
+    try:
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        thread.join(TIMEOUT_SECONDS)
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert not thread.is_alive(), f"no completion after {TIMEOUT_SECONDS}s (deadlock?)"
+    success, message = result["outcome"]
+    assert success, message
+    assert progress[-1] == 100
+    assert peak < MAX_PEAK_BYTES, f"peak traced memory {peak / 1024 / 1024:.1f} MiB"
@@ -0,0 +1,54 @@
+"""Folder scans and the size-balanced batches they are split into."""
+import random
+
+import pytest
+
+from upload_planner import ScannedFile, plan_batches, scan_folder
+
+
+def make_files(sizes):
+    return [ScannedFile(f"file{index:04d}.bin", size, 0) for index, size in enumerate(sizes)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("max_files, max_bytes", [(10, 10_000), (3, 1_000_000), (1000, 2_500)])
+def test_batches_respect_limits_and_keep_every_file(seed, max_files, max_bytes):
+    rng = random.Random(seed)
+    files = make_files(rng.randint(1, 3000) for _ in range(rng.randint(1, 200)))
+    batches = plan_batches(files, max_files, max_bytes)
+
+    assert sorted(f for batch in batches for f in batch) == sorted(files)
+    for batch in batches:
+        assert batch == sorted(batch)
+        assert len(batch) <= max_files
+        assert len(batch) == 1 or sum(f.size for f in batch) <= max_bytes
+
+
+def test_batches_are_balanced():
+    files = make_files([100] * 40 + [10] * 40)
+    batches = plan_batches(files, max_files=20, max_bytes=10_000)
+    assert len(batches) == 4
+    assert {sum(f.size for f in batch) for batch in batches} == {1100}
+
+
+def test_oversized_file_gets_a_batch_of_its_own():
+    files = make_files([5000, 10, 20])
+    batches = plan_batches(files, max_files=10, max_bytes=1000)
+    assert [[f.size for f in batch] for batch in batches if any(f.size == 5000 for f in batch)] == [[5000]]
+    assert sorted(f for batch in batches for f in batch) == sorted(files)
+
+
+def test_no_files_means_no_batches():
+    assert plan_batches([]) == []
+
+
+def test_scan_applies_globs_and_skips_git(tmp_path):
+    for relative_path in ("model.safetensors", "sub/config.json", "sub/notes.txt", ".git/HEAD",
+                          "sub/.git/config", ".cache/huggingface/lock"):
+        path = tmp_path / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x")
+    assert [f.relative_path for f in scan_folder(tmp_path)] == ["model.safetensors", "sub/config.json",
+                                                                "sub/notes.txt"]
+    assert [f.relative_path for f in scan_folder(tmp_path, include_globs=["*.json", "*.safetensors"],
+                                                 exclude_globs=["sub/*"])] == ["model.safetensors"]
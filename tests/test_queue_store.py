@@ -0,0 +1,76 @@
+"""Jobs put back at the front of the queue keep their place, attempt count and remaining paths across restarts."""
+import threading
+
+import pytest
+
+from upload_engine import UploadJob, UploadWorkerPool
+from upload_queue_store import JobQueueStore
+from upload_retry import RetryPolicy
+
+WAIT_SECONDS = 10
+
+
+@pytest.fixture
+def release():
+    release = threading.Event()
+    yield release
+    release.set()
+
+
+def make_job(job_id, paths):
+    return UploadJob(id=job_id, repository="test/model", subfolder="", file_paths_display_str=paths)
+
+
+def restart(db_path):
+    store = JobQueueStore(str(db_path))
+    try:
+        return store.load_unfinished()
+    finally:
+        store.close()
+
+
+def test_resumed_job_keeps_its_place(tmp_path, release):
+    def run_job(job, on_status, on_progress):
+        release.wait()
+        return True, f"Job ID:{job.id} Upload successful."
+
+    store = JobQueueStore(str(tmp_path / "queue.sqlite3"))
+    pool = UploadWorkerPool(run_job=run_job, max_workers=1, store=store)
+    for job_id in (1, 2, 3):
+        pool.submit(make_job(job_id, f"{job_id}.bin"))
+    pool.pause([3])
+    pool.resume([3])
+    assert [job.id for job in pool.pending_jobs()] == [3, 2]
+
+    assert [job.id for job in restart(tmp_path / "queue.sqlite3")] == [1, 3, 2]
+    release.set()
+    pool.wait_until_idle(WAIT_SECONDS)
+    store.close()
+
+
+def test_retried_job_keeps_attempt_and_remaining_paths(tmp_path, release):
+    retried = threading.Event()
+
+    def run_job(job, on_status, on_progress):
+        if job.id == 1:
+            job.completed_paths.add("a.bin")
+            return False, f"Job ID:{job.id} 503 Server Error: Service Unavailable"
+        release.wait()
+        return True, f"Job ID:{job.id} Upload successful."
+
+    store = JobQueueStore(str(tmp_path / "queue.sqlite3"))
+    pool = UploadWorkerPool(run_job=run_job, max_workers=1, store=store,
+                            retry_policy=RetryPolicy(base_delay=600, max_delay=600),
+                            on_job_retry=lambda job, delay, message: retried.set())
+    pool.submit(make_job(1, "a.bin b.bin"))
+    pool.submit(make_job(2, "2.bin"))
+    assert retried.wait(WAIT_SECONDS)
+
+    restored = restart(tmp_path / "queue.sqlite3")
+    assert [job.id for job in restored] == [1, 2]
+    assert restored[0].attempt == 1
+    assert restored[0].local_paths() == ["b.bin"]
+    release.set()
+    pool.clear_pending()
+    pool.wait_until_idle(WAIT_SECONDS)
+    store.close()
@@ -0,0 +1,79 @@
+"""Dragging queued rows: where a drop lands, and that the worker pool carries it out."""
+import threading
+
+import pytest
+
+from upload_engine import UploadJob, UploadWorkerPool
+from upload_queue_view import SECTION_PAUSED, SECTION_PENDING, SECTION_RUNNING, drop_before_job_id
+
+RUNNING_ID = 1
+PENDING_IDS = [2, 3, 4, 5]
+PAUSED_IDS = [6, 7]
+
+
+@pytest.fixture
+def pool():
+    """One running job, four queued and two paused, in the order the queue view shows them."""
+    release = threading.Event()
+
+    def run_job(job, on_status, on_progress):
+        release.wait()
+        return True, f"Job ID:{job.id} Upload successful."
+
+    pool = UploadWorkerPool(run_job=run_job, max_workers=1)
+    for job_id in [RUNNING_ID] + PENDING_IDS + PAUSED_IDS:
+        pool.submit(UploadJob(id=job_id, repository="test/model", subfolder="", file_paths_display_str=f"{job_id}.bin"))
+    pool.pause(PAUSED_IDS)
+    yield pool
+    release.set()
+    pool.wait_until_idle(10)
+
+
+def rows(pool):
+    sections = {job.id: SECTION_RUNNING for job in pool.running_jobs()}
+    sections.update((job.id, SECTION_PENDING) for job in pool.pending_jobs())
+    sections.update((job.id, SECTION_PAUSED) for job in pool.paused_jobs())
+    return list(sections), sections.get
+
+
+def drop(pool, moving, target_job_id):
+    order, section_of = rows(pool)
+    before_job_id = drop_before_job_id(order, section_of, moving, target_job_id)
+    return pool.move_pending_many(moving, before_job_id)
+
+
+def pending_ids(pool):
+    return [job.id for job in pool.pending_jobs()]
+
+
+def test_rows_match_fixture(pool):
+    assert rows(pool)[0] == [RUNNING_ID] + PENDING_IDS + PAUSED_IDS
+
+
+@pytest.mark.parametrize("target_job_id", [5, 6, 7, None], ids=["last-queued", "paused", "last-paused", "below"])
+def test_drop_past_the_queued_rows_moves_to_the_end(pool, target_job_id):
+    assert drop(pool, [3], target_job_id) == [3]
+    assert pending_ids(pool) == [2, 4, 5, 3]
+    assert [job.id for job in pool.paused_jobs()] == PAUSED_IDS
+
+
+def test_drop_on_a_lower_queued_row_lands_after_it(pool):
+    assert drop(pool, [2], 4) == [2]
+    assert pending_ids(pool) == [3, 4, 2, 5]
+
+
+def test_drop_on_a_higher_queued_row_lands_before_it(pool):
+    assert drop(pool, [5, 4], 3) == [5, 4]
+    assert pending_ids(pool) == [2, 5, 4, 3]
+
+
+def test_drop_on_the_running_row_moves_to_the_front(pool):
+    assert drop(pool, [4, 5], RUNNING_ID) == [4, 5]
+    assert pending_ids(pool) == [4, 5, 2, 3]
+
+
+def test_move_pending_many_needs_a_queued_target(pool):
+    # Why drops past the queued rows must be mapped to None rather than to the next (paused) row.
+    assert pool.move_pending_many([3], PAUSED_IDS[0]) == []
+    assert pool.move_pending_many([3], None) == [3]
+    assert pending_ids(pool) == [2, 4, 5, 3]
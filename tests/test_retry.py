@@ -0,0 +1,78 @@
+"""Which failures are retried, and how long a retry waits."""
+import pytest
+
+from upload_engine import JOB_FAILED, JOB_SUCCEEDED, UploadJob, UploadWorkerPool
+from upload_retry import RetryPolicy, classify_failure
+
+
+def make_job(attempt=0):
+    return UploadJob(id=1, repository="test/model", subfolder="", file_paths_display_str="a.bin", attempt=attempt)
+
+
+@pytest.mark.parametrize("message", [
+    "429 Client Error: Too Many Requests for url: https://huggingface.co/api/models/test/model/commit/main",
+    "503 Server Error: Service Unavailable",
+    "HTTP Error 500 thrown while requesting PUT https://huggingface.co/...",
+    "ConnectionError: ('Connection aborted.', RemoteDisconnected('Remote end closed connection'))",
+    "ReadTimeout: HTTPSConnectionPool(host='huggingface.co', port=443): Read timed out.",
+])
+def test_transient_failures_are_retried(message):
+    assert classify_failure(message)[0] is True
+    assert RetryPolicy().retry_delay(make_job(), message) is not None
+
+
+@pytest.mark.parametrize("message", [
+    "404 Client Error: Repository Not Found for url: https://huggingface.co/api/models/test/model",
+    "401 Client Error: Unauthorized for url: https://huggingface.co/api/whoami-v2",
+    "Job ID:1 Error: Local path not found: a.bin",
+    "Something nobody has seen before",
+])
+def test_permanent_failures_are_not_retried(message):
+    assert classify_failure(message)[0] is False
+    assert RetryPolicy().retry_delay(make_job(), message) is None
+
+
+def test_a_404_mentioning_a_server_error_is_still_fatal():
+    message = "404 Client Error: Not Found (after 502 Bad Gateway from the proxy)"
+    assert classify_failure(message) == (False, "HTTP 404")
+
+
+def test_backoff_doubles_with_jitter_up_to_the_cap():
+    policy = RetryPolicy(base_delay=2.0, max_delay=30.0)
+    for attempt, capped in [(0, 2.0), (1, 4.0), (2, 8.0), (3, 16.0), (4, 30.0), (10, 30.0)]:
+        for _ in range(50):
+            assert capped / 2 <= policy.backoff(attempt) <= capped
+
+
+def test_retry_after_hint_is_honoured_within_the_cap():
+    policy = RetryPolicy(base_delay=1.0, max_delay=60.0)
+    message = "429 Client Error: Too Many Requests. Retry after 45 seconds."
+    assert policy.retry_delay(make_job(), message) >= 45.0
+    assert policy.retry_delay(make_job(), "429 Too Many Requests. Retry after 600 seconds.") <= 60.0
+
+
+def test_no_retry_once_max_retries_is_reached():
+    policy = RetryPolicy(max_retries=3)
+    assert policy.retry_delay(make_job(attempt=2), "503 Server Error") is not None
+    assert policy.retry_delay(make_job(attempt=3), "503 Server Error") is None
+
+
+@pytest.mark.parametrize("first_error, calls, status", [
+    ("404 Client Error: Repository Not Found", 1, JOB_FAILED),
+    ("503 Server Error: Service Unavailable", 2, JOB_SUCCEEDED),
+])
+def test_pool_retries_only_transient_failures(first_error, calls, status):
+    attempts = []
+
+    def run_job(job, on_status, on_progress):
+        attempts.append(job.attempt)
+        if len(attempts) == 1:
+            return False, f"Job ID:{job.id} {first_error}"
+        return True, f"Job ID:{job.id} Upload successful."
+
+    pool = UploadWorkerPool(run_job=run_job, max_workers=1, retry_policy=RetryPolicy(base_delay=0.01))
+    job = make_job()
+    pool.submit(job)
+    assert pool.wait_until_idle(10)
+    assert attempts == list(range(calls))
+    assert job.status == status
@@ -0,0 +1,55 @@
+"""The order each scheduling policy starts queued jobs in."""
+import pytest
+
+from upload_engine import UploadJob
+from upload_scheduler import (POLICY_FAIR_SHARE, POLICY_FIFO, POLICY_PRIORITY, POLICY_SHORTEST_FIRST,
+                              create_policy, parse_repo_weights)
+
+
+def make_job(job_id, repository="test/model", priority=0, total_bytes=None):
+    return UploadJob(id=job_id, repository=repository, subfolder="", file_paths_display_str=f"{job_id}.bin",
+                     priority=priority, total_bytes=total_bytes)
+
+
+def start_order(policy, jobs, runnable=lambda job: True):
+    """Ids in the order ``policy`` starts ``jobs``, one at a time."""
+    pending = list(jobs)
+    order = []
+    while True:
+        job = policy.select(pending, runnable)
+        if job is None:
+            return order
+        policy.job_started(job)
+        pending.remove(job)
+        order.append(job.id)
+
+
+def test_fifo_keeps_queue_order_and_skips_unrunnable():
+    jobs = [make_job(job_id) for job_id in (1, 2, 3)]
+    assert start_order(create_policy(POLICY_FIFO), jobs, lambda job: job.id != 2) == [1, 3]
+
+
+def test_priority_goes_highest_first_then_queue_order():
+    jobs = [make_job(1), make_job(2, priority=5), make_job(3), make_job(4, priority=5), make_job(5, priority=-1)]
+    assert start_order(create_policy(POLICY_PRIORITY), jobs) == [2, 4, 1, 3, 5]
+
+
+def test_fair_share_takes_turns_by_weight():
+    jobs = ([make_job(job_id, "a/model") for job_id in (1, 2, 3, 4)]
+            + [make_job(job_id, "b/model") for job_id in (5, 6, 7, 8)])
+    assert start_order(create_policy(POLICY_FAIR_SHARE), jobs) == [1, 5, 2, 6, 3, 7, 4, 8]
+    weighted = create_policy(POLICY_FAIR_SHARE, parse_repo_weights("a/model=2"))
+    assert start_order(weighted, jobs)[:6] == [1, 5, 2, 3, 6, 4]
+
+
+def test_shortest_first_puts_unsized_jobs_last():
+    jobs = [make_job(1, total_bytes=300), make_job(2), make_job(3, total_bytes=100), make_job(4, total_bytes=200),
+            make_job(5)]
+    assert start_order(create_policy(POLICY_SHORTEST_FIRST), jobs) == [3, 4, 1, 2, 5]
+
+
+def test_unknown_policy_and_bad_weights_are_rejected():
+    with pytest.raises(ValueError):
+        create_policy("random")
+    with pytest.raises(ValueError):
+        parse_repo_weights("a/model=0")
@@ -0,0 +1,90 @@
+"""Sync diffs against the manifest index, and how deletions are batched."""
+import os
+
+import pytest
+
+from upload_engine import UploadJob
+from upload_sync import SyncManifest, batch_deletions, sync_target
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    manifest = SyncManifest(str(tmp_path / "sync.sqlite3"))
+    yield manifest
+    manifest.close()
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / "model"
+    (folder / "sub").mkdir(parents=True)
+    for relative_path in ("a.bin", "b.bin", "c.bin", "sub/d.json"):
+        (folder / relative_path).write_bytes(relative_path.encode() * 100)
+    return folder
+
+
+def make_job(folder, job_id=1, **kwargs):
+    return UploadJob(id=job_id, repository="test/model", subfolder="", file_paths_display_str=str(folder),
+                     sync=True, **kwargs)
+
+
+def sync(manifest, job):
+    """Diff ``job``'s folder and record the result as if the job had succeeded."""
+    diff = manifest.diff(job)
+    manifest.record(job.repository, sync_target(job), diff.touched)
+    manifest.stage(job.id, job.repository, sync_target(job), diff.changed, diff.deleted)
+    manifest.commit_staged(job.id)
+    return diff
+
+
+def paths(entries):
+    return [entry.relative_path for entry in entries]
+
+
+def test_diff_finds_added_modified_and_deleted_files(manifest, folder):
+    first = sync(manifest, make_job(folder))
+    assert paths(first.added) == ["a.bin", "b.bin", "c.bin", "sub/d.json"]
+    assert not first.modified and not first.deleted
+
+    (folder / "b.bin").write_bytes(b"changed" * 100)
+    c_stat = os.stat(folder / "c.bin")
+    os.utime(folder / "c.bin", ns=(c_stat.st_atime_ns, c_stat.st_mtime_ns + 10 ** 9))  # touched, same content
+    (folder / "a.bin").unlink()
+    (folder / "e.bin").write_bytes(b"new")
+
+    second = sync(manifest, make_job(folder, job_id=2))
+    assert paths(second.added) == ["e.bin"]
+    assert paths(second.modified) == ["b.bin"]
+    assert second.deleted == ["a.bin"]
+    assert paths(second.touched) == ["c.bin"]
+    assert second.hashed == 3
+    assert second.unchanged == 2
+
+    third = manifest.diff(make_job(folder, job_id=3))
+    assert not third.changed and not third.deleted and third.hashed == 0
+
+
+def test_deleted_files_outside_the_globs_are_kept(manifest, folder):
+    sync(manifest, make_job(folder))
+    (folder / "a.bin").unlink()
+    (folder / "sub/d.json").unlink()
+    diff = manifest.diff(make_job(folder, job_id=2, exclude_globs=["*.json"]))
+    assert diff.deleted == ["a.bin"]
+
+
+def test_failed_sync_leaves_the_index_unchanged(manifest, folder):
+    job = make_job(folder)
+    diff = manifest.diff(job)
+    manifest.stage(job.id, job.repository, sync_target(job), diff.changed)
+    manifest.discard_staged([job.id])
+    assert paths(manifest.diff(make_job(folder, job_id=2)).added) == paths(diff.added)
+
+
+def test_deletions_are_batched_by_count_and_length():
+    deleted = [f"dir/file{index:03d}.bin" for index in range(25)]  # 16 characters each, plus a separator
+    assert [len(batch) for batch in batch_deletions(deleted, max_paths=10)] == [10, 10, 5]
+    batches = batch_deletions(deleted, max_paths=100, max_chars=17 * 4)
+    assert [len(batch) for batch in batches] == [4] * 6 + [1]
+    assert [path for batch in batches for path in batch] == deleted
+    assert batch_deletions(["x" * 100], max_paths=10, max_chars=10) == [["x" * 100]]
+    assert batch_deletions([], max_paths=10) == []
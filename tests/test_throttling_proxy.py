@@ -0,0 +1,53 @@
+"""Plain HTTP through ``ThrottlingProxy`` reaches the host each request names, also on a keep-alive connection."""
+import http.client
+import http.server
+import threading
+from urllib.parse import urlsplit
+
+import pytest
+
+from upload_bandwidth import BandwidthLimiter, ThrottlingProxy
+from upload_engine import UploadJob
+
+
+class NamedHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keeps connections alive unless asked not to
+
+    def do_GET(self):
+        body = self.server.name.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servers():
+    started = []
+    for name in ("first", "second"):
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), NamedHandler)
+        server.name = name
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started.append(server)
+    yield [f"http://127.0.0.1:{server.server_address[1]}/" for server in started]
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+
+def test_each_request_goes_to_its_own_host(servers):
+    job = UploadJob(id=1, repository="test/model", subfolder="", file_paths_display_str="a.bin")
+    with ThrottlingProxy(BandwidthLimiter(), job, upstream_proxy=False) as proxy:
+        proxy_url = urlsplit(proxy.url)
+        connection = http.client.HTTPConnection(proxy_url.hostname, proxy_url.port, timeout=10)
+        try:
+            bodies = []
+            for url in servers + servers:
+                connection.request("GET", url)
+                bodies.append(connection.getresponse().read())
+        finally:
+            connection.close()
+    assert bodies == [b"first", b"second", b"first", b"second"]
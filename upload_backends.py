@@ -0,0 +1,645 @@
+"""Upload backends for the Hugging Face Upload Tool.
+
+A backend turns one ``UploadJob`` into an upload and reports back through two
+callbacks, ``on_status(message)`` and ``on_progress(percentage)``. ``run``
+returns ``(success, message)`` and is what ``UploadWorkerPool`` calls from its
+worker threads, so backends must be safe to use from several threads at once.
+
+* ``CliUploadBackend`` spawns ``huggingface-cli upload`` per item of a job and
+  scrapes its tqdm output. It only needs the CLI on PATH. A job limited to some files
+  of its folder (``folder_files``) uploads a temporary folder holding just
+  those files (``staged_folder``), so the CLI neither walks the whole folder
+  nor matches every file against one ``--include`` pattern per file.
+* ``HubApiUploadBackend`` keeps one long-lived ``huggingface_hub.HfApi``
+  client in this process and commits each item with ``create_commit``
+  directly, so jobs skip interpreter start-up, imports, token lookup and TLS
+  handshakes. Requires the optional ``huggingface_hub`` package.
+
+Both accept an ``upload_bandwidth.BandwidthLimiter``: the CLI backend routes
+the subprocess through a ``ThrottlingProxy``, the in-process backend charges
+the file reads ``huggingface_hub`` makes while sending.
+
+Both stop early when the pool sets ``job.stop_requested`` (pause/cancel):
+the CLI backend terminates its subprocess (and kills it if it has not exited
+after ``STOP_GRACE_SECONDS``), the in-process backend fails the next read of
+the file being sent and skips the remaining items. Either way ``run``
+returns ``(False, stopped_message(job))``.
+"""
+import contextlib
+import glob
+import io
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+import traceback
+from collections import deque
+
+from upload_bandwidth import ThrottlingProxy
+from upload_engine import (UploadJob, compute_upload_targets, join_repo_path,
+                           local_path_size, stopped_message, truncate_message)
+from upload_planner import scan_folder
+
+# --- Constants ---
+HF_CLI_COMMAND = ("huggingface-cli",)
+BACKEND_CLI = "huggingface-cli"
+BACKEND_HUB_API = "huggingface_hub"
+BACKEND_NAMES = (BACKEND_CLI, BACKEND_HUB_API)
+
+LOG_TAIL_LINES = 2000  # per stream, kept for the completion message
+MAX_LOG_LINE_LENGTH = 4096  # longer lines are split, so one huge line can't exhaust memory
+STOP_POLL_SECONDS = 0.05  # how often a running subprocess is checked for a stop request
+STOP_GRACE_SECONDS = 0.5  # time between terminate() and kill()
+STAGING_PREFIX = "hf-upload-"
+
+PROGRESS_REGEX = re.compile(r"(\d{1,3})\s*%\|")
+
+
+def build_upload_commands(job: UploadJob, cli_command=HF_CLI_COMMAND, staging_dir=None):
+    """Build one ``(local_path, argv)`` per item of ``job``. Raises ValueError if it has no paths.
+
+    Each item is its own ``huggingface-cli upload`` so the items finished before a pause, cancel or
+    failure are known. A job with ``folder_files`` uploads ``staging_dir``, the ``staged_folder``
+    holding those files, in place of its folder; the files land where they would have from the folder.
+    """
+    actual_paths = job.local_paths()
+    if not actual_paths:
+        raise ValueError(f"Job ID:{job.id} Error: No files specified for upload.")
+    if job.folder_files is not None and staging_dir is None:
+        raise ValueError(f"Job ID:{job.id} Error: Its files must be staged before uploading.")
+    if job.delete_files and len(actual_paths) != 1:
+        raise ValueError(f"Job ID:{job.id} Error: Deleting files needs a job with a single folder.")
+    commands = []
+    for local_path, path_in_repo in compute_upload_targets(actual_paths, job.subfolder):
+        command_parts = list(cli_command) + ["upload", job.repository]
+        command_parts.append(staging_dir if job.folder_files is not None else local_path)
+        command_parts.append(path_in_repo)
+        if job.delete_files:
+            command_parts.append("--delete")
+            command_parts.extend(glob.escape(relative_path) for relative_path in job.delete_files)
+        commands.append((local_path, command_parts))
+    return commands
+
+
+def _link_or_copy(source_path, target_path):
+    try:
+        os.link(source_path, target_path)
+    except FileNotFoundError:
+        raise
+    except OSError:  # another filesystem, or links not allowed here
+        try:
+            os.symlink(os.path.abspath(source_path), target_path)
+        except OSError:
+            shutil.copyfile(source_path, target_path)
+
+
+@contextlib.contextmanager
+def staged_folder(files):
+    """A temporary folder holding ``files``, ``(relative_path, source_path)`` pairs, removed afterwards.
+
+    Each file is hard-linked into place, or symlinked (``huggingface-cli upload`` follows file symlinks)
+    or copied where links are not possible. Raises OSError if a source file can't be staged.
+    """
+    staging_dir = tempfile.mkdtemp(prefix=STAGING_PREFIX)
+    try:
+        created_dirs = {staging_dir}
+        for relative_path, source_path in files:
+            target_path = os.path.join(staging_dir, *relative_path.split("/"))
+            parent_dir = os.path.dirname(target_path)
+            if parent_dir not in created_dirs:
+                os.makedirs(parent_dir, exist_ok=True)
+                created_dirs.add(parent_dir)
+            _link_or_copy(source_path, target_path)
+        yield staging_dir
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def _format_unexpected_error(job: UploadJob, e):
+    tb_str = traceback.format_exc()
+    error_msg_for_dialog = f"Unexpected Error:\n{e}\n\nTraceback (first 500 chars):\n{tb_str[:500]}..." if len(tb_str) > 500 else f"Unexpected Error:\n{e}\n\nTraceback:\n{tb_str}"
+    return f"Job ID:{job.id} {error_msg_for_dialog}"
+
+
+class OutputPump:
+    """Drains a subprocess's stdout and stderr at the same time.
+
+    Each stream gets its own reader thread, so a chatty stream can never fill
+    its pipe and stall the child while we wait on the other one. Lines are
+    handed to ``on_line(stream_name, line)`` as they arrive and the last
+    ``max_lines`` of each stream are kept in ring buffers.
+    """
+
+    def __init__(self, process, on_line, max_lines=LOG_TAIL_LINES):
+        self.stdout_tail = deque(maxlen=max_lines)
+        self.stderr_tail = deque(maxlen=max_lines)
+        self._on_line = on_line
+        self._threads = []
+        for stream, tail, stream_name in ((process.stdout, self.stdout_tail, "stdout"),
+                                          (process.stderr, self.stderr_tail, "stderr")):
+            if stream:
+                self._threads.append(threading.Thread(target=self._drain, args=(stream, tail, stream_name),
+                                                      daemon=True))
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _drain(self, stream, tail, stream_name):
+        try:
+            for line in iter(lambda: stream.readline(MAX_LOG_LINE_LENGTH), ''):
+                tail.append(line)
+                self._on_line(stream_name, line)
+        finally:
+            stream.close()
+
+
+class UploadBackend:
+    """Base class for upload backends.
+
+    Backends that can upload several jobs in one commit return a
+    compatibility key from ``merge_key`` (None = this job can't be merged)
+    and implement ``run_merged(jobs, on_status, on_progress)``, which
+    returns one ``(success, message)`` per job and whose callbacks take the
+    job as first argument (see upload_merge.py).
+    """
+
+    name = ""
+
+    def run(self, job: UploadJob, on_status, on_progress):
+        raise NotImplementedError
+
+    def merge_key(self, job: UploadJob):
+        return None
+
+    def run_merged(self, jobs, on_status, on_progress):
+        raise NotImplementedError
+
+    def close(self):
+        """Release long-lived resources. The backend must not be used afterwards."""
+
+
+class CliUploadBackend(UploadBackend):
+    """Runs each job as a ``huggingface-cli upload`` subprocess."""
+
+    name = BACKEND_CLI
+
+    def __init__(self, cli_command=HF_CLI_COMMAND, limiter=None):
+        self.cli_command = tuple(cli_command)
+        self.limiter = limiter
+
+    def run(self, job: UploadJob, on_status, on_progress):
+        with contextlib.ExitStack() as stack:
+            if self.limiter is not None:
+                stack.callback(self.limiter.release_job, job.id)
+            try:
+                staging_dir = None
+                if job.folder_files is not None:
+                    folder = job.local_paths()[0]
+                    staging_dir = stack.enter_context(staged_folder(
+                        (relative_path, os.path.join(folder, relative_path)) for relative_path in job.folder_files))
+                commands = build_upload_commands(job, self.cli_command, staging_dir)
+            except ValueError as e:
+                return False, str(e)
+            except OSError as e:
+                return False, f"Job ID:{job.id} Error: Could not stage files for upload: {e}"
+            return self._run_commands(job, commands, on_status, on_progress)
+
+    def _run_commands(self, job: UploadJob, commands, on_status, on_progress):
+        """Run the per-item ``commands`` of ``job`` in order, adding each finished item to ``completed_paths``."""
+        sizes = []
+        for local_path, _command_parts in commands:
+            try:
+                sizes.append(local_path_size(local_path))
+            except OSError:
+                sizes.append(0)  # the CLI reports the missing path
+        total_bytes = sum(sizes) or 1
+        done_bytes = 0
+        details = []
+        for (local_path, command_parts), size in zip(commands, sizes):
+            def on_item_progress(percentage, done_bytes=done_bytes, size=size):
+                on_progress((done_bytes + size * percentage // 100) * 100 // total_bytes)
+
+            success, message = self._run_command(job, command_parts, on_status, on_item_progress)
+            if not success:
+                return False, message
+            job.completed_paths.add(local_path)
+            done_bytes += size
+            details.append(message.split("\n", 1)[1] if "\n" in message else "")
+        on_progress(100)
+        detail = "\n".join(detail for detail in details if detail)
+        return True, truncate_message(f"Job ID:{job.id} Upload successful.\n{detail}")
+
+    @staticmethod
+    def _wait(process, stop_jobs):
+        """Wait for ``process`` to exit. Returns False if it was stopped because a job in ``stop_jobs`` asked to."""
+        while True:
+            try:
+                process.wait(timeout=STOP_POLL_SECONDS)
+                return True
+            except subprocess.TimeoutExpired:
+                if any(job.stop_requested for job in stop_jobs):
+                    break
+        process.terminate()
+        try:
+            process.wait(timeout=STOP_GRACE_SECONDS)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        return False
+
+    def _run_command(self, job: UploadJob, command_parts, on_status, on_progress, stop_jobs=None):
+        """Run one upload command on behalf of ``job``. Returns ``(success, message)``.
+
+        The command is stopped as soon as ``job`` (or any job in ``stop_jobs``) has ``stop_requested`` set.
+        """
+        stop_jobs = stop_jobs or (job,)
+        process = None
+        proxy = None
+        try:
+            if any(stop_job.stop_requested for stop_job in stop_jobs):
+                return False, stopped_message(job)
+            display_command_str = " ".join([shlex.quote(part) for part in command_parts])
+            on_status(f"Job ID:{job.id} Executing: {display_command_str}")
+            on_progress(0)
+
+            env = None
+            if self.limiter is not None:
+                # Always proxied, so a cap set while the job runs applies to it; without one the proxy just relays.
+                proxy = ThrottlingProxy(self.limiter, job).start()
+                env = proxy.child_env(os.environ)
+
+            process = subprocess.Popen(command_parts, shell=False, env=env,
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                       text=True, encoding='utf-8', errors='replace', bufsize=1)
+
+            last_percentage = [None]
+
+            def on_line(stream_name, line):
+                line_strip = line.strip()
+                if not line_strip:
+                    return
+                match = PROGRESS_REGEX.search(line_strip)
+                if match:
+                    percentage = int(match.group(1))
+                    if percentage != last_percentage[0]:
+                        last_percentage[0] = percentage
+                        on_progress(percentage)
+                if stream_name == "stderr":
+                    current_status_message = f"Job ID:{job.id} Processing: {line_strip[:80]}"
+                    if len(line_strip) > 80: current_status_message += "..."
+                    on_status(current_status_message)
+
+            pump = OutputPump(process, on_line).start()
+            if not self._wait(process, stop_jobs):
+                pump.join(STOP_GRACE_SECONDS)  # a grandchild may still hold the pipes open
+                return False, stopped_message(job)
+            pump.join()
+            return_code = process.returncode
+            final_stdout = "".join(pump.stdout_tail)
+            final_stderr = "".join(pump.stderr_tail)
+
+            if return_code == 0:
+                message_detail = final_stdout.strip()
+                if not message_detail and final_stderr.strip():
+                    message_detail = final_stderr.strip()
+                return True, truncate_message(f"Job ID:{job.id} Upload successful.\n{message_detail}")
+
+            error_details = final_stderr.strip()
+            if not error_details and final_stdout.strip():
+                error_details = final_stdout.strip()
+            return False, truncate_message(f"Job ID:{job.id} Error (code: {return_code}):\n{error_details}")
+
+        except FileNotFoundError:
+            traceback.print_exc()
+            return False, f"Job ID:{job.id} Error: huggingface-cli not found. Check your PATH."
+        except Exception as e:
+            traceback.print_exc()
+            return False, _format_unexpected_error(job, e)
+        finally:
+            if proxy is not None:
+                proxy.stop()
+
+    def merge_key(self, job: UploadJob):
+        # The CLI uploads one local file or folder per call. Single-file jobs to the same subfolder
+        # become one upload of a staged folder holding just their files, which puts each file exactly
+        # where its own job would have (the merger never merges two jobs writing the same path).
+        if job.folder_files is not None or job.delete_files:
+            return None
+        paths = job.local_paths()
+        if len(paths) != 1 or not os.path.isfile(paths[0]):
+            return None
+        return (job.repository, job.subfolder.strip().replace("\\", "/").strip("/"))
+
+    def run_merged(self, jobs, on_status, on_progress):
+        """Upload single-file jobs with the same ``merge_key`` in one ``huggingface-cli upload`` (one commit)."""
+        results = {}
+        merged = []
+        for job in jobs:
+            paths = job.local_paths()
+            if len(paths) != 1 or not os.path.isfile(paths[0]):
+                results[job.id] = (False, f"Job ID:{job.id} Error: Local path not found: {' '.join(paths)}")
+            else:
+                merged.append(job)
+        if len(merged) == 1:
+            job = merged[0]
+            results[job.id] = self.run(job, lambda message: on_status(job, message),
+                                       lambda percentage: on_progress(job, percentage))
+        elif merged:
+            lead = merged[0]
+            subfolder = lead.subfolder.strip().replace("\\", "/").strip("/")
+
+            def for_job(message, job):
+                return message.replace(f"Job ID:{lead.id} ", f"Job ID:{job.id} ", 1)
+
+            def on_merged_status(message):
+                for job in merged:
+                    on_status(job, for_job(message, job))
+
+            def on_merged_progress(percentage):
+                for job in merged:
+                    on_progress(job, percentage)
+
+            on_merged_status(f"Job ID:{lead.id} Uploading in one commit with {len(merged) - 1} other job(s).")
+            files = [(os.path.basename(job.local_paths()[0]), job.local_paths()[0]) for job in merged]
+            try:
+                with staged_folder(files) as staging_dir:
+                    command_parts = list(self.cli_command) + ["upload", lead.repository, staging_dir,
+                                                              subfolder or "."]
+                    success, message = self._run_command(lead, command_parts, on_merged_status,
+                                                         on_merged_progress, stop_jobs=merged)
+            except OSError as e:
+                success, message = False, f"Job ID:{lead.id} Error: Could not stage files for upload: {e}"
+            finally:
+                if self.limiter is not None:
+                    self.limiter.release_job(lead.id)
+            for job in merged:
+                if success:
+                    job.completed_paths.update(job.local_paths())
+                results[job.id] = (success, for_job(message, job))
+        return [results[job.id] for job in jobs]
+
+
+class UploadStopped(Exception):
+    """Raised inside ``huggingface_hub`` calls to abandon a job whose ``stop_requested`` is set."""
+
+
+class JobReader(io.RawIOBase):
+    """Read-only file wrapper for the bytes ``job`` sends.
+
+    Raises ``UploadStopped`` once the job is asked to stop and, given a ``BandwidthLimiter``,
+    charges every byte read to the job's limits.
+    """
+
+    def __init__(self, raw, job: UploadJob, limiter=None):
+        super().__init__()
+        self._raw = raw
+        self._job = job
+        self._limiter = limiter
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self._raw.seekable()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._raw.seek(offset, whence)
+
+    def tell(self):
+        return self._raw.tell()
+
+    def read(self, size=-1):
+        if self._job.stop_requested:
+            raise UploadStopped(stopped_message(self._job))
+        data = self._raw.read(size)
+        if data and self._limiter is not None:
+            self._limiter.throttle(self._job, len(data))
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        # The wrapped file belongs to whoever opened it.
+        super().close()
+
+
+def _make_throttled_operation_class(commit_operation_add):
+    """Subclass ``CommitOperationAdd`` so the bytes it sends are charged to a ``BandwidthLimiter``
+    and sending stops when the job is asked to stop."""
+
+    class ThrottledCommitOperationAdd(commit_operation_add):
+        limiter = None
+        job = None
+
+        @contextlib.contextmanager
+        def as_file(self, with_tqdm=False):
+            with super().as_file(with_tqdm=with_tqdm) as file:
+                # huggingface_hub only asks for tqdm when streaming LFS content; other reads hash or inspect.
+                if with_tqdm and self.job is not None:
+                    yield JobReader(file, self.job, self.limiter)
+                else:
+                    yield file
+
+        def b64content(self):
+            # Regular (small) files travel base64-encoded inside the commit payload.
+            if self.job is not None and self.job.stop_requested:
+                raise UploadStopped(stopped_message(self.job))
+            content = super().b64content()
+            if self.limiter is not None:
+                self.limiter.throttle(self.job, len(content))
+            return content
+
+    return ThrottledCommitOperationAdd
+
+
+class HubApiUploadBackend(UploadBackend):
+    """Uploads in-process through one shared ``huggingface_hub.HfApi`` client.
+
+    ``huggingface_hub`` routes every request through a single process-wide
+    HTTP client with a connection pool, so reusing one ``HfApi`` across all
+    jobs and worker threads keeps connections (and their TLS sessions) warm.
+    Progress is reported per uploaded item, weighted by size on disk, and
+    each finished item is added to ``job.completed_paths`` so a retry after a
+    later item fails skips it.
+
+    Each item is one ``create_commit`` built from our own operations (a
+    folder is listed with ``upload_planner.scan_folder``, skipping the same
+    ``.git``/cache paths ``upload_folder`` does), so their reads can be
+    charged to ``limiter``. Transfers that ``huggingface_hub`` hands to the
+    Xet client bypass those reads and are not shaped.
+    """
+
+    name = BACKEND_HUB_API
+
+    def __init__(self, endpoint=None, token=None, repo_type=None, limiter=None):
+        try:
+            from huggingface_hub import CommitOperationAdd, CommitOperationDelete, HfApi
+        except ImportError as e:
+            raise ImportError("The huggingface_hub backend requires the huggingface_hub package "
+                              "(pip install -U huggingface_hub).") from e
+        self.repo_type = repo_type
+        self.limiter = limiter
+        self._api = HfApi(endpoint=endpoint, token=token)
+        self._commit_operation_add = _make_throttled_operation_class(CommitOperationAdd)
+        self._commit_operation_delete = CommitOperationDelete
+        self._closed = False
+        self._close_lock = threading.Lock()
+
+    def _operation(self, job: UploadJob, path_in_repo, local_path):
+        operation = self._commit_operation_add(path_in_repo=path_in_repo, path_or_fileobj=local_path)
+        operation.limiter = self.limiter
+        operation.job = job
+        return operation
+
+    def _item_operations(self, job: UploadJob, local_path, path_in_repo):
+        """The commit operations that upload one file or folder of ``job``."""
+        if not os.path.isdir(local_path):
+            return [self._operation(job, path_in_repo, local_path)]
+        if job.folder_files is not None:
+            relative_paths = job.folder_files
+        else:
+            relative_paths = [f.relative_path for f in scan_folder(local_path)]
+        operations = [self._operation(job, join_repo_path(path_in_repo, relative_path),
+                                      os.path.join(local_path, relative_path))
+                      for relative_path in relative_paths]
+        if job.delete_files:
+            operations.extend(
+                self._commit_operation_delete(path_in_repo=join_repo_path(path_in_repo, relative_path))
+                for relative_path in job.delete_files)
+        return operations
+
+    def _commit_item(self, job: UploadJob, local_path, path_in_repo):
+        """Upload one file or folder of ``job`` as a single commit."""
+        operations = self._item_operations(job, local_path, path_in_repo)
+        if not os.path.isdir(local_path):
+            commit_message = f"Upload {os.path.basename(local_path)} with huggingface_hub"
+        elif job.delete_files:
+            commit_message = (f"Upload {len(operations) - len(job.delete_files)} and delete "
+                              f"{len(job.delete_files)} files with huggingface_hub")
+        else:
+            commit_message = f"Upload {len(operations)} files with huggingface_hub"
+        return self._api.create_commit(repo_id=job.repository, operations=operations, repo_type=self.repo_type,
+                                       commit_message=commit_message)
+
+    @staticmethod
+    def _check_local_paths(job: UploadJob):
+        """An error message if ``job`` has no paths or one is missing, else None."""
+        actual_paths = job.local_paths()
+        if not actual_paths:
+            return f"Job ID:{job.id} Error: No files specified for upload."
+        for local_path in actual_paths:
+            if not os.path.exists(local_path):
+                return f"Job ID:{job.id} Error: Local path not found: {local_path}"
+        return None
+
+    def run(self, job: UploadJob, on_status, on_progress):
+        try:
+            error = self._check_local_paths(job)
+            if error:
+                return False, error
+            targets = compute_upload_targets(job.local_paths(), job.subfolder)
+
+            if job.folder_files is not None and len(targets) == 1 and os.path.isdir(targets[0][0]):
+                sizes = [sum(os.path.getsize(os.path.join(targets[0][0], relative_path))
+                             for relative_path in job.folder_files)]
+            else:
+                sizes = [local_path_size(local_path) for local_path, _ in targets]
+            total_bytes = sum(sizes) or 1
+            done_bytes = 0
+            on_progress(0)
+            commit_urls = []
+            for (local_path, path_in_repo), size in zip(targets, sizes):
+                if job.stop_requested:
+                    return False, stopped_message(job)
+                on_status(f"Job ID:{job.id} Uploading {os.path.basename(local_path)} -> {path_in_repo}")
+                commit_info = self._commit_item(job, local_path, path_in_repo)
+                commit_urls.append(str(getattr(commit_info, "commit_url", commit_info)))
+                job.completed_paths.add(local_path)
+                done_bytes += size
+                on_progress(done_bytes * 100 // total_bytes)
+            return True, truncate_message(f"Job ID:{job.id} Upload successful.\n" + "\n".join(commit_urls))
+        except Exception as e:
+            if job.stop_requested:
+                return False, stopped_message(job)
+            traceback.print_exc()
+            return False, truncate_message(f"Job ID:{job.id} Error: {e}")
+        finally:
+            if self.limiter is not None:
+                self.limiter.release_job(job.id)
+
+    def merge_key(self, job: UploadJob):
+        return job.repository
+
+    def run_merged(self, jobs, on_status, on_progress):
+        """Upload the items of several jobs for one repository in a single ``create_commit``."""
+        results = {}
+        merged = []
+        try:
+            for job in jobs:
+                error = self._check_local_paths(job)
+                if error:
+                    results[job.id] = (False, error)
+                else:
+                    merged.append(job)
+            if not merged:
+                return [results[job.id] for job in jobs]
+            operations = []
+            for job in merged:
+                if job.stop_requested:
+                    raise UploadStopped(stopped_message(job))
+                on_progress(job, 0)
+                on_status(job, f"Job ID:{job.id} Uploading in one commit with {len(merged) - 1} other job(s).")
+                for local_path, path_in_repo in compute_upload_targets(job.local_paths(), job.subfolder):
+                    operations.extend(self._item_operations(job, local_path, path_in_repo))
+            commit_info = self._api.create_commit(
+                repo_id=merged[0].repository, operations=operations, repo_type=self.repo_type,
+                commit_message=f"Upload {len(operations)} files from {len(merged)} job(s) with huggingface_hub")
+            commit_url = str(getattr(commit_info, "commit_url", commit_info))
+            shared = f" (one commit for {len(merged)} jobs)" if len(merged) > 1 else ""
+            for job in merged:
+                job.completed_paths.update(job.local_paths())
+                on_progress(job, 100)
+                results[job.id] = (True, truncate_message(f"Job ID:{job.id} Upload successful{shared}.\n{commit_url}"))
+        except Exception as e:
+            if not any(job.stop_requested for job in jobs):
+                traceback.print_exc()
+            for job in jobs:
+                results.setdefault(job.id, (False, stopped_message(job) if job.stop_requested
+                                            else truncate_message(f"Job ID:{job.id} Error: {e}")))
+        finally:
+            if self.limiter is not None:
+                for job in jobs:
+                    self.limiter.release_job(job.id)
+        return [results[job.id] for job in jobs]
+
+    def close(self):
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+        try:
+            from huggingface_hub import close_session
+        except ImportError:
+            return
+        close_session()
+
+
+def create_backend(name, **kwargs):
+    """Instantiate the backend registered under ``name`` (see BACKEND_NAMES)."""
+    if name == BACKEND_CLI:
+        return CliUploadBackend(**kwargs)
+    if name == BACKEND_HUB_API:
+        return HubApiUploadBackend(**kwargs)
+    raise ValueError(f"Unknown upload backend: {name!r}")
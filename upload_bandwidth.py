@@ -0,0 +1,393 @@
+"""Bandwidth shaping for uploads.
+
+``BandwidthLimiter`` holds token buckets for a global bytes/sec cap, an
+optional cap per running job and optional caps per repository. Every byte a
+job sends is charged to all three, so the tightest one wins. Caps can be
+changed at any time and take effect immediately, including for uploads that
+are already running. A time-of-day schedule can override the global cap
+(for example unthrottled at night).
+
+Uploads are charged in two ways, depending on the backend:
+
+* ``ThrottlingProxy`` is a small local HTTP/HTTPS proxy started for each
+  ``huggingface-cli`` job. The subprocess is pointed at it through the usual
+  ``HTTPS_PROXY``/``HTTP_PROXY`` variables and the proxy paces the bytes it
+  relays upstream. HTTPS traffic goes through a ``CONNECT`` tunnel, so
+  nothing is decrypted.
+* ``upload_backends.JobReader`` wraps the file objects ``huggingface_hub``
+  reads while uploading in-process and calls ``BandwidthLimiter.throttle``
+  for every read (see ``upload_backends.HubApiUploadBackend``).
+
+Limits are in bytes per second; 0 means unlimited.
+"""
+import socket
+import socketserver
+import threading
+import time
+import urllib.request
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+from upload_engine import UploadJob
+
+# --- Constants ---
+BYTES_PER_MB = 1024 * 1024
+BURST_SECONDS = 0.25  # a bucket holds at most this many seconds' worth of tokens
+MIN_BURST_BYTES = 64 * 1024
+THROTTLE_CHUNK_SIZE = 64 * 1024  # large reads are charged in slices so concurrent uploads interleave
+RELAY_CHUNK_SIZE = 64 * 1024
+SCHEDULE_CHECK_INTERVAL = 1.0  # seconds between time-of-day schedule checks
+MAX_REQUEST_HEAD_BYTES = 64 * 1024
+HOP_BY_HOP_CONNECTION_HEADERS = (b"connection", b"proxy-connection", b"keep-alive")
+PROXY_ENV_VARS = ("HTTPS_PROXY", "https_proxy", "HTTP_PROXY", "http_proxy")
+NO_PROXY_ENV_VARS = ("NO_PROXY", "no_proxy")
+
+ScheduleRule = namedtuple("ScheduleRule", ["start_minute", "end_minute", "limit"])
+
+
+def mb_to_bytes(megabytes_per_second):
+    return int(float(megabytes_per_second) * BYTES_PER_MB)
+
+
+def format_rate(bytes_per_second):
+    if not bytes_per_second:
+        return "unlimited"
+    return f"{bytes_per_second / BYTES_PER_MB:g} MB/s"
+
+
+def _parse_clock(text):
+    hours, _, minutes = text.strip().partition(":")
+    hours, minutes = int(hours), int(minutes or 0)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > 24 * 60:
+        raise ValueError(f"Invalid time of day: {text.strip()!r}")
+    return hours * 60 + minutes
+
+
+def parse_schedule(text):
+    """Parse ``"22:00-07:00=0, 09:00-18:00=2.5"`` into ``ScheduleRule`` entries.
+
+    Each rule is ``start-end=MB/s`` in local time; ``end`` may be earlier
+    than ``start`` to wrap past midnight and ``0`` means unlimited. The
+    first matching rule wins. Raises ValueError on malformed input.
+    """
+    rules = []
+    for part in text.replace(";", ",").split(","):
+        if not part.strip():
+            continue
+        try:
+            window, limit = part.split("=")
+            start, end = window.split("-")
+            rules.append(ScheduleRule(_parse_clock(start), _parse_clock(end), mb_to_bytes(limit)))
+        except ValueError as e:
+            raise ValueError(f"Invalid schedule rule {part.strip()!r}: expected HH:MM-HH:MM=MB/s ({e})") from e
+    return rules
+
+
+def format_schedule(rules):
+    return ", ".join(f"{rule.start_minute // 60:02d}:{rule.start_minute % 60:02d}-"
+                     f"{rule.end_minute // 60:02d}:{rule.end_minute % 60:02d}={rule.limit / BYTES_PER_MB:g}"
+                     for rule in rules)
+
+
+def parse_repo_limits(text):
+    """Parse ``"user/model=2 org/data=0.5"`` into ``{repository: bytes/sec}``."""
+    limits = {}
+    for part in text.replace(",", " ").split():
+        repository, separator, limit = part.rpartition("=")
+        if not separator or not repository:
+            raise ValueError(f"Invalid per-repository limit {part!r}: expected REPO=MB/s")
+        limits[repository] = mb_to_bytes(limit)
+    return limits
+
+
+def schedule_limit(rules, minute_of_day):
+    """Limit from the first rule covering ``minute_of_day``, or None if none does."""
+    for rule in rules:
+        if rule.start_minute <= rule.end_minute:
+            if rule.start_minute <= minute_of_day < rule.end_minute:
+                return rule.limit
+        elif minute_of_day >= rule.start_minute or minute_of_day < rule.end_minute:
+            return rule.limit
+    return None
+
+
+class TokenBucket:
+    """Blocking token bucket; ``rate`` is bytes/sec and 0 disables it."""
+
+    def __init__(self, rate=0):
+        self._condition = threading.Condition()
+        self.rate = 0.0
+        self.burst = MIN_BURST_BYTES
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self.set_rate(rate)
+
+    def _refill_locked(self):
+        now = time.monotonic()
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate):
+        """Change the rate; callers blocked in ``consume`` pick it up at once."""
+        with self._condition:
+            self._refill_locked()
+            was_limited = bool(self.rate)
+            self.rate = max(0.0, float(rate or 0))
+            self.burst = max(MIN_BURST_BYTES, self.rate * BURST_SECONDS)
+            if not self.rate or not was_limited:
+                self._tokens = 0.0  # no stored burst when a cap is switched on
+            self._condition.notify_all()
+
+    def consume(self, num_bytes):
+        """Take ``num_bytes`` tokens, waiting for them if the bucket is short.
+
+        The bucket may go into debt; later callers wait until it is paid off,
+        so concurrent consumers share the rate.
+        """
+        with self._condition:
+            if not self.rate:
+                return
+            self._refill_locked()
+            self._tokens -= num_bytes
+            while self.rate and self._tokens < 0:
+                self._condition.wait(-self._tokens / self.rate)
+                self._refill_locked()
+
+
+class BandwidthLimiter:
+    """Global, per-job and per-repository upload caps shared by all running jobs."""
+
+    def __init__(self, global_limit=0, per_job_limit=0, repo_limits=None, schedule=None):
+        self._lock = threading.Lock()
+        self.global_limit = max(0, int(global_limit or 0))
+        self.per_job_limit = max(0, int(per_job_limit or 0))
+        self.repo_limits = dict(repo_limits or {})
+        self.schedule = list(schedule or [])
+        self._global_bucket = TokenBucket()
+        self._job_buckets = {}
+        self._repo_buckets = {}
+        self._next_schedule_check = 0.0
+        self._apply_global_limit()
+
+    # --- Configuration (any thread) ---
+    def set_global_limit(self, bytes_per_second):
+        with self._lock:
+            self.global_limit = max(0, int(bytes_per_second or 0))
+        self._apply_global_limit()
+
+    def set_per_job_limit(self, bytes_per_second):
+        with self._lock:
+            self.per_job_limit = max(0, int(bytes_per_second or 0))
+            buckets = list(self._job_buckets.values())
+        for bucket in buckets:
+            bucket.set_rate(self.per_job_limit)
+
+    def set_repo_limits(self, repo_limits):
+        """Replace all per-repository caps with ``{repository: bytes/sec}``."""
+        with self._lock:
+            self.repo_limits = {repo: max(0, int(limit)) for repo, limit in repo_limits.items() if limit}
+            buckets = dict(self._repo_buckets)
+        for repository, bucket in buckets.items():
+            bucket.set_rate(self.repo_limits.get(repository, 0))
+
+    def set_schedule(self, rules):
+        with self._lock:
+            self.schedule = list(rules)
+        self._apply_global_limit()
+
+    def effective_global_limit(self, now=None):
+        """The global cap in force now, taking the schedule into account."""
+        now = time.localtime() if now is None else now
+        with self._lock:
+            scheduled = schedule_limit(self.schedule, now.tm_hour * 60 + now.tm_min)
+            return self.global_limit if scheduled is None else scheduled
+
+    def _apply_global_limit(self):
+        self._global_bucket.set_rate(self.effective_global_limit())
+        self._next_schedule_check = time.monotonic() + SCHEDULE_CHECK_INTERVAL
+
+    # --- Charging (worker and relay threads) ---
+    def _buckets_for(self, job: UploadJob):
+        with self._lock:
+            job_bucket = self._job_buckets.get(job.id)
+            if job_bucket is None:
+                job_bucket = self._job_buckets[job.id] = TokenBucket(self.per_job_limit)
+            repo_bucket = self._repo_buckets.get(job.repository)
+            if repo_bucket is None:
+                repo_bucket = self._repo_buckets[job.repository] = TokenBucket(
+                    self.repo_limits.get(job.repository, 0))
+        return job_bucket, repo_bucket, self._global_bucket
+
+    def throttle(self, job: UploadJob, num_bytes):
+        """Block until ``job`` may send ``num_bytes`` more bytes."""
+        if self.schedule and time.monotonic() >= self._next_schedule_check:
+            self._apply_global_limit()
+        buckets = self._buckets_for(job)
+        for offset in range(0, num_bytes, THROTTLE_CHUNK_SIZE):
+            chunk = min(THROTTLE_CHUNK_SIZE, num_bytes - offset)
+            for bucket in buckets:
+                bucket.consume(chunk)
+
+    def release_job(self, job_id):
+        with self._lock:
+            self._job_buckets.pop(job_id, None)
+
+
+def _relay(source, destination, on_chunk=None):
+    """Copy ``source`` to ``destination`` until EOF, then half-close ``destination``."""
+    try:
+        while True:
+            data = source.recv(RELAY_CHUNK_SIZE)
+            if not data:
+                break
+            if on_chunk:
+                on_chunk(len(data))
+            destination.sendall(data)
+    except OSError:
+        pass
+    finally:
+        try:
+            destination.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+
+def _with_connection_close(head):
+    """An HTTP request or response ``head`` with its connection headers replaced by ``Connection: close``."""
+    first_line, *headers = head[:-4].split(b"\r\n")
+    headers = [header for header in headers
+               if header.split(b":", 1)[0].strip().lower() not in HOP_BY_HOP_CONNECTION_HEADERS]
+    return b"\r\n".join([first_line, *headers, b"Connection: close"]) + b"\r\n\r\n"
+
+
+def _upstream_proxy():
+    """``(host, port)`` of an http:// proxy configured for this process, or None."""
+    proxy = urllib.request.getproxies().get("https") or urllib.request.getproxies().get("http")
+    if not proxy:
+        return None
+    parts = urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+    if parts.scheme != "http" or not parts.hostname:
+        return None
+    return parts.hostname, parts.port or 80
+
+
+class ThrottlingProxy:
+    """Local proxy for one job's subprocess that paces its upstream bytes.
+
+    Handles ``CONNECT`` tunnels (HTTPS) and absolute-form plain HTTP
+    requests. A plain HTTP request and its response are both rewritten to
+    ``Connection: close`` and the client connection ends with the response,
+    so a keep-alive client opens a new connection for its next request (maybe
+    to another host) instead of sending it to the first host. If this process already has an http:// proxy configured, the
+    connection is relayed to it unchanged instead, so corporate proxies keep
+    working.
+    """
+
+    def __init__(self, limiter: BandwidthLimiter, job: UploadJob, upstream_proxy=None):
+        self.limiter = limiter
+        self.job = job
+        self.upstream_proxy = upstream_proxy if upstream_proxy is not None else _upstream_proxy()
+        proxy = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                proxy._handle(self.request)
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler, bind_and_activate=True)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def child_env(self, env):
+        """Copy of ``env`` that routes a subprocess's HTTP(S) traffic through this proxy."""
+        env = dict(env)
+        for name in PROXY_ENV_VARS:
+            env[name] = self.url
+        for name in NO_PROXY_ENV_VARS:
+            env[name] = ""
+        return env
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"proxy-job-{self.job.id}",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _charge(self, num_bytes):
+        self.limiter.throttle(self.job, num_bytes)
+
+    def _handle(self, client):
+        upstream = None
+        single_request = False
+        try:
+            if self.upstream_proxy:
+                upstream = socket.create_connection(self.upstream_proxy)
+                pending = b""
+            else:
+                head, pending = self._read_head(client)
+                if head is None:
+                    return
+                method, target = head.split(b" ", 2)[:2]
+                if method.upper() == b"CONNECT":
+                    host, _, port = target.decode("ascii").rpartition(":")
+                    upstream = socket.create_connection((host.strip("[]"), int(port or 443)))
+                    client.sendall(b"HTTP/1.1 200 Connection Established\r\n\r\n")
+                else:
+                    parts = urlsplit(target.decode("ascii"))
+                    if parts.scheme != "http" or not parts.hostname:
+                        client.sendall(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                        return
+                    upstream = socket.create_connection((parts.hostname, parts.port or 80))
+                    pending = _with_connection_close(head) + pending
+                    single_request = True
+            if pending:
+                self._charge(len(pending))
+                upstream.sendall(pending)
+            sender = threading.Thread(target=_relay, args=(client, upstream, self._charge), daemon=True)
+            sender.start()
+            if single_request:
+                response_head, rest = self._read_head(upstream)
+                if response_head is not None:
+                    client.sendall(_with_connection_close(response_head) + rest)
+            _relay(upstream, client)
+            if single_request:
+                try:
+                    client.shutdown(socket.SHUT_RDWR)  # also ends the sender, should the client keep its side open
+                except OSError:
+                    pass
+            sender.join()
+        except (OSError, ValueError):
+            try:
+                client.sendall(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            except OSError:
+                pass
+        finally:
+            if upstream is not None:
+                upstream.close()
+
+    @staticmethod
+    def _read_head(connection):
+        """Return ``(head, rest)``: the request or status line and headers, and any bytes read past them."""
+        buffer = b""
+        while b"\r\n\r\n" not in buffer:
+            data = connection.recv(RELAY_CHUNK_SIZE)
+            if not data or len(buffer) > MAX_REQUEST_HEAD_BYTES:
+                return None, b""
+            buffer += data
+        end = buffer.index(b"\r\n\r\n") + 4
+        return buffer[:end], buffer[end:]
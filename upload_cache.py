@@ -0,0 +1,248 @@
+"""Content-hash cache that skips files already uploaded to the Hub.
+
+``UploadHashCache`` persists, per ``(repository, path_in_repo)``, the size,
+modification time and SHA-256 (the LFS oid) of every file we have
+successfully uploaded. Before a job runs, ``prepare_job`` expands its paths
+into files and drops the ones whose content matches what was last sent to
+the same place in the same repository. Files whose size and mtime are
+unchanged reuse the stored hash; the rest are hashed in a thread pool using
+chunked, memory-mapped reads.
+
+``make_dedup_run_job`` wraps a backend's ``run`` so this happens on the worker
+thread, right before the upload, and the cache is updated on success.
+"""
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from upload_engine import UploadJob, compute_upload_targets, format_bytes, join_repo_path
+from upload_planner import ScannedFile, scan_folder
+
+# --- Constants ---
+HASH_CACHE_FILE = "upload_hash_cache.sqlite3"
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+HASH_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def sha256_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """SHA-256 of a file, read through mmap in ``chunk_size`` slices."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+            # hashlib releases the GIL for large buffers, so files hash in parallel across threads.
+            for offset in range(0, size, chunk_size):
+                digest.update(view[offset:offset + chunk_size])
+    return digest.hexdigest()
+
+
+@dataclass
+class LocalFile:
+    local_path: str
+    path_in_repo: str
+    item_index: int  # index into the job's local paths
+    relative_path: str  # path inside that item, "" for a plain file
+    size: int
+    mtime_ns: int
+    sha256: str | None = None
+
+
+@dataclass
+class DedupPlan:
+    files_to_send: list = field(default_factory=list)
+    files_skipped: list = field(default_factory=list)
+    bytes_to_send: int = 0
+    bytes_skipped: int = 0
+
+
+def expand_job_files(job: UploadJob):
+    """List every file a job would upload with its stat info and path in the repo."""
+    files = []
+    for item_index, (local_path, path_in_repo) in enumerate(compute_upload_targets(job.local_paths(), job.subfolder)):
+        if os.path.isdir(local_path):
+            if job.folder_files is not None:
+                scanned_files = []
+                for relative_path in job.folder_files:
+                    stat = os.stat(os.path.join(local_path, relative_path))
+                    scanned_files.append(ScannedFile(relative_path, stat.st_size, stat.st_mtime_ns))
+            else:
+                scanned_files = scan_folder(local_path)
+            for relative_path, size, mtime_ns in scanned_files:
+                files.append(LocalFile(os.path.join(local_path, relative_path),
+                                       join_repo_path(path_in_repo, relative_path), item_index,
+                                       relative_path, size, mtime_ns))
+        else:
+            stat = os.stat(local_path)
+            files.append(LocalFile(local_path, path_in_repo, item_index, "", stat.st_size, stat.st_mtime_ns))
+    return files
+
+
+class UploadHashCache:
+    """SQLite-backed map of (repository, path_in_repo) -> (size, mtime, sha256)."""
+
+    def __init__(self, db_path=HASH_CACHE_FILE, hash_workers=HASH_WORKERS):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS uploaded_files (
+                                  repository TEXT NOT NULL,
+                                  path_in_repo TEXT NOT NULL,
+                                  size INTEGER NOT NULL,
+                                  mtime_ns INTEGER NOT NULL,
+                                  sha256 TEXT NOT NULL,
+                                  PRIMARY KEY (repository, path_in_repo))""")
+        self._conn.commit()
+        self._executor = ThreadPoolExecutor(max_workers=hash_workers, thread_name_prefix="hash")
+
+    def lookup(self, repository, paths_in_repo):
+        """Return ``{path_in_repo: (size, mtime_ns, sha256)}`` for the cached paths."""
+        found = {}
+        paths_in_repo = list(paths_in_repo)
+        with self._lock:
+            for start in range(0, len(paths_in_repo), 500):
+                chunk = paths_in_repo[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT path_in_repo, size, mtime_ns, sha256 FROM uploaded_files "
+                    f"WHERE repository = ? AND path_in_repo IN ({placeholders})", [repository, *chunk])
+                for path_in_repo, size, mtime_ns, sha256 in rows:
+                    found[path_in_repo] = (size, mtime_ns, sha256)
+        return found
+
+    def record(self, repository, files):
+        """Remember ``files`` (hashed ``LocalFile`` entries) as present in ``repository``."""
+        rows = [(repository, f.path_in_repo, f.size, f.mtime_ns, f.sha256) for f in files if f.sha256]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO uploaded_files VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def plan(self, job: UploadJob, on_status=None):
+        """Split a job's files into those to send and those already on the Hub."""
+        files = expand_job_files(job)
+        cached = self.lookup(job.repository, (f.path_in_repo for f in files))
+        to_hash = []
+        for f in files:
+            entry = cached.get(f.path_in_repo)
+            if entry and entry[0] == f.size and entry[1] == f.mtime_ns:
+                f.sha256 = entry[2]
+            else:
+                to_hash.append(f)
+        if to_hash and on_status:
+            on_status(f"Job ID:{job.id} Hashing {len(to_hash)} file(s), "
+                      f"{format_bytes(sum(f.size for f in to_hash))}...")
+        for f, digest in zip(to_hash, self._executor.map(lambda f: sha256_file(f.local_path), to_hash)):
+            f.sha256 = digest
+
+        plan = DedupPlan()
+        for f in files:
+            entry = cached.get(f.path_in_repo)
+            if entry and entry[2] == f.sha256 and entry[0] == f.size:
+                plan.files_skipped.append(f)
+                plan.bytes_skipped += f.size
+            else:
+                plan.files_to_send.append(f)
+                plan.bytes_to_send += f.size
+        return plan
+
+    def prepare_job(self, job: UploadJob, on_status=None):
+        """Narrow ``job`` to files that changed since they were last uploaded.
+
+        Whole items (files or folders) with nothing new are dropped from
+        ``job.upload_paths``. For a single-folder job the remaining files are
+        listed in ``job.folder_files``. Returns the ``DedupPlan``.
+        """
+        local_paths = job.local_paths()
+        plan = self.plan(job, on_status)
+        job.bytes_skipped = plan.bytes_skipped
+        job.bytes_to_send = plan.bytes_to_send
+        if not plan.files_skipped:
+            return plan
+
+        items_to_send = sorted({f.item_index for f in plan.files_to_send})
+        job.upload_paths = [local_paths[index] for index in items_to_send]
+        if len(local_paths) == 1 and os.path.isdir(local_paths[0]) and plan.files_to_send:
+            job.folder_files = [f.relative_path for f in plan.files_to_send]
+        return plan
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            self._conn.close()
+
+
+def _prepare_for_dedup(cache: UploadHashCache, job: UploadJob, on_status, on_progress):
+    """Narrow ``job`` with the cache. Returns ``(plan, result)``; ``result`` is set if nothing is left to run."""
+    try:
+        plan = cache.prepare_job(job, on_status)
+    except OSError as e:
+        return None, (False, f"Job ID:{job.id} Error: Could not read local files: {e}")
+    if not plan.files_to_send:
+        on_progress(100)
+        return plan, (True, f"Job ID:{job.id} Nothing to upload: all {len(plan.files_skipped)} file(s) "
+                            f"({format_bytes(plan.bytes_skipped)}) are already on the Hub.")
+    if plan.files_skipped:
+        on_status(f"Job ID:{job.id} Skipping {len(plan.files_skipped)} unchanged file(s), "
+                  f"{format_bytes(plan.bytes_skipped)}; sending {format_bytes(plan.bytes_to_send)}.")
+    return plan, None
+
+
+def _record_after_upload(cache: UploadHashCache, job: UploadJob, plan: DedupPlan, local_paths, success):
+    if success:
+        # Also refreshes the mtime of skipped files that were touched but not modified.
+        cache.record(job.repository, plan.files_to_send + plan.files_skipped)
+    elif job.completed_paths:
+        # Items the backend finished before failing are on the Hub; don't send them again.
+        cache.record(job.repository, [f for f in plan.files_to_send
+                                      if local_paths[f.item_index] in job.completed_paths])
+
+
+def make_dedup_run_job(cache: UploadHashCache, run_job):
+    """Wrap ``run_job`` so unchanged files are skipped and successes are cached."""
+
+    def run_with_dedup(job: UploadJob, on_status, on_progress):
+        if job.sync:
+            # Already narrowed to the changed files against the sync index (upload_sync).
+            return run_job(job, on_status, on_progress)
+        local_paths = job.local_paths()
+        plan, result = _prepare_for_dedup(cache, job, on_status, on_progress)
+        if result is not None:
+            return result
+        success, message = run_job(job, on_status, on_progress)
+        _record_after_upload(cache, job, plan, local_paths, success)
+        return success, message
+
+    return run_with_dedup
+
+
+def make_dedup_run_merged(cache: UploadHashCache, run_merged):
+    """Like ``make_dedup_run_job`` for a backend's ``run_merged``; only jobs with files left are merged."""
+
+    def run_merged_with_dedup(jobs, on_status, on_progress):
+        results = {}
+        plans = {}
+        for job in jobs:
+            if job.sync:
+                continue
+            local_paths = job.local_paths()
+            plan, result = _prepare_for_dedup(cache, job, lambda message, job=job: on_status(job, message),
+                                              lambda percentage, job=job: on_progress(job, percentage))
+            if result is not None:
+                results[job.id] = result
+            else:
+                plans[job.id] = (plan, local_paths)
+        remaining = [job for job in jobs if job.id not in results]
+        if remaining:
+            results.update(zip((job.id for job in remaining), run_merged(remaining, on_status, on_progress)))
+        for job in remaining:
+            if job.id in plans:
+                plan, local_paths = plans[job.id]
+                _record_after_upload(cache, job, plan, local_paths, results[job.id][0])
+        return [results[job.id] for job in jobs]
+
+    return run_merged_with_dedup
@@ -0,0 +1,850 @@
+"""UI-agnostic upload engine for the Hugging Face Upload Tool.
+
+Holds the job model and the bounded worker pool that executes queued jobs
+concurrently. The upload itself is delegated to a backend from
+upload_backends.py. The Tk front-end in huggingface_upload_tool.py drives
+these through callbacks; nothing in this module touches tkinter.
+"""
+import itertools
+import os
+import shlex
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+# --- Constants ---
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_PER_REPO_LIMIT = 0  # 0 means no per-repository limit
+MAX_MESSAGE_LENGTH = 1000
+
+JOB_PLANNING = "planning"
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_REMOVED = "removed"
+JOB_PAUSED = "paused"
+JOB_CANCELLED = "cancelled"
+
+
+@dataclass
+class UploadJob:
+    id: int
+    repository: str
+    subfolder: str
+    file_paths_display_str: str
+    status: str = JOB_QUEUED
+    progress: float = 0.0
+    # Optional fnmatch globs applied when a dropped folder is planned into batches.
+    include_globs: list | None = None
+    exclude_globs: list | None = None
+    # Set by the planner and pre-upload stages (e.g. the dedup cache) to narrow what is sent.
+    # upload_paths replaces the paths parsed from file_paths_display_str; folder_files
+    # restricts a single-folder upload to these paths (relative to that folder, "/"-separated).
+    upload_paths: list | None = field(default=None, repr=False)
+    folder_files: list | None = field(default=None, repr=False)
+    bytes_skipped: int = 0
+    bytes_to_send: int | None = None
+    # Files and bytes the job uploads, once the pre-flight check or folder scan has counted them.
+    total_files: int | None = None
+    total_bytes: int | None = None
+    # Sub-jobs created by the planner point at the job they were split from.
+    parent_id: int | None = None
+    part_label: str = ""
+    # Higher runs sooner under the "priority" scheduling policy (upload_scheduler).
+    priority: int = 0
+    # Sync jobs upload only what changed since the folder's last sync (upload_sync). With
+    # sync_delete, files removed locally are deleted from the repo too; the planner lists them
+    # in delete_files (relative to the folder, like folder_files).
+    sync: bool = False
+    sync_delete: bool = False
+    delete_files: list | None = field(default=None, repr=False)
+    # Retries so far; while waiting for a retry the job is queued but not runnable before retry_at
+    # (time.monotonic()). Backends add each local path they finished to completed_paths so a
+    # retry only sends the rest.
+    attempt: int = 0
+    retry_at: float | None = field(default=None, repr=False)
+    completed_paths: set = field(default_factory=set, repr=False)
+    # Set by UploadWorkerPool while the job runs to ask the backend to stop: JOB_CANCELLED, JOB_PAUSED,
+    # or JOB_QUEUED for a job that shares a merged commit with one of those and goes back to the queue.
+    # Backends check it while they wait and return early (see stopped_message).
+    stop_requested: str | None = field(default=None, repr=False)
+    # (merge_key function, key, repo paths written), set by UploadWorkerPool when the job is queued
+    # (upload_merge.CommitMerger.prepare) so choosing jobs to merge stays cheap.
+    merge_info: tuple | None = field(default=None, repr=False, compare=False)
+
+    def local_paths(self):
+        """Local files/folders this job uploads."""
+        if self.upload_paths is not None:
+            return list(self.upload_paths)
+        return shlex.split(self.file_paths_display_str)
+
+    def __str__(self):
+        files_preview = self.file_paths_display_str
+        if len(files_preview) > 40:
+            files_preview = files_preview[:37] + "..."
+        sub = self.subfolder if self.subfolder else "<root>"
+        text = f"ID:{self.id} Repo: {self.repository}, Sub: {sub}, Files: {files_preview}"
+        if self.parent_id is not None:
+            text += f" (part {self.part_label} of ID:{self.parent_id})"
+        if self.bytes_to_send is not None:
+            text += f" [skip {format_bytes(self.bytes_skipped)} / send {format_bytes(self.bytes_to_send)}]"
+        elif self.total_files is not None and self.total_bytes is not None:
+            text += f" [{self.total_files} file(s), {format_bytes(self.total_bytes)}]"
+        if self.attempt:
+            text += f" (retry {self.attempt})"
+        if self.priority:
+            text += f" [priority {self.priority:+d}]"
+        if self.sync:
+            text += " [sync]"
+        return text
+
+
+def stopped_message(job: UploadJob, reason=None):
+    """What a backend returns for a job it gave up on because ``stop_requested`` was set."""
+    return f"Job ID:{job.id} {'Paused' if (reason or job.stop_requested) == JOB_PAUSED else 'Cancelled'}."
+
+
+def format_bytes(num_bytes):
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if size < 1024 or unit == "TB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def local_path_size(path):
+    """Size of a file, or the total size of the files under a folder."""
+    if os.path.isdir(path):
+        total = 0
+        for dir_path, _dir_names, file_names in os.walk(path):
+            for file_name in file_names:
+                try:
+                    total += os.path.getsize(os.path.join(dir_path, file_name))
+                except OSError:
+                    pass
+        return total
+    return os.path.getsize(path)
+
+
+def truncate_message(message):
+    return message[:MAX_MESSAGE_LENGTH] + "..." if len(message) > MAX_MESSAGE_LENGTH else message
+
+
+def compute_path_in_repo(actual_paths, subfolder_val):
+    """Return the path_in_repo argument for huggingface-cli upload."""
+    if len(actual_paths) == 1:
+        base_item_name = os.path.basename(actual_paths[0])
+        if subfolder_val.strip():
+            clean_subfolder = subfolder_val.strip().replace("\\", "/")
+            if not clean_subfolder.endswith('/'):
+                clean_subfolder += '/'
+            return clean_subfolder + base_item_name
+        return base_item_name
+    path_in_repo_str = subfolder_val.strip().replace("\\", "/") if subfolder_val.strip() else "."
+    return path_in_repo_str or "."
+
+
+def join_repo_path(prefix, name):
+    prefix = prefix.strip("/")
+    if not prefix or prefix == ".":
+        return name
+    return f"{prefix}/{name}"
+
+
+def compute_upload_targets(actual_paths, subfolder_val):
+    """Return ``(local_path, path_in_repo)`` pairs using huggingface-cli's path rules.
+
+    A single item goes to ``compute_path_in_repo``; with several items each one
+    lands under that path by its base name.
+    """
+    path_in_repo = compute_path_in_repo(actual_paths, subfolder_val)
+    if len(actual_paths) == 1:
+        return [(actual_paths[0], path_in_repo)]
+    return [(local_path, join_repo_path(path_in_repo, os.path.basename(os.path.normpath(local_path))))
+            for local_path in actual_paths]
+
+
+class CoalescingEventQueue:
+    """Thread-safe hand-off from worker threads to a single consumer thread.
+
+    Producers ``post(callback, *args)`` and the consumer periodically calls
+    ``drain()`` and runs the returned callbacks in order. Events posted with a
+    ``key`` replace any undrained event with the same key (moving it to the
+    end), so bursts of status or progress updates collapse into one call per
+    drain instead of one per line of output.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = OrderedDict()
+        self._sequence = itertools.count()
+
+    def post(self, callback, *args, key=None):
+        with self._lock:
+            if key is None:
+                key = next(self._sequence)
+            else:
+                self._events.pop(key, None)
+            self._events[key] = (callback, args)
+
+    def drain(self):
+        """Return and forget all pending ``(callback, args)`` pairs, oldest first."""
+        with self._lock:
+            events = list(self._events.values())
+            self._events.clear()
+        return events
+
+    def __len__(self):
+        with self._lock:
+            return len(self._events)
+
+
+class _QueueNode:
+    __slots__ = ("job", "prev", "next")
+
+    def __init__(self, job=None):
+        self.job = job
+        self.prev = self.next = self
+
+
+class JobQueue:
+    """Ordered queue of jobs keyed by job id.
+
+    A doubly linked list indexed by a dict, so lookup, removal and moving a job
+    in front of any other job are O(1) however long the queue is. Not
+    thread-safe; ``UploadWorkerPool`` guards it with its own lock.
+    """
+
+    def __init__(self, jobs=()):
+        self._head = _QueueNode()  # sentinel: head.next is the first job, head.prev the last
+        self._nodes = {}
+        for job in jobs:
+            self.append(job)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, job_id):
+        return job_id in self._nodes
+
+    def __iter__(self):
+        node = self._head.next
+        while node is not self._head:
+            next_node = node.next  # the caller may remove the job it was given
+            yield node.job
+            node = next_node
+
+    def get(self, job_id):
+        node = self._nodes.get(job_id)
+        return node.job if node else None
+
+    def first(self):
+        return self._head.next.job
+
+    def neighbours(self, job_id):
+        """``(previous_job, next_job)`` around a queued job; either may be None."""
+        node = self._nodes[job_id]
+        return node.prev.job, node.next.job
+
+    def _link_before(self, node, anchor):
+        node.prev, node.next = anchor.prev, anchor
+        anchor.prev.next = node
+        anchor.prev = node
+
+    def _unlink(self, node):
+        node.prev.next = node.next
+        node.next.prev = node.prev
+
+    def append(self, job):
+        self.insert_before(job, None)
+
+    def appendleft(self, job):
+        self.insert_before(job, self._head.next.job.id if self._nodes else None)
+
+    def insert_before(self, job, before_job_id=None):
+        """Insert ``job`` in front of ``before_job_id``, or at the end if that is None."""
+        if job.id in self._nodes:
+            raise ValueError(f"Job ID:{job.id} is already queued")
+        anchor = self._head if before_job_id is None else self._nodes[before_job_id]
+        node = self._nodes[job.id] = _QueueNode(job)
+        self._link_before(node, anchor)
+
+    def remove(self, job_id):
+        """Remove and return a job, or None if it is not queued."""
+        node = self._nodes.pop(job_id, None)
+        if node is None:
+            return None
+        self._unlink(node)
+        return node.job
+
+    def move_before(self, job_id, before_job_id=None):
+        """Move a queued job in front of ``before_job_id`` (or to the end). Returns False if either is missing."""
+        node = self._nodes.get(job_id)
+        anchor = self._head if before_job_id is None else self._nodes.get(before_job_id)
+        if node is None or anchor is None:
+            return False
+        if node is not anchor:
+            self._unlink(node)
+            self._link_before(node, anchor)
+        return True
+
+    def clear(self):
+        """Remove all jobs and return them in queue order."""
+        jobs = list(self)
+        self._nodes.clear()
+        self._head.prev = self._head.next = self._head
+        return jobs
+
+
+class _WorkerBatch:
+    """The jobs one worker runs (several if merged) and whether its slot was already given back."""
+
+    __slots__ = ("jobs", "released")
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.released = False
+
+
+class UploadWorkerPool:
+    """Bounded pool that runs queued upload jobs concurrently.
+
+    At most ``max_workers`` jobs run at once, and when ``per_repo_limit`` is
+    non-zero at most that many of them target the same repository. Jobs that
+    are blocked by the per-repository limit are skipped over, so a busy
+    repository never holds up work for other repositories.
+
+    ``run_job(job, on_status, on_progress)`` does the actual upload and returns
+    ``(success, message)``; normally this is ``UploadBackend.run``.
+
+    Which runnable job starts next is decided by ``policy`` (see
+    upload_scheduler.py); without one, jobs start in queue order.
+
+    With a ``merger`` (``upload_merge.CommitMerger``), ``run_merged`` and
+    ``merge_key``, a starting job takes compatible queued jobs along and
+    ``run_merged(jobs, on_status, on_progress)`` uploads them together,
+    returning one ``(success, message)`` per job; its callbacks take the job
+    as first argument. The merged jobs share one worker and one
+    per-repository slot but are otherwise reported and retried one by one.
+
+    With a ``retry_policy`` (``upload_retry.RetryPolicy``), a failure it deems
+    retryable puts the job back at the front of the queue, narrowed to the
+    paths not yet uploaded, and ``on_job_retry(job, delay, message)`` is called
+    instead of ``on_job_finished``. The job is skipped by the scheduler until
+    its delay has passed, so it does not hold a worker while it waits.
+
+    Running jobs can be cancelled or paused (``cancel``/``pause``): the pool
+    sets ``job.stop_requested``, the backend stops as soon as it notices, and
+    the job's worker slot is handed to the next job right away instead of
+    when the backend returns. Paused jobs are held aside until ``resume``
+    puts them back at the front of the queue, narrowed like a retry to the
+    paths not yet uploaded. A job merged into a shared commit stops the whole
+    commit; the other jobs in it are requeued.
+
+    If a ``store`` (``upload_queue_store.JobQueueStore``) is given, every
+    state change is written through to it so the queue survives restarts;
+    ``restore()`` reloads it. The ``on_job_*`` callbacks are invoked from worker
+    threads; GUI callers must marshal them onto their own event loop.
+    """
+
+    def __init__(self, run_job, max_workers=DEFAULT_MAX_WORKERS,
+                 per_repo_limit=DEFAULT_PER_REPO_LIMIT, on_job_started=None,
+                 on_job_status=None, on_job_progress=None, on_job_finished=None, store=None,
+                 retry_policy=None, on_job_retry=None, policy=None, merger=None, run_merged=None,
+                 merge_key=None, on_job_paused=None):
+        self._run_job = run_job
+        self._run_merged = run_merged
+        self._merge_key = merge_key
+        self.merger = merger
+        self.policy = policy
+        self.store = store
+        self.retry_policy = retry_policy
+        self.on_job_retry = on_job_retry
+        self.max_workers = max(1, int(max_workers))
+        self.per_repo_limit = max(0, int(per_repo_limit))
+        self.on_job_started = on_job_started
+        self.on_job_status = on_job_status
+        self.on_job_progress = on_job_progress
+        self.on_job_finished = on_job_finished
+        self.on_job_paused = on_job_paused
+
+        self._pending = JobQueue()
+        self._paused = JobQueue()
+        self._running = {}
+        self._batches = {}  # running job id -> _WorkerBatch
+        self._running_per_repo = {}
+        self._workers = 0
+        self._finishing = 0
+        self._lock = threading.Lock()
+        self._idle_condition = threading.Condition(self._lock)
+        self._retry_timer = None
+        self._retry_timer_due = None
+
+    # --- Queue inspection ---
+    def pending_jobs(self):
+        with self._lock:
+            return list(self._pending)
+
+    def running_jobs(self):
+        with self._lock:
+            return list(self._running.values())
+
+    def paused_jobs(self):
+        with self._lock:
+            return list(self._paused)
+
+    def pending_job(self, job_id):
+        """The pending job with this id, or None."""
+        with self._lock:
+            return self._pending.get(job_id)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def is_idle(self):
+        with self._lock:
+            return self._is_idle_locked()
+
+    def wait_until_idle(self, timeout=None):
+        """Block until no jobs are pending or running. Returns True if idle."""
+        with self._idle_condition:
+            return self._idle_condition.wait_for(self._is_idle_locked, timeout)
+
+    def _is_idle_locked(self):
+        return not self._pending and not self._running and not self._finishing
+
+    # --- Queue mutation ---
+    def submit(self, job: UploadJob):
+        job.status = JOB_QUEUED
+        job.progress = 0.0
+        self._prepare_merge([job])
+        if self.store:
+            self.store.add(job)
+        with self._lock:
+            self._pending.append(job)
+        self._dispatch()
+
+    def restore(self, on_restored=None):
+        """Queue the unfinished jobs saved in the store. Returns the restored jobs.
+
+        ``on_restored(job)`` is called for each job before any of them start.
+        """
+        if not self.store:
+            return []
+        jobs = self.store.load_unfinished()
+        self._prepare_merge(jobs)
+        with self._lock:
+            jobs = [job for job in jobs
+                    if job.id not in self._running and job.id not in self._pending and job.id not in self._paused]
+            for job in jobs:
+                (self._paused if job.status == JOB_PAUSED else self._pending).append(job)
+        if on_restored:
+            for job in jobs:
+                on_restored(job)
+        self._dispatch()
+        return jobs
+
+    def remove_pending(self, job_id):
+        """Remove a pending job by id. Returns the job, or None if it is not pending."""
+        removed = self.remove_pending_many([job_id])
+        return removed[0] if removed else None
+
+    def remove_pending_many(self, job_ids):
+        """Remove pending jobs by id. Returns the jobs removed; ids that are not pending are skipped."""
+        with self._lock:
+            removed = [job for job in (self._pending.remove(job_id) for job_id in job_ids) if job is not None]
+            if removed:
+                self._idle_condition.notify_all()
+        for job in removed:
+            job.status = JOB_REMOVED
+        if self.store and removed:
+            self.store.mark_removed([job.id for job in removed])
+        return removed
+
+    def clear_pending(self):
+        with self._lock:
+            removed = self._pending.clear()
+            self._idle_condition.notify_all()
+        for job in removed:
+            job.status = JOB_REMOVED
+        if self.store and removed:
+            self.store.mark_removed([job.id for job in removed])
+        return removed
+
+    def move_pending(self, job_id, before_job_id=None):
+        """Move a pending job in front of another pending job (or to the end)."""
+        return bool(self.move_pending_many([job_id], before_job_id))
+
+    def move_pending_many(self, job_ids, before_job_id=None):
+        """Move pending jobs, keeping the given order, in front of ``before_job_id`` (or to the end).
+
+        If ``before_job_id`` is itself being moved, the jobs land in front of
+        the first job after it that is not. Ids that are not pending are
+        skipped; returns the ids that moved.
+        """
+        with self._lock:
+            if before_job_id is not None and before_job_id not in self._pending:
+                return []
+            moved, before_job_id = self._move_pending_locked(job_ids, before_job_id)
+        if self.store and moved:
+            self.store.move_many_before(moved, before_job_id)
+        return moved
+
+    def move_pending_to_front(self, job_ids):
+        """Bump pending jobs to the head of the queue, keeping the given order. Returns the ids that moved."""
+        with self._lock:
+            first_job = self._pending.first()
+            if first_job is None:
+                return []
+            moved, before_job_id = self._move_pending_locked(job_ids, first_job.id)
+        if self.store and moved:
+            self.store.move_many_before(moved, before_job_id)
+        return moved
+
+    def _move_pending_locked(self, job_ids, before_job_id):
+        moving = set(job_ids)
+        while before_job_id in moving:
+            _previous_job, next_job = self._pending.neighbours(before_job_id)
+            before_job_id = next_job.id if next_job else None
+        moved = [job_id for job_id in job_ids if self._pending.move_before(job_id, before_job_id)]
+        return moved, before_job_id
+
+    def _pending_after_locked(self, job_id):
+        """Id of the pending job behind ``job_id``, or None if it is last."""
+        _previous_job, next_job = self._pending.neighbours(job_id)
+        return next_job.id if next_job else None
+
+    @staticmethod
+    def _narrow_to_remaining(job: UploadJob):
+        """Drop the paths the backend already finished, and reset the job for another run."""
+        if job.completed_paths:
+            job.upload_paths = [path for path in job.local_paths() if path not in job.completed_paths]
+        job.progress = 0.0
+        job.bytes_to_send = None
+
+    def _prepare_retry_locked(self, job: UploadJob, delay):
+        self._narrow_to_remaining(job)
+        job.attempt += 1
+        job.retry_at = time.monotonic() + delay
+        job.status = JOB_QUEUED
+        self._pending.appendleft(job)
+
+    # --- Pause, resume and cancel ---
+    def _stop_running_locked(self, job_ids, reason):
+        """Flag running jobs to stop and free their workers now. Returns the jobs flagged."""
+        stopping = []
+        for job_id in job_ids:
+            job = self._running.get(job_id)
+            if job is None or job.stop_requested in (JOB_CANCELLED, JOB_PAUSED):
+                continue
+            job.stop_requested = reason
+            stopping.append(job)
+            batch = self._batches[job_id]
+            for other in batch.jobs:
+                if other.stop_requested is None:
+                    other.stop_requested = JOB_QUEUED
+            self._release_slot_locked(batch)
+        return stopping
+
+    def _release_slot_locked(self, batch: _WorkerBatch):
+        if batch.released:
+            return
+        batch.released = True
+        repository = batch.jobs[0].repository
+        remaining = self._running_per_repo.get(repository, 1) - 1
+        if remaining > 0:
+            self._running_per_repo[repository] = remaining
+        else:
+            self._running_per_repo.pop(repository, None)
+        self._workers -= 1
+
+    def pause(self, job_ids):
+        """Pause queued or running jobs. Returns ``(paused, stopping)``.
+
+        Queued jobs are set aside at once (``paused``); running jobs are asked
+        to stop (``stopping``) and are reported through ``on_job_paused`` once
+        their backend has returned.
+        """
+        with self._lock:
+            paused = [job for job in map(self._pending.remove, job_ids) if job is not None]
+            for job in paused:
+                job.status = JOB_PAUSED
+                job.retry_at = None
+                self._paused.append(job)
+            stopping = self._stop_running_locked(job_ids, JOB_PAUSED)
+            self._idle_condition.notify_all()
+        for job in paused:
+            if self.store:
+                self.store.set_status(job.id, JOB_PAUSED)
+            if self.on_job_paused:
+                self.on_job_paused(job, f"Job ID:{job.id} Paused.")
+        self._dispatch()
+        return paused, stopping
+
+    def resume(self, job_ids):
+        """Put paused jobs back at the front of the queue, in the given order. Returns them."""
+        with self._lock:
+            resumed = [job for job in map(self._paused.remove, job_ids) if job is not None]
+            for job in reversed(resumed):
+                job.status = JOB_QUEUED
+                self._pending.appendleft(job)
+            before_job_id = self._pending_after_locked(resumed[-1].id) if resumed else None
+        if self.store and resumed:
+            self.store.requeue_many_before(resumed, before_job_id)
+        self._dispatch()
+        return resumed
+
+    def cancel(self, job_ids):
+        """Cancel running and paused jobs. Returns ``(cancelled, stopping)``.
+
+        Paused jobs are finished as cancelled at once (``cancelled``); running
+        jobs are asked to stop (``stopping``) and finish as cancelled once
+        their backend has returned. Queued jobs are left alone (see
+        ``remove_pending_many``).
+        """
+        with self._lock:
+            cancelled = [job for job in map(self._paused.remove, job_ids) if job is not None]
+            for job in cancelled:
+                job.status = JOB_CANCELLED
+            stopping = self._stop_running_locked(job_ids, JOB_CANCELLED)
+            self._idle_condition.notify_all()
+        for job in cancelled:
+            message = f"Job ID:{job.id} Cancelled."
+            if self.store:
+                self.store.set_status(job.id, JOB_CANCELLED, message)
+            if self.on_job_finished:
+                self.on_job_finished(job, False, message)
+        self._dispatch()
+        return cancelled, stopping
+
+    def set_priority(self, job_ids, priority):
+        """Change the priority of pending jobs. Returns the jobs changed."""
+        with self._lock:
+            jobs = [job for job in map(self._pending.get, job_ids) if job is not None]
+            for job in jobs:
+                job.priority = int(priority)
+        if self.store and jobs:
+            self.store.set_priority([job.id for job in jobs], int(priority))
+        self._dispatch()
+        return jobs
+
+    def set_policy(self, policy):
+        """Use ``policy`` to pick the next job from now on (None = queue order)."""
+        with self._lock:
+            self.policy = policy
+        self._dispatch()
+
+    def set_run_job(self, run_job, run_merged=None, merge_key=None):
+        """Swap the upload callables. Jobs already running keep the old ones."""
+        with self._lock:
+            self._run_job = run_job
+            self._run_merged = run_merged
+            self._merge_key = merge_key
+            stale = self._unprepared_locked()
+        self._prepare_merge(stale)
+
+    def set_merger(self, merger):
+        """Merge queued jobs with ``merger`` from now on (None = never)."""
+        with self._lock:
+            self.merger = merger
+            stale = self._unprepared_locked()
+        self._prepare_merge(stale)
+
+    def _unprepared_locked(self):
+        return [job for job in itertools.chain(self._pending, self._paused)
+                if job.merge_info is None or job.merge_info[0] != self._merge_key]
+
+    def _prepare_merge(self, jobs):
+        """Work out the merge keys of ``jobs`` before they are queued; not under the lock, it may touch the disk."""
+        with self._lock:
+            merger, merge_key = self.merger, self._merge_key
+        if merger is None or merge_key is None:
+            return
+        for job in jobs:
+            try:
+                merger.prepare(job, merge_key)
+            except (OSError, ValueError):  # e.g. paths that can't be parsed; the job just isn't merged
+                job.merge_info = None
+
+    def set_limits(self, max_workers=None, per_repo_limit=None):
+        with self._lock:
+            if max_workers is not None:
+                self.max_workers = max(1, int(max_workers))
+            if per_repo_limit is not None:
+                self.per_repo_limit = max(0, int(per_repo_limit))
+        self._dispatch()
+
+    # --- Scheduling ---
+    def _repo_has_capacity_locked(self, repository):
+        if not self.per_repo_limit:
+            return True
+        return self._running_per_repo.get(repository, 0) < self.per_repo_limit
+
+    def _take_next_locked(self, now):
+        """Dequeue the next job to start plus any queued jobs merged into it, or return None."""
+        def runnable(job):
+            if job.retry_at is not None and job.retry_at > now:
+                return False
+            return self._repo_has_capacity_locked(job.repository)
+
+        if self.policy is None:
+            job = next((job for job in self._pending if runnable(job)), None)
+        else:
+            job = self.policy.select(self._pending, runnable)
+        if job is None:
+            return None
+        jobs = [job]
+        if self.merger is not None and self._run_merged is not None and self._merge_key is not None:
+            # Merged jobs share the starting job's slot, so only their retry delay matters.
+            jobs.extend(self.merger.collect(job, self._pending,
+                                            lambda other: other.retry_at is None or other.retry_at <= now,
+                                            self._merge_key))
+        for taken in jobs:
+            self._pending.remove(taken.id)
+            taken.retry_at = None
+        if self.policy is not None:
+            self.policy.job_started(job)
+        return jobs
+
+    def _arm_retry_timer_locked(self, now):
+        """Make sure _dispatch runs again when the earliest waiting retry becomes due."""
+        due = min((job.retry_at for job in self._pending if job.retry_at is not None and job.retry_at > now),
+                  default=None)
+        if due is None or (self._retry_timer_due is not None and self._retry_timer_due <= due):
+            return
+        if self._retry_timer:
+            self._retry_timer.cancel()
+        self._retry_timer = threading.Timer(due - now, self._on_retry_timer)
+        self._retry_timer.daemon = True
+        self._retry_timer_due = due
+        self._retry_timer.start()
+
+    def _on_retry_timer(self):
+        with self._lock:
+            self._retry_timer = None
+            self._retry_timer_due = None
+        self._dispatch()
+
+    def _dispatch(self):
+        started = []
+        with self._lock:
+            now = time.monotonic()
+            while self._workers < self.max_workers:
+                jobs = self._take_next_locked(now)
+                if jobs is None:
+                    break
+                batch = _WorkerBatch(jobs)
+                for job in jobs:
+                    job.status = JOB_RUNNING
+                    job.stop_requested = None
+                    self._running[job.id] = job
+                    self._batches[job.id] = batch
+                repository = jobs[0].repository
+                self._running_per_repo[repository] = self._running_per_repo.get(repository, 0) + 1
+                self._workers += 1
+                started.append(batch)
+            self._arm_retry_timer_locked(now)
+        for batch in started:
+            for job in batch.jobs:
+                if self.store:
+                    self.store.set_status(job.id, JOB_RUNNING)
+                if self.on_job_started:
+                    self.on_job_started(job)
+            thread = threading.Thread(target=self._run_worker, args=(batch,), daemon=True)
+            thread.start()
+
+    def _on_worker_status(self, job: UploadJob, message):
+        if self.on_job_status:
+            self.on_job_status(job, message)
+
+    def _on_worker_progress(self, job: UploadJob, percentage):
+        job.progress = float(percentage)
+        if self.on_job_progress:
+            self.on_job_progress(job, job.progress)
+
+    def _run_worker(self, batch: _WorkerBatch):
+        jobs = batch.jobs
+        with self._lock:
+            run_job, run_merged = self._run_job, self._run_merged
+        try:
+            if len(jobs) == 1:
+                job = jobs[0]
+                results = [run_job(job, lambda message: self._on_worker_status(job, message),
+                                   lambda percentage: self._on_worker_progress(job, percentage))]
+            else:
+                results = run_merged(jobs, self._on_worker_status, self._on_worker_progress)
+        except Exception as e:
+            traceback.print_exc()
+            results = [(False, f"Job ID:{job.id} Unexpected Error:\n{e}") for job in jobs]
+
+        retry_delays = [None] * len(jobs)
+        if self.retry_policy:
+            retry_delays = [None if success or job.stop_requested else self.retry_policy.retry_delay(job, message)
+                            for job, (success, message) in zip(jobs, results)]
+
+        stopped = {}  # job id -> stop_requested, for jobs that did not succeed
+        requeued, paused = [], []  # saved to the store with their attempt and remaining paths
+        with self._lock:
+            # Requeued jobs go back to the front in reverse, so they keep their relative order.
+            for job, (success, _message), retry_delay in reversed(list(zip(jobs, results, retry_delays))):
+                stop_requested, job.stop_requested = job.stop_requested, None
+                if stop_requested and not success:
+                    stopped[job.id] = stop_requested
+                if success:
+                    job.status = JOB_SUCCEEDED
+                    job.progress = 100.0
+                elif stop_requested == JOB_PAUSED:
+                    self._narrow_to_remaining(job)
+                    job.status = JOB_PAUSED
+                    self._paused.append(job)
+                    paused.append(job)
+                elif stop_requested == JOB_CANCELLED:
+                    job.status = JOB_CANCELLED
+                elif stop_requested == JOB_QUEUED:
+                    self._narrow_to_remaining(job)
+                    job.status = JOB_QUEUED
+                    self._pending.appendleft(job)
+                    requeued.insert(0, job)
+                elif retry_delay is not None:
+                    self._prepare_retry_locked(job, retry_delay)
+                    requeued.insert(0, job)
+                else:
+                    job.status = JOB_FAILED
+                self._running.pop(job.id, None)
+                self._batches.pop(job.id, None)
+            self._release_slot_locked(batch)
+            self._finishing += 1
+            before_job_id = self._pending_after_locked(requeued[-1].id) if requeued else None
+
+        try:
+            if self.store:
+                self.store.requeue_many_before(requeued, before_job_id)
+                if paused:
+                    self.store.save_remaining(paused)
+            for job, (success, message), retry_delay in zip(jobs, results, retry_delays):
+                stop_requested = stopped.get(job.id)
+                if stop_requested:
+                    # The backend's own message is whatever stopping it caused; report the stop instead.
+                    message = None if stop_requested == JOB_QUEUED else stopped_message(job, stop_requested)
+                if self.store:
+                    self.store.set_status(job.id, job.status, message)
+                if stop_requested == JOB_QUEUED:
+                    continue  # back in the queue because a job it shared a commit with was stopped
+                if stop_requested == JOB_PAUSED:
+                    if self.on_job_paused:
+                        self.on_job_paused(job, message)
+                elif retry_delay is not None:
+                    if self.on_job_retry:
+                        self.on_job_retry(job, retry_delay, message)
+                elif self.on_job_finished:
+                    self.on_job_finished(job, success, message)
+        finally:
+            with self._lock:
+                self._finishing -= 1
+            self._dispatch()
+            with self._lock:
+                self._idle_condition.notify_all()
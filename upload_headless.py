@@ -0,0 +1,372 @@
+"""Headless runner for the Hugging Face Upload Tool.
+
+Runs the same queue engine as the GUI without a display, for training nodes
+and scripts::
+
+    python -m upload_headless jobs.jsonl
+    generate_jobs | python -m upload_headless -
+
+The manifest has one JSON object per line::
+
+    {"repository": "user/model", "subfolder": "ckpt", "paths": ["out/step_1000"]}
+
+``paths`` may instead be given as ``file_paths``, a single shlex-quoted string
+as typed in the GUI. A job for a single folder may also carry ``include`` and
+``exclude`` lists of globs and ``"sync": true`` to upload only the files
+that changed since that folder's last sync (``"delete": true`` also deletes
+files removed locally from the repo), and any job an integer ``priority``
+(used by ``--policy priority``). Blank lines and lines starting with ``#`` are ignored.
+When reading stdin, jobs are queued as lines arrive and the runner exits once
+stdin is closed and the queue has drained.
+
+A line may instead control jobs already queued, by the ``job_id`` of their
+``queued`` event: ``{"pause": [3, 4]}``, ``{"resume": [3]}`` or
+``{"cancel": [4]}``. Running jobs stop within a second. Paused jobs don't
+keep the runner alive; they stay paused in the saved queue until resumed.
+
+Progress is printed to stdout as JSON lines (``queued``, ``started``,
+``status``, ``progress``, ``retry``, ``paused``, ``finished``, ``error`` and
+a final ``summary``). Rate-limited and other transient failures are retried with
+backoff (``--max-retries``); a ``retry`` event is printed for each attempt.
+Upload bandwidth can be capped with ``--max-rate``, ``--job-rate``,
+``--repo-rate`` and a time-of-day ``--rate-schedule``. ``finished`` events
+carry the job's duration and average throughput; ``--metrics-file`` writes
+per-job metrics as CSV or JSON on exit and ``--metrics-port`` serves them in
+the Prometheus text format on http://127.0.0.1:PORT/metrics while running.
+``--profile FILE`` writes cProfile stats of every thread on exit and
+``--trace-memory N`` traces allocations and prints a ``memory`` event with
+the peak and the top N allocation sites (see upload_profiling.py).
+Status and progress events are coalesced to at most ``--event-rate`` batches
+per second. Large folders are split into parts (see ``--batch-files`` and
+``--batch-bytes``); small queued jobs for the same repository are merged
+into one commit (see ``--merge-jobs`` and ``--merge-bytes``) but still get
+their own events. Part events carry ``parent_id`` and only top-level jobs
+count towards the summary. Jobs whose paths are missing, unreadable or empty
+fail the pre-flight check as soon as they are queued. Exit status is 0 if every job succeeded or was
+cancelled, 1 otherwise.
+
+This module deliberately imports nothing from tkinter or tkinterdnd2.
+"""
+import argparse
+import json
+import shlex
+import sys
+import threading
+import time
+
+from upload_backends import BACKEND_CLI, BACKEND_NAMES
+from upload_bandwidth import BandwidthLimiter, mb_to_bytes, parse_repo_limits, parse_schedule
+from upload_cache import HASH_CACHE_FILE
+from upload_engine import CoalescingEventQueue, DEFAULT_MAX_WORKERS, DEFAULT_PER_REPO_LIMIT, JOB_CANCELLED
+from upload_history import HISTORY_DB_FILE
+from upload_manager import UploadManager, quote_paths
+from upload_merge import MERGE_MAX_BYTES, MERGE_MAX_JOBS
+from upload_metrics import MetricsHttpServer
+from upload_planner import PLAN_MAX_BYTES_PER_BATCH, PLAN_MAX_FILES_PER_BATCH
+from upload_profiling import MemoryTracker, ThreadProfiler
+from upload_retry import DEFAULT_MAX_RETRIES
+from upload_scheduler import DEFAULT_POLICY, POLICY_NAMES, parse_repo_weights
+from upload_sync import SYNC_MANIFEST_FILE
+from upload_queue_store import QUEUE_DB_FILE
+
+# --- Constants ---
+DEFAULT_EVENT_RATE = 4  # status/progress batches per second
+CONTROL_ACTIONS = ("pause", "resume", "cancel")
+
+
+class JsonLinesReporter:
+    """Writes engine events to a stream as JSON lines, coalescing chatty ones."""
+
+    def __init__(self, stream=sys.stdout):
+        self.stream = stream
+        self.events = CoalescingEventQueue()
+        self.succeeded = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.metrics = None  # the manager's MetricsRecorder, once there is one
+
+    def emit(self, event, fields):
+        self.stream.write(json.dumps({"event": event, "time": round(time.time(), 3), **fields}) + "\n")
+        self.stream.flush()
+
+    def flush(self):
+        for callback, args in self.events.drain():
+            callback(*args)
+
+    # Engine callbacks (worker threads)
+    def on_job_queued(self, job):
+        self.events.post(self.emit, "queued", {"job_id": job.id, "parent_id": job.parent_id,
+                                               "repository": job.repository, "subfolder": job.subfolder,
+                                               "paths": job.local_paths(), "files": job.folder_files,
+                                               "total_bytes": job.total_bytes})
+
+    def on_job_started(self, job):
+        self.events.post(self.emit, "started", {"job_id": job.id, "repository": job.repository,
+                                                "total_files": job.total_files, "total_bytes": job.total_bytes})
+
+    def on_job_status(self, job, message):
+        self.events.post(self.emit, "status", {"job_id": job.id, "message": message}, key=("status", job.id))
+
+    def on_job_progress(self, job, percentage):
+        self.events.post(self.emit, "progress", {"job_id": job.id, "percent": percentage},
+                         key=("progress", job.id))
+
+    def on_job_retry(self, job, delay, message):
+        self.events.post(self.emit, "retry", {"job_id": job.id, "parent_id": job.parent_id, "attempt": job.attempt,
+                                              "delay": round(delay, 3), "message": message})
+
+    def on_job_paused(self, job, message):
+        self.events.post(self.emit, "paused", {"job_id": job.id, "parent_id": job.parent_id, "message": message})
+
+    def on_history_error(self, error):
+        self.events.post(self.emit, "error", {"message": f"Could not write upload history: {error}"})
+
+    def on_job_finished(self, job, success, message):
+        if job.parent_id is None:
+            if success:
+                self.succeeded += 1
+            elif job.status == JOB_CANCELLED:
+                self.cancelled += 1
+            else:
+                self.failed += 1
+        fields = {"job_id": job.id, "parent_id": job.parent_id, "repository": job.repository,
+                  "success": success, "message": message,
+                  "bytes_skipped": job.bytes_skipped, "bytes_sent": job.bytes_to_send}
+        metrics = self.metrics.job_metrics(job.id) if self.metrics else None
+        if metrics is not None:
+            fields.update(bytes_sent=metrics.bytes_sent, duration=metrics.duration and round(metrics.duration, 3),
+                          bytes_per_second=round(metrics.average_bytes_per_second), retries=metrics.retries)
+        self.events.post(self.emit, "finished", fields)
+
+    def error(self, message, **fields):
+        self.errors += 1
+        self.events.post(self.emit, "error", {"message": message, **fields})
+
+
+def _glob_list(entry, key):
+    globs = entry.get(key)
+    if globs is None:
+        return None
+    if not isinstance(globs, list):
+        raise ValueError(f'"{key}" must be a list of glob patterns')
+    return [str(pattern) for pattern in globs]
+
+
+def load_manifest_entry(line):
+    """The JSON object on a manifest line, or None for a blank or comment line."""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    entry = json.loads(line)
+    if not isinstance(entry, dict):
+        raise ValueError("manifest entries must be JSON objects")
+    return entry
+
+
+def parse_control_entry(entry):
+    """Return ``(action, job_ids)`` for a pause/resume/cancel entry, or None for a job entry."""
+    actions = [action for action in CONTROL_ACTIONS if action in entry]
+    if not actions:
+        return None
+    if len(actions) > 1 or len(entry) > 1:
+        raise ValueError(f'a "{actions[0]}" line takes no other keys')
+    job_ids = entry[actions[0]]
+    if not isinstance(job_ids, list) or not all(isinstance(job_id, int) and not isinstance(job_id, bool)
+                                                for job_id in job_ids):
+        raise ValueError(f'"{actions[0]}" must be a list of job ids')
+    return actions[0], job_ids
+
+
+def parse_manifest_entry(entry):
+    """Return ``(repository, subfolder, file_paths_display_str, include, exclude, priority, sync, delete)``."""
+    if "paths" in entry:
+        if not isinstance(entry["paths"], list):
+            raise ValueError('"paths" must be a list of local paths')
+        file_paths = quote_paths(entry["paths"])
+    else:
+        file_paths = str(entry.get("file_paths", ""))
+        shlex.split(file_paths)  # report unbalanced quotes against this line, not as a failed job
+    priority = entry.get("priority", 0)
+    if not isinstance(priority, int) or isinstance(priority, bool):
+        raise ValueError('"priority" must be an integer')
+    for key in ("sync", "delete"):
+        if not isinstance(entry.get(key, False), bool):
+            raise ValueError(f'"{key}" must be true or false')
+    if entry.get("delete") and not entry.get("sync"):
+        raise ValueError('"delete" only applies to sync jobs; add "sync": true')
+    return (str(entry.get("repository", "")), str(entry.get("subfolder", "") or ""), file_paths,
+            _glob_list(entry, "include"), _glob_list(entry, "exclude"), priority,
+            entry.get("sync", False), entry.get("delete", False))
+
+
+def enqueue_manifest(manager, stream, reporter):
+    for line_number, line in enumerate(stream, start=1):
+        try:
+            entry = load_manifest_entry(line)
+            if entry is None:
+                continue
+            control = parse_control_entry(entry)
+            if control is None:
+                manager.enqueue(*parse_manifest_entry(entry))
+            else:
+                action, job_ids = control
+                getattr(manager, action)(job_ids)
+        except ValueError as e:  # json.JSONDecodeError is a ValueError
+            reporter.error(str(e), line=line_number)
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(prog="python -m upload_headless",
+                                     description="Queue and run Hugging Face uploads without a GUI.")
+    parser.add_argument("manifest", nargs="?", default="-",
+                        help="JSON-lines manifest of jobs, or - for stdin (default)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="parallel uploads")
+    parser.add_argument("--per-repo", type=int, default=DEFAULT_PER_REPO_LIMIT,
+                        help="max parallel uploads per repository (0 = no limit)")
+    parser.add_argument("--backend", choices=BACKEND_NAMES, default=BACKEND_CLI)
+    parser.add_argument("--no-skip-unchanged", action="store_true",
+                        help="upload every file even if the cache says it is already on the Hub")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="do not run jobs left in the saved queue by a previous session")
+    parser.add_argument("--queue-db", default=QUEUE_DB_FILE)
+    parser.add_argument("--hash-cache", default=HASH_CACHE_FILE)
+    parser.add_argument("--sync-manifest", default=SYNC_MANIFEST_FILE,
+                        help="index of what each sync job's folder last uploaded")
+    parser.add_argument("--history-db", default=HISTORY_DB_FILE,
+                        help="where every finished job is recorded")
+    parser.add_argument("--batch-files", type=int, default=PLAN_MAX_FILES_PER_BATCH,
+                        help="max files per part when a folder is split")
+    parser.add_argument("--batch-bytes", type=int, default=PLAN_MAX_BYTES_PER_BATCH,
+                        help="max bytes per part when a folder is split")
+    parser.add_argument("--merge-jobs", type=int, default=MERGE_MAX_JOBS,
+                        help="max queued jobs for one repository uploaded in a single commit (1 = never merge)")
+    parser.add_argument("--merge-bytes", type=int, default=MERGE_MAX_BYTES,
+                        help="max total bytes of jobs merged into a single commit")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help="retries per job for rate limits and transient errors (0 = never retry)")
+    parser.add_argument("--max-rate", type=float, default=0,
+                        help="total upload cap in MB/s across all jobs (0 = unlimited)")
+    parser.add_argument("--job-rate", type=float, default=0, help="upload cap in MB/s per job (0 = unlimited)")
+    parser.add_argument("--repo-rate", action="append", default=[], metavar="REPO=MBPS",
+                        help="upload cap for one repository; may be repeated")
+    parser.add_argument("--rate-schedule", default="", metavar="HH:MM-HH:MM=MBPS,...",
+                        help="time-of-day overrides of --max-rate, e.g. 22:00-07:00=0 to lift it at night")
+    parser.add_argument("--policy", choices=POLICY_NAMES, default=DEFAULT_POLICY,
+                        help="how the next job is picked: queue order, job priority, round-robin "
+                             "between repositories, or smallest first")
+    parser.add_argument("--repo-weight", action="append", default=[], metavar="REPO=WEIGHT",
+                        help="share of the workers for one repository under --policy fair-share; may be repeated")
+    parser.add_argument("--metrics-file", default="",
+                        help="write per-job metrics here on exit (.json for JSON, otherwise CSV)")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="serve Prometheus metrics on 127.0.0.1 at this port (0 = off)")
+    parser.add_argument("--event-rate", type=float, default=DEFAULT_EVENT_RATE,
+                        help="max status/progress event batches per second")
+    parser.add_argument("--profile", default="", metavar="FILE",
+                        help="write cProfile stats of all threads here on exit (for python -m pstats)")
+    parser.add_argument("--trace-memory", type=int, default=0, metavar="N",
+                        help="trace allocations and report the peak and top N allocation sites on exit (slow)")
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    reporter = JsonLinesReporter()
+    try:
+        limiter = BandwidthLimiter(global_limit=mb_to_bytes(args.max_rate), per_job_limit=mb_to_bytes(args.job_rate),
+                                   repo_limits=parse_repo_limits(" ".join(args.repo_rate)),
+                                   schedule=parse_schedule(args.rate_schedule))
+        repo_weights = parse_repo_weights(" ".join(args.repo_weight))
+    except ValueError as e:
+        reporter.emit("error", {"message": str(e)})
+        return 2
+
+    try:
+        manifest = sys.stdin if args.manifest == "-" else open(args.manifest, "r", encoding="utf-8")
+    except OSError as e:
+        reporter.emit("error", {"message": f"Cannot open manifest: {e}"})
+        return 2
+
+    profiler = ThreadProfiler().start() if args.profile else None
+    memory = MemoryTracker().start() if args.trace_memory else None
+    try:
+        manager = UploadManager(
+            backend_name=args.backend, max_workers=args.workers, per_repo_limit=args.per_repo,
+            skip_unchanged=not args.no_skip_unchanged, queue_db_path=args.queue_db,
+            hash_cache_path=args.hash_cache, history_db_path=args.history_db,
+            sync_manifest_path=args.sync_manifest,
+            max_files_per_batch=args.batch_files, max_bytes_per_batch=args.batch_bytes,
+            merge_max_jobs=args.merge_jobs, merge_max_bytes=args.merge_bytes,
+            max_retries=args.max_retries, bandwidth_limiter=limiter,
+            scheduling_policy=args.policy, repo_weights=repo_weights,
+            on_job_queued=reporter.on_job_queued, on_job_started=reporter.on_job_started,
+            on_job_status=reporter.on_job_status, on_job_progress=reporter.on_job_progress,
+            on_job_finished=reporter.on_job_finished, on_job_retry=reporter.on_job_retry,
+            on_job_paused=reporter.on_job_paused,
+            on_history_error=reporter.on_history_error)
+    except ImportError as e:
+        reporter.emit("error", {"message": str(e)})
+        return 2
+    reporter.metrics = manager.metrics
+
+    metrics_server = None
+    if args.metrics_port:
+        try:
+            metrics_server = MetricsHttpServer(manager.metrics, port=args.metrics_port).start()
+        except OSError as e:
+            reporter.emit("error", {"message": f"Cannot serve metrics on port {args.metrics_port}: {e}"})
+            if manifest is not sys.stdin:
+                manifest.close()
+            manager.close()
+            return 2
+
+    if not args.no_resume:
+        manager.restore()
+
+    reader = threading.Thread(target=enqueue_manifest, args=(manager, manifest, reporter), daemon=True)
+    reader.start()
+    interval = 1 / max(args.event_rate, 0.1)
+    try:
+        while reader.is_alive() or not manager.is_idle():
+            reporter.flush()
+            # Both waits return early, so short runs don't pay a full interval at exit.
+            if reader.is_alive():
+                reader.join(interval)
+            else:
+                manager.wait_until_idle(interval)
+        reporter.flush()
+    except KeyboardInterrupt:
+        reporter.flush()
+        reporter.emit("error", {"message": "Interrupted; unfinished jobs stay in the saved queue."})
+        return 130
+    finally:
+        if manifest is not sys.stdin:
+            manifest.close()
+        if metrics_server is not None:
+            metrics_server.stop()
+        if args.metrics_file:
+            try:
+                manager.metrics.export(args.metrics_file)
+            except OSError as e:
+                reporter.emit("error", {"message": f"Cannot write metrics file: {e}"})
+        manager.close()
+        if memory is not None:
+            current, peak = memory.peak()
+            reporter.emit("memory", {"current_bytes": current, "peak_bytes": peak,
+                                     "top": memory.report(args.trace_memory).splitlines()})
+            memory.stop()
+        if profiler is not None:
+            profiler.stop()
+            try:
+                profiler.dump(args.profile)
+            except OSError as e:
+                reporter.emit("error", {"message": f"Cannot write profile: {e}"})
+
+    reporter.emit("summary", {"succeeded": reporter.succeeded, "failed": reporter.failed,
+                              "cancelled": reporter.cancelled, "errors": reporter.errors})
+    return 0 if not reporter.failed and not reporter.errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""Append-only history of finished jobs, and repository suggestions from it.
+
+``upload_history.txt`` used to hold the last ten repository names and was
+rewritten after every successful job; nothing recorded what was uploaded.
+``UploadHistory`` keeps one row per finished job in SQLite (``job_events``,
+indexed on repository and time): its paths, file count, bytes, duration,
+throughput, retries, outcome and final message. ``record`` only queues the
+row; a writer thread inserts queued rows in batches, one transaction per
+batch, so neither workers nor the UI thread wait on the disk. A batch that
+cannot be written is dropped, counted in ``write_errors`` and passed to
+``on_error(exception)`` on the writer thread.
+
+The repository box is filled from the ``repositories`` table, one row per
+repository with its number of successful top-level jobs and a frecency key:
+each use adds 1 to a score that halves every ``half_life`` seconds. The key
+is stored as ``log2(score) + time / half_life``, so all keys decay alike and
+their order never needs recomputing. The table is mirrored in memory and
+kept sorted by lower-cased name, so ``suggest(prefix)`` is a bisect plus a
+top-N pick, also with a long history. The old text file is imported once.
+"""
+import bisect
+import heapq
+import math
+import operator
+import os
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, fields
+
+from upload_engine import JOB_SUCCEEDED
+
+# --- Constants ---
+HISTORY_DB_FILE = "upload_history.sqlite3"
+LEGACY_HISTORY_FILE = "upload_history.txt"
+HISTORY_HALF_LIFE_SECONDS = 14 * 24 * 3600
+HISTORY_FLUSH_SECONDS = 0.5  # how long the writer gathers rows before a batch
+HISTORY_MAX_BATCH = 1000
+MAX_SUGGESTIONS = 20
+
+
+@dataclass
+class JobEvent:
+    """One finished job, as stored in ``job_events``."""
+    recorded_at: float  # time.time()
+    job_id: int
+    parent_id: int | None
+    repository: str
+    subfolder: str
+    paths: str  # file_paths_display_str
+    files: int | None
+    total_bytes: int | None
+    bytes_sent: int
+    duration: float | None
+    bytes_per_second: float | None
+    retries: int
+    outcome: str  # JOB_SUCCEEDED, JOB_FAILED, JOB_REMOVED or JOB_CANCELLED
+    message: str | None = None
+
+
+EVENT_FIELDS = [f.name for f in fields(JobEvent)]
+_event_row = operator.attrgetter(*EVENT_FIELDS)
+
+
+def bump_frecency(frecency, now, half_life=HISTORY_HALF_LIFE_SECONDS):
+    """The frecency key after one more use at ``now`` (``frecency`` None for a first use)."""
+    if frecency is None:
+        return now / half_life
+    decayed = frecency - now / half_life  # log2 of the old score, decayed to now
+    return math.log2(2 ** decayed + 1) + now / half_life
+
+
+class UploadHistory:
+    """SQLite job history with batched background writes and ranked repository prefix search."""
+
+    def __init__(self, db_path=HISTORY_DB_FILE, legacy_file=LEGACY_HISTORY_FILE,
+                 half_life=HISTORY_HALF_LIFE_SECONDS, on_error=None):
+        self.half_life = half_life
+        self.on_error = on_error
+        self.write_errors = 0
+        self._lock = threading.Lock()  # guards the in-memory repositories
+        self._db_lock = threading.Lock()  # guards the connection, so lookups never wait on a commit
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS job_events (
+                id INTEGER PRIMARY KEY,
+                recorded_at REAL NOT NULL,
+                job_id INTEGER NOT NULL,
+                parent_id INTEGER,
+                repository TEXT NOT NULL,
+                subfolder TEXT NOT NULL,
+                paths TEXT NOT NULL,
+                files INTEGER,
+                total_bytes INTEGER,
+                bytes_sent INTEGER NOT NULL,
+                duration REAL,
+                bytes_per_second REAL,
+                retries INTEGER NOT NULL,
+                outcome TEXT NOT NULL,
+                message TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_job_events_repository ON job_events(repository, recorded_at);
+            CREATE INDEX IF NOT EXISTS idx_job_events_time ON job_events(recorded_at);
+            CREATE TABLE IF NOT EXISTS repositories (
+                repository TEXT PRIMARY KEY,
+                uses INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                frecency REAL NOT NULL
+            ) WITHOUT ROWID;
+        """)
+        self._conn.commit()
+
+        self._repos = {}  # repository -> [uses, last_used, frecency]
+        self._keys = []  # sorted (repository.lower(), repository)
+        for repository, uses, last_used, frecency in self._conn.execute("SELECT * FROM repositories"):
+            self._repos[repository] = [uses, last_used, frecency]
+        if not self._repos and legacy_file:
+            self._import_legacy(legacy_file)
+        self._keys = sorted((repository.lower(), repository) for repository in self._repos)
+
+        self._pending = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _import_legacy(self, legacy_file):
+        """Seed the repositories from the old most-recently-used text file, keeping its order."""
+        try:
+            with open(legacy_file, "r", encoding='utf-8') as f:
+                names = [line.strip() for line in f if line.strip()]
+            modified = os.path.getmtime(legacy_file)
+        except OSError:
+            return
+        for age, repository in enumerate(reversed(names)):
+            if repository not in self._repos:
+                used_at = modified - age
+                self._repos[repository] = [1, used_at, bump_frecency(None, used_at, self.half_life)]
+        self._conn.executemany("INSERT OR REPLACE INTO repositories VALUES (?, ?, ?, ?)",
+                               [(repository, *entry) for repository, entry in self._repos.items()])
+        self._conn.commit()
+
+    # --- Recording (any thread) ---
+    def record(self, event: JobEvent, counts_as_use=None):
+        """Queue ``event`` for writing. Successful top-level jobs count as a use of their repository."""
+        if counts_as_use is None:
+            counts_as_use = event.outcome == JOB_SUCCEEDED and event.parent_id is None
+        repo_row = None
+        if counts_as_use:
+            with self._lock:
+                entry = self._repos.get(event.repository)
+                if entry is None:
+                    entry = self._repos[event.repository] = [0, 0.0, None]
+                    bisect.insort(self._keys, (event.repository.lower(), event.repository))
+                entry[0] += 1
+                entry[1] = event.recorded_at
+                entry[2] = bump_frecency(entry[2], event.recorded_at, self.half_life)
+                repo_row = (event.repository, *entry)
+        self._pending.put((event, repo_row))
+
+    def _write_loop(self):
+        while True:
+            item = self._pending.get()
+            batch = [item]
+            deadline = time.monotonic() + HISTORY_FLUSH_SECONDS
+            while item is not None and len(batch) < HISTORY_MAX_BATCH:
+                try:
+                    item = self._pending.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+            rows = [entry for entry in batch if entry is not None]
+            try:
+                self._write(rows)
+            except sqlite3.Error as e:
+                self.write_errors += 1
+                if self.on_error:
+                    self.on_error(e)
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+            if len(rows) < len(batch):
+                return  # close() was called
+
+    def _write(self, rows):
+        if not rows:
+            return
+        repo_rows = {}
+        for _event, repo_row in rows:
+            if repo_row is not None:
+                repo_rows[repo_row[0]] = repo_row  # the last use of a repository in the batch wins
+        with self._db_lock:
+            self._conn.executemany(
+                f"INSERT INTO job_events ({', '.join(EVENT_FIELDS)}) VALUES ({', '.join('?' * len(EVENT_FIELDS))})",
+                [_event_row(event) for event, _repo_row in rows])
+            self._conn.executemany("INSERT OR REPLACE INTO repositories VALUES (?, ?, ?, ?)", repo_rows.values())
+            self._conn.commit()
+
+    def flush(self):
+        """Block until every recorded event is written."""
+        self._pending.join()
+
+    # --- Queries (any thread) ---
+    def suggest(self, prefix="", limit=MAX_SUGGESTIONS):
+        """Repositories starting with ``prefix`` (case-insensitive), most frequently and recently used first."""
+        prefix = prefix.strip().lower()
+        with self._lock:
+            start = bisect.bisect_left(self._keys, (prefix,))
+            end = bisect.bisect_left(self._keys, (prefix + "\uffff",)) if prefix else len(self._keys)
+            candidates = [repository for _key, repository in self._keys[start:end]]
+            return heapq.nlargest(limit, candidates, key=lambda repository: self._repos[repository][2])
+
+    def most_recent(self):
+        """The repository of the latest successful job, or None."""
+        with self._lock:
+            if not self._repos:
+                return None
+            return max(self._repos, key=lambda repository: self._repos[repository][1])
+
+    def events(self, repository=None, since=None, limit=100):
+        """Written events, newest first, optionally for one repository and/or from ``since`` (time.time()) on."""
+        clauses, params = [], []
+        if repository is not None:
+            clauses.append("repository = ?")
+            params.append(repository)
+        if since is not None:
+            clauses.append("recorded_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        with self._db_lock:
+            rows = self._conn.execute(f"SELECT {', '.join(EVENT_FIELDS)} FROM job_events {where}"
+                                      f"ORDER BY recorded_at DESC LIMIT ?", (*params, limit)).fetchall()
+        return [JobEvent(*row) for row in rows]
+
+    def close(self):
+        """Write what is still queued and close the database."""
+        self._pending.put(None)
+        self._writer.join()
+        with self._db_lock:
+            self._conn.close()
@@ -0,0 +1,659 @@
+"""Front-end independent upload service.
+
+``UploadManager`` wires together everything an upload front-end needs: the
+backends, the dedup cache, the persistent queue store, the worker pool and
+the job history (``upload_history.UploadHistory``), which also ranks the
+repositories offered for autocomplete. Both the Tk app (huggingface_upload_tool.py) and the
+headless runner (upload_headless.py) drive it. Nothing here imports tkinter.
+
+Every new job goes through a planning stage first (off the caller's thread).
+Single-folder jobs are scanned and, if they hold more than one batch worth of
+files, split into sub-jobs that upload independently; other jobs get a
+pre-flight check of their paths (``upload_preflight``) and fail right away
+if a file is missing, unreadable or empty. The original job then
+acts as their parent: it reports the byte-weighted progress of its parts and
+finishes once all of them have.
+
+Sync jobs (``enqueue(..., sync=True)``) are planned against the folder's
+sync index instead (``upload_sync.SyncManifest``): only added and modified
+files are batched, and the index is updated from each job as it succeeds.
+
+Small queued jobs for the same repository are merged into one commit by the
+worker pool (``upload_merge.CommitMerger``, limits set with
+``set_merge_limits``) when the backend can combine them.
+
+Every job's timings, bytes sent and retries are recorded in ``metrics``
+(an ``upload_metrics.MetricsRecorder``), which also tracks the overall
+throughput used for the ETA.
+
+Every job that finishes, fails, is removed or is cancelled, including the
+parts of a split folder, is recorded in ``history`` with its metrics.
+
+Queued and running jobs can be paused, resumed and cancelled (``pause``,
+``resume``, ``cancel``; see ``UploadWorkerPool``). Pausing or cancelling a
+split parent does the same to all of its parts.
+
+The ``on_job_*`` callbacks are invoked from worker threads (``on_job_queued``
+from the caller's thread); front-ends marshal them as they see fit, e.g.
+through ``upload_engine.CoalescingEventQueue``.
+"""
+import shlex
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from upload_backends import BACKEND_CLI, create_backend
+from upload_bandwidth import BandwidthLimiter
+from upload_cache import HASH_CACHE_FILE, UploadHashCache, make_dedup_run_job, make_dedup_run_merged
+from upload_engine import (UploadJob, UploadWorkerPool, DEFAULT_MAX_WORKERS, DEFAULT_PER_REPO_LIMIT,
+                           JOB_CANCELLED, JOB_FAILED, JOB_PLANNING, JOB_QUEUED, JOB_REMOVED, JOB_RUNNING,
+                           JOB_SUCCEEDED, format_bytes)
+from upload_history import HISTORY_DB_FILE, LEGACY_HISTORY_FILE, JobEvent, UploadHistory
+from upload_merge import MERGE_MAX_BYTES, MERGE_MAX_JOBS, CommitMerger
+from upload_metrics import MetricsRecorder
+from upload_planner import (PLAN_MAX_BYTES_PER_BATCH, PLAN_MAX_FILES_PER_BATCH, is_single_folder_job, plan_batches,
+                            plan_folder_job)
+from upload_preflight import PREFLIGHT_WORKERS, preflight_paths
+from upload_queue_store import QUEUE_DB_FILE, JobQueueStore
+from upload_retry import DEFAULT_MAX_RETRIES, RetryPolicy
+from upload_scheduler import DEFAULT_POLICY, create_policy
+from upload_sync import SYNC_MANIFEST_FILE, SyncManifest, batch_deletions, sync_target
+
+# --- Constants ---
+PLAN_WORKERS = 2  # folders scanned at the same time; each scan is itself parallel
+
+
+def quote_paths(paths):
+    """Join local paths into the shlex-quoted form stored on ``UploadJob``."""
+    return " ".join(shlex.quote(str(p)) for p in paths)
+
+
+class SplitUpload:
+    """Tracks the sub-jobs of a folder upload that was split into batches."""
+
+    def __init__(self, parent: UploadJob, parts=()):
+        self.parent = parent
+        self.parts = {}
+        self.unfinished = set()
+        self.started = False
+        self.failures = []
+        self.removed = 0
+        self.cancelled = 0
+        for part in parts:
+            self.add_part(part)
+
+    def add_part(self, part: UploadJob):
+        self.parts[part.id] = part
+        self.unfinished.add(part.id)
+
+    def progress(self):
+        total_bytes = sum(part.total_bytes or 0 for part in self.parts.values())
+        if not total_bytes:
+            done = len(self.parts) - len(self.unfinished)
+            return 100.0 * done / len(self.parts)
+        sent = sum((part.total_bytes or 0) * (100.0 if part.id not in self.unfinished else part.progress)
+                   for part in self.parts.values())
+        return sent / total_bytes
+
+    def summary(self):
+        parent = self.parent
+        succeeded = len(self.parts) - len(self.failures) - self.removed - self.cancelled
+        message = (f"Job ID:{parent.id} Uploaded {succeeded} of {len(self.parts)} part(s) "
+                   f"({format_bytes(parent.total_bytes or 0)} in total).")
+        if self.removed:
+            message += f" {self.removed} part(s) were removed from the queue."
+        if self.cancelled:
+            message += f" {self.cancelled} part(s) were cancelled."
+        if self.failures:
+            message += "\n" + "\n".join(self.failures)
+        return message
+
+
+class UploadManager:
+    """Queue, execution and history for upload jobs, without any UI."""
+
+    def __init__(self, backend_name=BACKEND_CLI, max_workers=DEFAULT_MAX_WORKERS,
+                 per_repo_limit=DEFAULT_PER_REPO_LIMIT, skip_unchanged=True,
+                 queue_db_path=QUEUE_DB_FILE, hash_cache_path=HASH_CACHE_FILE,
+                 history_db_path=HISTORY_DB_FILE, legacy_history_file=LEGACY_HISTORY_FILE,
+                 sync_manifest_path=SYNC_MANIFEST_FILE,
+                 max_files_per_batch=PLAN_MAX_FILES_PER_BATCH, max_bytes_per_batch=PLAN_MAX_BYTES_PER_BATCH,
+                 max_retries=DEFAULT_MAX_RETRIES, bandwidth_limiter=None,
+                 scheduling_policy=DEFAULT_POLICY, repo_weights=None,
+                 merge_max_jobs=MERGE_MAX_JOBS, merge_max_bytes=MERGE_MAX_BYTES,
+                 on_job_queued=None, on_job_started=None, on_job_status=None, on_job_progress=None,
+                 on_job_finished=None, on_job_retry=None, on_job_paused=None, on_history_error=None):
+        self.on_job_queued = on_job_queued
+        self.on_job_retry = on_job_retry
+        self.on_job_paused = on_job_paused
+        self.on_job_started = on_job_started
+        self.on_job_status = on_job_status
+        self.on_job_progress = on_job_progress
+        self.on_job_finished = on_job_finished
+
+        self.history = UploadHistory(history_db_path, legacy_history_file, on_error=on_history_error)
+        self.metrics = MetricsRecorder()
+        self.bandwidth_limiter = bandwidth_limiter or BandwidthLimiter()
+        self.queue_store = JobQueueStore(queue_db_path)
+        self.hash_cache = UploadHashCache(hash_cache_path)
+        self.sync_manifest = SyncManifest(sync_manifest_path)
+        self.backends = {}
+        self.backend_name = backend_name
+        self.skip_unchanged = skip_unchanged
+        self._job_id_lock = threading.Lock()
+        self._job_id_counter = self.queue_store.max_job_id()
+        self.max_files_per_batch = max_files_per_batch
+        self.max_bytes_per_batch = max_bytes_per_batch
+        self._planner = ThreadPoolExecutor(max_workers=PLAN_WORKERS, thread_name_prefix="plan")
+        self._preflight = ThreadPoolExecutor(max_workers=PREFLIGHT_WORKERS, thread_name_prefix="preflight")
+        self._planning = {}  # job id -> job being scanned or checked
+        self._splits = {}  # parent job id -> SplitUpload
+        self._split_lock = threading.Condition()
+
+        run_job, run_merged, merge_key = self._build_run_job()
+        self.pool = UploadWorkerPool(
+            run_job=run_job,
+            max_workers=max_workers,
+            per_repo_limit=per_repo_limit,
+            on_job_started=self._on_pool_job_started,
+            on_job_status=self._on_pool_job_status,
+            on_job_progress=self._on_pool_job_progress,
+            on_job_finished=self._on_pool_job_finished,
+            store=self.queue_store,
+            retry_policy=RetryPolicy(max_retries=max_retries),
+            on_job_retry=self._on_pool_job_retry,
+            on_job_paused=self._on_pool_job_paused,
+            policy=create_policy(scheduling_policy, repo_weights),
+            merger=CommitMerger(merge_max_jobs, merge_max_bytes), run_merged=run_merged, merge_key=merge_key)
+
+    # --- Configuration ---
+    def _backend(self, name):
+        if name not in self.backends:
+            self.backends[name] = create_backend(name, limiter=self.bandwidth_limiter)
+        return self.backends[name]
+
+    def _build_run_job(self):
+        """``(run_job, run_merged, merge_key)`` for the worker pool."""
+        backend = self._backend(self.backend_name)
+        run_job, run_merged = backend.run, backend.run_merged
+        if self.skip_unchanged:
+            run_job = make_dedup_run_job(self.hash_cache, run_job)
+            run_merged = make_dedup_run_merged(self.hash_cache, run_merged)
+        return run_job, run_merged, backend.merge_key
+
+    def set_backend(self, backend_name):
+        """Use ``backend_name`` for jobs started from now on. Raises ImportError/ValueError."""
+        self._backend(backend_name)
+        self.backend_name = backend_name
+        self.pool.set_run_job(*self._build_run_job())
+
+    def set_skip_unchanged(self, skip_unchanged):
+        self.skip_unchanged = bool(skip_unchanged)
+        self.pool.set_run_job(*self._build_run_job())
+
+    def set_limits(self, max_workers=None, per_repo_limit=None):
+        self.pool.set_limits(max_workers=max_workers, per_repo_limit=per_repo_limit)
+
+    def set_bandwidth_limits(self, global_limit=None, per_job_limit=None, repo_limits=None, schedule=None):
+        """Change upload caps (bytes/sec, 0 = unlimited); running uploads follow immediately.
+
+        ``repo_limits`` replaces all per-repository caps and ``schedule`` the
+        time-of-day rules (``upload_bandwidth.ScheduleRule``).
+        """
+        limiter = self.bandwidth_limiter
+        if global_limit is not None:
+            limiter.set_global_limit(global_limit)
+        if per_job_limit is not None:
+            limiter.set_per_job_limit(per_job_limit)
+        if repo_limits is not None:
+            limiter.set_repo_limits(repo_limits)
+        if schedule is not None:
+            limiter.set_schedule(schedule)
+
+    def set_max_retries(self, max_retries):
+        """Retries allowed per job for retryable failures; 0 disables retrying."""
+        self.pool.retry_policy.max_retries = max(0, int(max_retries))
+
+    def set_scheduling_policy(self, policy_name, repo_weights=None):
+        """Switch how the next job is picked; applies from the next free worker on.
+
+        Raises ValueError for an unknown policy. ``repo_weights`` only matters
+        for fair-share.
+        """
+        self.pool.set_policy(create_policy(policy_name, repo_weights))
+
+    def set_priority(self, job_ids, priority):
+        """Change the priority of queued jobs. Returns the jobs changed."""
+        return self.pool.set_priority(job_ids, priority)
+
+    def set_merge_limits(self, max_jobs=None, max_bytes=None):
+        """Change how many queued jobs, and bytes, one commit may merge; ``max_jobs`` 1 turns merging off."""
+        merger = self.pool.merger
+        self.pool.set_merger(CommitMerger(merger.max_jobs if max_jobs is None else max_jobs,
+                                          merger.max_bytes if max_bytes is None else max_bytes))
+
+    def set_batch_limits(self, max_files_per_batch=None, max_bytes_per_batch=None):
+        """Change how folders queued from now on are split into sub-jobs."""
+        if max_files_per_batch is not None:
+            self.max_files_per_batch = max(1, int(max_files_per_batch))
+        if max_bytes_per_batch is not None:
+            self.max_bytes_per_batch = max(1, int(max_bytes_per_batch))
+
+    # --- Queue ---
+    def _next_job_id(self):
+        with self._job_id_lock:
+            self._job_id_counter += 1
+            return self._job_id_counter
+
+    def enqueue(self, repository, subfolder, file_paths_display_str, include_globs=None, exclude_globs=None,
+                priority=0, sync=False, sync_delete=False):
+        """Validate and queue a job. Raises ValueError with a user-facing message.
+
+        The job is returned in the ``JOB_PLANNING`` state. A single folder
+        reaches the worker pool, possibly as several sub-jobs, once it has been
+        scanned; any other job once its paths passed the pre-flight check, or
+        it finishes as failed listing what is wrong with them. The paths are
+        parsed on the planner thread too, unless include/exclude globs or
+        ``sync`` need to know right away whether they are a single folder.
+        ``sync`` (single folders only) uploads just the files
+        that changed since the folder's last sync; ``sync_delete`` also deletes
+        the ones removed locally from the repo.
+        """
+        repository = repository.strip()
+        subfolder = subfolder.strip()
+        file_paths_display_str = file_paths_display_str.strip()
+        if not repository:
+            raise ValueError("Please specify the Repository (e.g., YourUsername/RepoName).")
+        if not file_paths_display_str:
+            raise ValueError("Please specify or drag & drop/select File/Folder Paths.")
+
+        job = UploadJob(id=self._next_job_id(), repository=repository, subfolder=subfolder,
+                        file_paths_display_str=file_paths_display_str,
+                        include_globs=list(include_globs) if include_globs else None,
+                        exclude_globs=list(exclude_globs) if exclude_globs else None,
+                        priority=int(priority), sync=bool(sync), sync_delete=bool(sync and sync_delete))
+        single_folder = None  # parsing thousands of dropped paths is left to the planner unless needed now
+        if job.include_globs or job.exclude_globs or job.sync:
+            try:
+                single_folder = is_single_folder_job(job)
+            except ValueError as e:  # unbalanced quotes in the paths
+                raise ValueError(f"Could not parse the File/Folder Paths: {e}") from e
+            if (job.include_globs or job.exclude_globs) and not single_folder:
+                raise ValueError("Include/exclude patterns can only be used when uploading a single folder.")
+            if job.sync and not single_folder:
+                raise ValueError("Sync can only be used when uploading a single folder.")
+
+        job.status = JOB_PLANNING
+        with self._split_lock:
+            self._planning[job.id] = job
+        self.metrics.job_queued(job)
+        if self.on_job_queued:
+            self.on_job_queued(job)
+        self._planner.submit(self._plan_new_job, job, single_folder)
+        return job
+
+    def _plan_new_job(self, job: UploadJob, single_folder=None):
+        if single_folder is None:
+            try:
+                single_folder = is_single_folder_job(job)
+            except ValueError as e:
+                self._finish_unplanned(job, f"Job ID:{job.id} Error: Could not parse the File/Folder Paths: {e}")
+                self._done_planning(job)
+                return
+        if single_folder:
+            self._plan_job(job)
+        else:
+            self._preflight_job(job)
+
+    def _preflight_job(self, job: UploadJob):
+        """Check a job's paths on a planner thread and submit it, or fail it with the problems found."""
+        try:
+            result = preflight_paths(job.local_paths(), self._preflight)
+            if not result.ok:
+                self._finish_unplanned(job, f"Job ID:{job.id} Error: Pre-flight check failed:\n"
+                                            f"{result.describe_problems()}")
+                return
+            job.total_files = result.file_count
+            job.total_bytes = result.total_bytes
+            job.status = JOB_QUEUED
+            self.pool.submit(job)
+        finally:
+            self._done_planning(job)
+
+    def _plan_job(self, job: UploadJob):
+        """Scan a folder job on a planner thread and submit it, or its batches, to the pool."""
+        try:
+            if self.on_job_status:
+                self.on_job_status(job, f"Job ID:{job.id} Scanning folder...")
+            try:
+                if job.sync:
+                    diff = self.sync_manifest.diff(job, self.on_job_status)
+                    batches = plan_batches(diff.changed, self.max_files_per_batch, self.max_bytes_per_batch)
+                else:
+                    batches = plan_folder_job(job, self.max_files_per_batch, self.max_bytes_per_batch)
+            except OSError as e:
+                self._finish_unplanned(job, f"Job ID:{job.id} Error: Could not scan folder: {e}")
+                return
+            if job.sync:
+                self._plan_sync_job(job, diff, batches)
+                return
+            if not batches:
+                reason = " matching the include/exclude patterns" if job.include_globs or job.exclude_globs else ""
+                self._finish_unplanned(job, f"Job ID:{job.id} Error: No files{reason} in {job.local_paths()[0]}.")
+                return
+
+            job.total_files = sum(len(batch) for batch in batches)
+            job.total_bytes = sum(f.size for batch in batches for f in batch)
+            if len(batches) == 1:
+                if job.include_globs or job.exclude_globs:
+                    job.folder_files = [f.relative_path for f in batches[0]]
+                job.status = JOB_QUEUED
+                self.pool.submit(job)
+                return
+
+            parts = []
+            for index, batch in enumerate(batches, start=1):
+                parts.append(UploadJob(id=self._next_job_id(), repository=job.repository, subfolder=job.subfolder,
+                                       file_paths_display_str=job.file_paths_display_str,
+                                       folder_files=[f.relative_path for f in batch],
+                                       total_files=len(batch), total_bytes=sum(f.size for f in batch),
+                                       parent_id=job.id, part_label=f"{index}/{len(batches)}",
+                                       priority=job.priority))
+            self._submit_parts(job, parts)
+        finally:
+            self._done_planning(job)
+
+    def _done_planning(self, job: UploadJob):
+        with self._split_lock:
+            self._planning.pop(job.id, None)
+            self._split_lock.notify_all()
+
+    def _plan_sync_job(self, job: UploadJob, diff, batches):
+        """Submit a sync job, or its batches, for the files ``diff`` found changed and stage their index rows."""
+        target = sync_target(job)
+        self.sync_manifest.record(job.repository, target, diff.touched)
+        deleted = diff.deleted if job.sync_delete else []
+        if not batches and not deleted:
+            job.progress = 100.0
+            self._finish_unplanned(job, f"Job ID:{job.id} Already in sync: {diff.summary()}.", success=True)
+            return
+        if self.on_job_status:
+            self.on_job_status(job, f"Job ID:{job.id} Sync: {diff.summary()}; sending "
+                                    f"{format_bytes(diff.bytes_to_send)}.")
+
+        job.total_files = len(diff.changed)
+        job.total_bytes = diff.bytes_to_send
+        delete_batches = batch_deletions(deleted, self.max_files_per_batch)
+        if len(batches) <= 1 and len(delete_batches) <= 1:
+            job.folder_files = [f.relative_path for f in batches[0]] if batches else []
+            job.delete_files = deleted or None
+            self.sync_manifest.stage(job.id, job.repository, target, batches[0] if batches else (), deleted)
+            job.status = JOB_QUEUED
+            self.pool.submit(job)
+            return
+
+        # Deletions ride along with the upload batches; any left over get delete-only parts.
+        part_count = max(len(batches), len(delete_batches))
+        parts = []
+        for index in range(part_count):
+            batch = batches[index] if index < len(batches) else []
+            delete_batch = delete_batches[index] if index < len(delete_batches) else None
+            part = UploadJob(id=self._next_job_id(), repository=job.repository, subfolder=job.subfolder,
+                             file_paths_display_str=job.file_paths_display_str,
+                             folder_files=[f.relative_path for f in batch], delete_files=delete_batch,
+                             total_files=len(batch), total_bytes=sum(f.size for f in batch),
+                             parent_id=job.id, part_label=f"{index + 1}/{part_count}",
+                             priority=job.priority, sync=True)
+            self.sync_manifest.stage(part.id, job.repository, target, batch, delete_batch or ())
+            parts.append(part)
+        self._submit_parts(job, parts)
+
+    def _submit_parts(self, job: UploadJob, parts):
+        job.status = JOB_RUNNING
+        with self._split_lock:
+            self._splits[job.id] = SplitUpload(job, parts)
+        if self.on_job_status:
+            self.on_job_status(job, f"Job ID:{job.id} Split {format_bytes(job.total_bytes)} into "
+                                    f"{len(parts)} parts.")
+        for part in parts:
+            self.metrics.job_queued(part)
+            if self.on_job_queued:
+                self.on_job_queued(part)
+            self.pool.submit(part)
+
+    def _finish_unplanned(self, job: UploadJob, message, success=False):
+        job.status = JOB_SUCCEEDED if success else JOB_FAILED
+        self.metrics.job_finished(job, job.status)
+        self._record_history(job, job.status, message)
+        if self.on_job_finished:
+            self.on_job_finished(job, success, message)
+
+    def planning_jobs(self):
+        """Jobs whose folders are still being scanned or whose paths are being checked."""
+        with self._split_lock:
+            return list(self._planning.values())
+
+    def remove_pending(self, job_id):
+        """Remove a queued job. Returns it, or None if it already started."""
+        job = self.pool.remove_pending(job_id)
+        if job is not None:
+            self._on_parts_removed([job])
+        return job
+
+    def remove_pending_many(self, job_ids):
+        """Remove queued jobs. Returns the ones removed; jobs that already started are skipped."""
+        removed_jobs = self.pool.remove_pending_many(job_ids)
+        self._on_parts_removed(removed_jobs)
+        return removed_jobs
+
+    def move_pending(self, job_ids, before_job_id=None):
+        """Move queued jobs in front of ``before_job_id`` (or to the end). Returns the ids that moved."""
+        return self.pool.move_pending_many(job_ids, before_job_id)
+
+    def move_pending_to_front(self, job_ids):
+        """Bump queued jobs to the head of the queue. Returns the ids that moved."""
+        return self.pool.move_pending_to_front(job_ids)
+
+    def clear_pending(self):
+        removed_jobs = self.pool.clear_pending()
+        self._on_parts_removed(removed_jobs)
+        return removed_jobs
+
+    def _with_parts(self, job_ids):
+        """``job_ids`` with every split parent replaced by its parts."""
+        with self._split_lock:
+            expanded = []
+            for job_id in job_ids:
+                split = self._splits.get(job_id)
+                expanded.extend(split.unfinished if split is not None else (job_id,))
+            return expanded
+
+    def pause(self, job_ids):
+        """Pause queued and running jobs. Returns ``(paused, stopping)`` (see ``UploadWorkerPool.pause``)."""
+        return self.pool.pause(self._with_parts(job_ids))
+
+    def resume(self, job_ids):
+        """Put paused jobs back at the front of the queue. Returns them."""
+        return self.pool.resume(self._with_parts(job_ids))
+
+    def cancel(self, job_ids):
+        """Cancel jobs: queued ones are removed, running and paused ones stopped. Returns the jobs affected."""
+        job_ids = self._with_parts(job_ids)
+        removed_jobs = self.remove_pending_many(job_ids)
+        cancelled, stopping = self.pool.cancel(job_ids)
+        return removed_jobs + cancelled + stopping
+
+    def paused_jobs(self):
+        return self.pool.paused_jobs()
+
+    def restore(self):
+        """Re-queue jobs saved by a previous session. Returns them.
+
+        Parts of a split folder upload are regrouped under a parent rebuilt
+        from the parts that are left.
+        """
+        jobs = self.pool.restore(on_restored=self._on_job_restored)
+        if jobs:
+            with self._job_id_lock:
+                self._job_id_counter = max(self._job_id_counter, max(job.id for job in jobs))
+        return jobs
+
+    def _on_job_restored(self, job: UploadJob):
+        if job.parent_id is not None:
+            with self._split_lock:
+                split = self._splits.get(job.parent_id)
+                if split is None:
+                    parent = UploadJob(id=job.parent_id, repository=job.repository, subfolder=job.subfolder,
+                                       file_paths_display_str=job.file_paths_display_str, status=JOB_RUNNING,
+                                       total_files=0, total_bytes=0, priority=job.priority, sync=job.sync)
+                    split = self._splits[job.parent_id] = SplitUpload(parent)
+                split.add_part(job)
+                split.parent.total_files += job.total_files or 0
+                split.parent.total_bytes += job.total_bytes or 0
+        self.metrics.job_queued(job)
+        if self.on_job_queued:
+            self.on_job_queued(job)
+
+    def eta_seconds(self):
+        """Estimated seconds until the running and queued jobs are uploaded, or None."""
+        return self.metrics.eta_seconds(self.pool.running_jobs() + self.pool.pending_jobs())
+
+    def is_idle(self):
+        with self._split_lock:
+            if self._planning:
+                return False
+        return self.pool.is_idle()
+
+    def wait_until_idle(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._split_lock:
+            if not self._split_lock.wait_for(lambda: not self._planning, timeout):
+                return False
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        return self.pool.wait_until_idle(remaining)
+
+    def _split_of(self, job: UploadJob):
+        if job.parent_id is None:
+            return None
+        with self._split_lock:
+            return self._splits.get(job.parent_id)
+
+    def _on_pool_job_started(self, job: UploadJob):
+        self.metrics.job_started(job)
+        split = self._split_of(job)
+        if split is not None:
+            with self._split_lock:
+                first_part = not split.started
+                split.started = True
+            if first_part:
+                self.metrics.job_started(split.parent)
+                if self.on_job_started:
+                    self.on_job_started(split.parent)
+        if self.on_job_started:
+            self.on_job_started(job)
+
+    def _on_pool_job_status(self, job: UploadJob, message):
+        if self.on_job_status:
+            self.on_job_status(job, message)
+
+    def _on_pool_job_progress(self, job: UploadJob, percentage):
+        self.metrics.job_progress(job, percentage)
+        if self.on_job_progress:
+            self.on_job_progress(job, percentage)
+        split = self._split_of(job)
+        if split is not None:
+            with self._split_lock:
+                split.parent.progress = split.progress()
+            if self.on_job_progress:
+                self.on_job_progress(split.parent, split.parent.progress)
+
+    def _on_pool_job_retry(self, job: UploadJob, delay, message):
+        self.metrics.job_retrying(job)
+        if self.on_job_retry:
+            self.on_job_retry(job, delay, message)
+
+    def _on_pool_job_paused(self, job: UploadJob, message):
+        self.metrics.job_paused(job)
+        if self.on_job_paused:
+            self.on_job_paused(job, message)
+
+    def _on_pool_job_finished(self, job: UploadJob, success, message):
+        outcome = JOB_SUCCEEDED if success else JOB_CANCELLED if job.status == JOB_CANCELLED else JOB_FAILED
+        self.metrics.job_finished(job, outcome)
+        if job.sync:
+            if success:
+                self.sync_manifest.commit_staged(job.id)
+            else:
+                self.sync_manifest.discard_staged([job.id])
+        self._record_history(job, outcome, message)
+        if self.on_job_finished:
+            self.on_job_finished(job, success, message)
+        split = self._split_of(job)
+        if split is not None:
+            with self._split_lock:
+                split.unfinished.discard(job.id)
+                if outcome == JOB_CANCELLED:
+                    split.cancelled += 1
+                elif not success:
+                    split.failures.append(message)
+            self._finish_split_if_done(split)
+
+    def _on_parts_removed(self, jobs):
+        self.sync_manifest.discard_staged(job.id for job in jobs if job.sync)
+        for job in jobs:
+            self.metrics.job_finished(job, JOB_REMOVED)
+            self._record_history(job, JOB_REMOVED)
+            split = self._split_of(job)
+            if split is None:
+                continue
+            with self._split_lock:
+                if job.id in split.unfinished:
+                    split.unfinished.discard(job.id)
+                    split.removed += 1
+            self._finish_split_if_done(split)
+
+    def _finish_split_if_done(self, split: SplitUpload):
+        with self._split_lock:
+            if split.unfinished or self._splits.get(split.parent.id) is not split:
+                return
+            del self._splits[split.parent.id]
+            parent = split.parent
+            part_ids = list(split.parts)
+            if split.removed == len(split.parts):
+                parent.status = JOB_REMOVED
+                self.metrics.job_finished(parent, JOB_REMOVED)
+                self._record_history(parent, JOB_REMOVED, part_ids=part_ids)
+                return
+            success = not split.failures and not split.cancelled
+            # A part that failed fails the parent; parts the user stopped only cancel it.
+            parent.status = JOB_FAILED if split.failures else JOB_CANCELLED if split.cancelled else JOB_SUCCEEDED
+            parent.progress = split.progress()
+        self.metrics.job_finished(parent, parent.status)
+        message = split.summary()
+        self._record_history(parent, parent.status, message, part_ids=part_ids)
+        if self.on_job_finished:
+            self.on_job_finished(parent, success, message)
+
+    def _record_history(self, job: UploadJob, outcome, message=None, part_ids=None):
+        """Queue a history event for ``job``; a split parent's bytes are the sum of its ``part_ids``."""
+        metrics = self.metrics.job_metrics(job.id)
+        bytes_sent = metrics.bytes_sent if metrics else 0
+        if part_ids is not None:
+            part_metrics = [self.metrics.job_metrics(part_id) for part_id in part_ids]
+            bytes_sent = sum(part.bytes_sent for part in part_metrics if part is not None)
+        duration = metrics.duration if metrics else None
+        self.history.record(JobEvent(
+            recorded_at=time.time(), job_id=job.id, parent_id=job.parent_id, repository=job.repository,
+            subfolder=job.subfolder, paths=job.file_paths_display_str, files=job.total_files,
+            total_bytes=job.total_bytes, bytes_sent=bytes_sent, duration=duration,
+            bytes_per_second=bytes_sent / duration if duration else None,
+            retries=metrics.retries if metrics else 0, outcome=outcome, message=message))
+
+    def close(self):
+        self._planner.shutdown(wait=False, cancel_futures=True)
+        self._preflight.shutdown(wait=False, cancel_futures=True)
+        for backend in self.backends.values():
+            backend.close()
+        self.hash_cache.close()
+        self.sync_manifest.close()
+        self.history.close()
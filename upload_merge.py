@@ -0,0 +1,122 @@
+"""Merging of small queued jobs into one commit.
+
+Every job used to become its own commit, so dropping dozens of config and
+tokenizer files as separate jobs paid commit latency and the Hub's commit
+rate limit once per job. When ``UploadWorkerPool`` starts a job it asks its
+``CommitMerger`` for queued jobs that can ride along in the same commit and
+hands them all to the backend's ``run_merged``; each job still gets its own
+started/progress/finished callbacks, status, retries and queue record.
+
+Which jobs are compatible is up to the backend (``UploadBackend.merge_key``):
+jobs can only merge when their keys are equal and not None. A merged commit
+never holds more than ``max_jobs`` jobs or ``max_bytes`` bytes, jobs whose
+size isn't known yet are never merged, and a job is not merged if it writes
+a path that overlaps one the starting job, or a job of the same repository
+queued ahead of it and left behind, also writes (the later write must land on
+top). Two repo paths overlap if they are equal or one is a folder holding the
+other (``RepoPaths``).
+
+``collect`` runs under the worker pool's lock every time a job starts, so it
+only compares what ``prepare`` worked out when each job was queued (its key
+and the paths it writes, stored in ``job.merge_info``). Working those out
+can touch the disk and parses the job's paths; the pool does it outside the
+lock. A job that was not prepared for the current ``merge_key`` is never
+merged, and jobs queued behind it are not considered either.
+"""
+from upload_engine import UploadJob, compute_upload_targets
+
+# --- Constants ---
+MERGE_MAX_JOBS = 50
+MERGE_MAX_BYTES = 256 * 1024 ** 2
+MERGE_SCAN_LIMIT = 2000  # queued jobs looked at per merge, so starting a job stays cheap in long queues
+
+
+class RepoPaths:
+    """Repo paths written by one or more jobs, plus every folder above them ("" is the repo root)."""
+
+    __slots__ = ("paths", "folders")
+
+    def __init__(self, paths=()):
+        self.paths = set()
+        self.folders = set()
+        for path in paths:
+            path = path.replace("\\", "/").strip("/")
+            path = "" if path == "." else path
+            self.paths.add(path)
+            while path:
+                path = path.rpartition("/")[0]
+                self.folders.add(path)
+
+    def copy(self):
+        copied = RepoPaths()
+        copied.paths, copied.folders = set(self.paths), set(self.folders)
+        return copied
+
+    def update(self, other):
+        self.paths |= other.paths
+        self.folders |= other.folders
+
+    def overlaps(self, other):
+        """Whether a path of one equals, or lies under, a path of the other."""
+        return not (self.paths.isdisjoint(other.paths) and self.paths.isdisjoint(other.folders)
+                    and other.paths.isdisjoint(self.folders))
+
+
+def _targets(job: UploadJob):
+    return RepoPaths(path_in_repo for _local_path, path_in_repo
+                     in compute_upload_targets(job.local_paths(), job.subfolder))
+
+
+class CommitMerger:
+    """Picks the queued jobs that join a starting job's commit."""
+
+    def __init__(self, max_jobs=MERGE_MAX_JOBS, max_bytes=MERGE_MAX_BYTES):
+        self.max_jobs = max(1, int(max_jobs))
+        self.max_bytes = max(0, int(max_bytes))
+
+    @staticmethod
+    def prepare(job: UploadJob, merge_key):
+        """Work out ``job``'s merge key and the repo paths it writes, for ``collect``. May touch the disk."""
+        job.merge_info = (merge_key, merge_key(job), _targets(job))
+
+    @staticmethod
+    def _prepared(job: UploadJob, merge_key):
+        """``(key, targets)`` from ``prepare``, or None if ``job`` wasn't prepared for ``merge_key``."""
+        if job.merge_info is None or job.merge_info[0] != merge_key:
+            return None
+        return job.merge_info[1:]
+
+    def collect(self, leader: UploadJob, jobs, runnable, merge_key):
+        """Queued ``jobs`` (in order) to merge into ``leader``'s commit; the caller dequeues them.
+
+        ``runnable(job)`` is the pool's usual test; ``merge_key(job)`` the
+        backend's compatibility key, as recorded by ``prepare``.
+        """
+        if self.max_jobs <= 1 or leader.total_bytes is None or leader.total_bytes > self.max_bytes:
+            return []
+        prepared = self._prepared(leader, merge_key)
+        if prepared is None or prepared[0] is None:
+            return []
+        key, targets = prepared
+        followers = []
+        total_bytes = leader.total_bytes
+        targets = targets.copy()  # written by the merged commit
+        passed_over = RepoPaths()  # written by jobs of this repository that stay queued
+        for scanned, job in enumerate(jobs):
+            if scanned >= MERGE_SCAN_LIMIT or len(followers) + 1 >= self.max_jobs:
+                break
+            if job is leader or job.repository != leader.repository:
+                continue
+            prepared = self._prepared(job, merge_key)
+            if prepared is None:
+                break  # its paths are unknown, so nothing behind it may jump ahead of it
+            job_key, job_targets = prepared
+            if (job.total_bytes is None or total_bytes + job.total_bytes > self.max_bytes
+                    or job_key != key or not runnable(job)
+                    or targets.overlaps(job_targets) or passed_over.overlaps(job_targets)):
+                passed_over.update(job_targets)
+                continue
+            followers.append(job)
+            total_bytes += job.total_bytes
+            targets.update(job_targets)
+        return followers
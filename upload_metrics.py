@@ -0,0 +1,377 @@
+"""Per-job metrics and live throughput for the upload queue.
+
+``MetricsRecorder`` is fed by ``UploadManager`` as jobs move through the
+queue and keeps, for every job, its enqueue/start/end times, bytes sent,
+average and peak throughput, retry count and outcome. Bytes sent are
+derived from the backend's progress reports and the job's size (the
+dedup cache's ``bytes_to_send``, the planner's ``total_bytes`` or, failing
+both, the size on disk). Only jobs that actually run are counted towards
+throughput; a split folder's parent job reports the sum of its parts.
+
+Throughput across all jobs is kept in one-second buckets for a rolling
+window, from which ``current_rate`` and ``eta_seconds`` are computed and the
+GUI draws its graph. Snapshots can be exported as CSV or JSON. Running
+totals (bytes sent, retries, finished jobs by outcome) are kept as counters
+that only ever grow, independent of how many finished jobs are still
+recorded, and are served in the Prometheus text format by
+``MetricsHttpServer`` on localhost.
+"""
+import csv
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from upload_engine import UploadJob, local_path_size
+
+# --- Constants ---
+THROUGHPUT_WINDOW_SECONDS = 120  # length of the rolling throughput history
+RATE_AVERAGING_SECONDS = 5  # current_rate averages over this many full seconds
+PEAK_SAMPLE_SECONDS = 1.0  # minimum interval for a per-job peak-rate sample
+MAX_FINISHED_JOB_METRICS = 10000  # oldest finished jobs are dropped beyond this
+DEFAULT_METRICS_PORT = 9464
+METRICS_PATH = "/metrics"
+
+
+@dataclass
+class JobMetrics:
+    job_id: int
+    repository: str
+    parent_id: int | None = None
+    enqueued_at: float | None = None  # time.time()
+    started_at: float | None = None
+    finished_at: float | None = None
+    total_bytes: int | None = None
+    bytes_sent: int = 0
+    peak_bytes_per_second: float = 0.0
+    retries: int = 0
+    outcome: str = ""  # "", "succeeded", "failed", "removed" or "cancelled"
+
+    @property
+    def queue_wait(self):
+        if self.enqueued_at is None or self.started_at is None:
+            return None
+        return max(0.0, self.started_at - self.enqueued_at)
+
+    @property
+    def duration(self):
+        if self.started_at is None:
+            return None
+        return max(0.0, (self.finished_at or time.time()) - self.started_at)
+
+    @property
+    def average_bytes_per_second(self):
+        duration = self.duration
+        return self.bytes_sent / duration if duration else 0.0
+
+    def as_dict(self):
+        row = asdict(self)
+        row.update(queue_wait=self.queue_wait, duration=self.duration,
+                   average_bytes_per_second=self.average_bytes_per_second)
+        return row
+
+
+EXPORT_FIELDS = [f.name for f in fields(JobMetrics)] + ["queue_wait", "duration", "average_bytes_per_second"]
+
+
+class _JobProgress:
+    """Running totals for one job while it is being uploaded."""
+
+    __slots__ = ("size", "attempt_bytes", "sample_time", "sample_bytes")
+
+    def __init__(self, now, size=None):
+        self.size = size  # known on the first progress report, once the dedup cache has run
+        self.attempt_bytes = 0  # bytes sent by the current attempt
+        self.sample_time = now
+        self.sample_bytes = 0
+
+
+class MetricsRecorder:
+    """Thread-safe collector of job metrics and rolling throughput."""
+
+    def __init__(self, window_seconds=THROUGHPUT_WINDOW_SECONDS, max_finished=MAX_FINISHED_JOB_METRICS):
+        self._lock = threading.Lock()
+        self._jobs = {}  # job id -> JobMetrics, in insertion order
+        self._progress = {}  # job id -> _JobProgress for running leaf jobs
+        self._finished_order = deque()
+        self._max_finished = max_finished
+        self.window_seconds = window_seconds
+        self._buckets = deque()  # [second, bytes], oldest first
+        self._bytes_sent_total = 0
+        self._retries_total = 0
+        self._outcome_totals = {}  # outcome -> jobs that finished with it
+        self.started_at = time.time()
+
+    # --- Recording (any thread) ---
+    def _metrics_locked(self, job: UploadJob):
+        metrics = self._jobs.get(job.id)
+        if metrics is None:
+            metrics = self._jobs[job.id] = JobMetrics(job_id=job.id, repository=job.repository,
+                                                      parent_id=job.parent_id)
+        return metrics
+
+    def job_queued(self, job: UploadJob):
+        with self._lock:
+            metrics = self._metrics_locked(job)
+            if metrics.enqueued_at is None:
+                metrics.enqueued_at = time.time()
+            metrics.total_bytes = job.total_bytes
+
+    def job_started(self, job: UploadJob):
+        """Record the start of a job, or of another attempt at it."""
+        with self._lock:
+            metrics = self._metrics_locked(job)
+            if metrics.started_at is None:
+                metrics.started_at = time.time()
+            self._progress[job.id] = _JobProgress(time.monotonic())
+
+    def job_progress(self, job: UploadJob, percentage):
+        """Record progress of a job that is being uploaded (not a split parent)."""
+        now = time.monotonic()
+        with self._lock:
+            progress = self._progress.get(job.id)
+            size = progress.size if progress else None
+        if size is None:
+            size = self._job_size(job)  # may walk the disk; done outside the lock
+        with self._lock:
+            progress = self._progress.setdefault(job.id, _JobProgress(now))
+            if progress.size is None:
+                progress.size = size
+            sent = int(progress.size * min(100.0, max(0.0, percentage)) / 100)
+            delta = sent - progress.attempt_bytes
+            if delta <= 0:
+                return
+            progress.attempt_bytes = sent
+            metrics = self._metrics_locked(job)
+            metrics.bytes_sent += delta
+            metrics.total_bytes = metrics.total_bytes or progress.size
+            self._add_to_buckets_locked(delta)
+            elapsed = now - progress.sample_time
+            if elapsed >= PEAK_SAMPLE_SECONDS:
+                rate = (progress.attempt_bytes - progress.sample_bytes) / elapsed
+                metrics.peak_bytes_per_second = max(metrics.peak_bytes_per_second, rate)
+                progress.sample_time, progress.sample_bytes = now, progress.attempt_bytes
+
+    def job_retrying(self, job: UploadJob):
+        with self._lock:
+            self._metrics_locked(job).retries += 1
+            self._retries_total += 1
+            self._progress.pop(job.id, None)
+
+    def job_paused(self, job: UploadJob):
+        """Record that a running job was stopped to be resumed later; its bytes so far stay counted."""
+        with self._lock:
+            self._progress.pop(job.id, None)
+
+    def job_finished(self, job: UploadJob, outcome):
+        with self._lock:
+            metrics = self._metrics_locked(job)
+            progress = self._progress.pop(job.id, None)
+            if (progress is not None and progress.size is not None and outcome == "succeeded"
+                    and progress.attempt_bytes < progress.size):
+                # Backends report progress per item, so the last slice only shows up here.
+                remaining = progress.size - progress.attempt_bytes
+                progress.attempt_bytes = progress.size
+                metrics.bytes_sent += remaining
+                self._add_to_buckets_locked(remaining)
+            if progress is not None and progress.attempt_bytes > progress.sample_bytes:
+                # The unsampled tail; a job shorter than one sample interval is rated over its whole run.
+                elapsed = time.monotonic() - progress.sample_time
+                if metrics.peak_bytes_per_second:
+                    elapsed = max(elapsed, PEAK_SAMPLE_SECONDS)
+                rate = (progress.attempt_bytes - progress.sample_bytes) / max(elapsed, 1e-6)
+                metrics.peak_bytes_per_second = max(metrics.peak_bytes_per_second, rate)
+            metrics.finished_at = time.time()
+            if progress is not None:
+                metrics.peak_bytes_per_second = max(metrics.peak_bytes_per_second, metrics.average_bytes_per_second)
+            if not metrics.outcome:
+                self._outcome_totals[outcome] = self._outcome_totals.get(outcome, 0) + 1
+            metrics.outcome = outcome
+            self._finished_order.append(job.id)
+            while len(self._finished_order) > self._max_finished:
+                self._jobs.pop(self._finished_order.popleft(), None)
+
+    @staticmethod
+    def _job_size(job: UploadJob):
+        if job.bytes_to_send is not None:
+            return job.bytes_to_send
+        if job.total_bytes is not None:
+            return job.total_bytes
+        try:
+            return sum(local_path_size(path) for path in job.local_paths())
+        except (OSError, ValueError):
+            return 0
+
+    def _add_to_buckets_locked(self, num_bytes):
+        # Only leaf jobs report bytes, so this is also where they are counted.
+        self._bytes_sent_total += num_bytes
+        second = int(time.monotonic())
+        if self._buckets and self._buckets[-1][0] == second:
+            self._buckets[-1][1] += num_bytes
+        else:
+            self._buckets.append([second, num_bytes])
+        while self._buckets and self._buckets[0][0] <= second - self.window_seconds:
+            self._buckets.popleft()
+
+    # --- Queries (any thread) ---
+    def throughput_series(self, seconds=None):
+        """Bytes sent in each of the last ``seconds`` whole seconds, oldest first."""
+        seconds = seconds or self.window_seconds
+        now = int(time.monotonic())
+        with self._lock:
+            by_second = {second: num_bytes for second, num_bytes in self._buckets}
+        return [by_second.get(second, 0) for second in range(now - seconds, now)]
+
+    def current_rate(self, seconds=RATE_AVERAGING_SECONDS):
+        """Bytes/sec over the last ``seconds`` complete seconds."""
+        series = self.throughput_series(seconds)
+        return sum(series) / len(series) if series else 0.0
+
+    def remaining_bytes(self, jobs):
+        """Bytes still to send for ``jobs`` (running or queued leaf jobs)."""
+        remaining = 0
+        with self._lock:
+            for job in jobs:
+                progress = self._progress.get(job.id)
+                if progress is not None and progress.size is not None:
+                    remaining += max(0, progress.size - progress.attempt_bytes)
+                else:
+                    remaining += job.bytes_to_send if job.bytes_to_send is not None else (job.total_bytes or 0)
+        return remaining
+
+    def eta_seconds(self, jobs):
+        """Estimated seconds until ``jobs`` are sent at the current rate, or None if unknown."""
+        rate = self.current_rate()
+        remaining = self.remaining_bytes(jobs)
+        if not rate or not remaining:
+            return None
+        return remaining / rate
+
+    def job_metrics(self, job_id):
+        """A copy of one job's metrics, or None if it is not (or no longer) recorded."""
+        with self._lock:
+            metrics = self._jobs.get(job_id)
+            return JobMetrics(**asdict(metrics)) if metrics is not None else None
+
+    def snapshot(self):
+        """Copies of every job's metrics; a split parent's bytes are the sum of its parts."""
+        with self._lock:
+            jobs = [JobMetrics(**asdict(metrics)) for metrics in self._jobs.values()]
+        by_id = {metrics.job_id: metrics for metrics in jobs}
+        part_bytes = {}
+        for metrics in jobs:
+            if metrics.parent_id is not None:
+                part_bytes[metrics.parent_id] = part_bytes.get(metrics.parent_id, 0) + metrics.bytes_sent
+        for parent_id, sent in part_bytes.items():
+            if parent_id in by_id:
+                by_id[parent_id].bytes_sent = sent
+        return jobs
+
+    def totals(self):
+        """Aggregate counters since this recorder was created, as exported to Prometheus."""
+        with self._lock:
+            totals = {
+                "bytes_sent": self._bytes_sent_total,
+                "retries": self._retries_total,
+                "outcomes": dict(self._outcome_totals),
+                "running": len(self._progress),  # started, not paused, retrying or finished
+            }
+        totals["current_rate"] = self.current_rate()
+        return totals
+
+    # --- Export ---
+    def export_csv(self, path):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS)
+            writer.writeheader()
+            for metrics in self.snapshot():
+                writer.writerow(metrics.as_dict())
+
+    def export_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"exported_at": time.time(), "jobs": [metrics.as_dict() for metrics in self.snapshot()]},
+                      f, indent=1)
+
+    def export(self, path):
+        """Write a CSV or JSON export, chosen by the file extension. Raises OSError."""
+        if os.path.splitext(path)[1].lower() == ".json":
+            self.export_json(path)
+        else:
+            self.export_csv(path)
+
+    def prometheus_text(self):
+        totals = self.totals()
+        lines = [
+            "# HELP hf_upload_bytes_sent_total Bytes uploaded by finished and running jobs.",
+            "# TYPE hf_upload_bytes_sent_total counter",
+            f"hf_upload_bytes_sent_total {totals['bytes_sent']}",
+            "# HELP hf_upload_retries_total Retries scheduled after retryable failures.",
+            "# TYPE hf_upload_retries_total counter",
+            f"hf_upload_retries_total {totals['retries']}",
+            "# HELP hf_upload_jobs_total Jobs that reached a final state, by outcome.",
+            "# TYPE hf_upload_jobs_total counter",
+        ]
+        lines += [f'hf_upload_jobs_total{{outcome="{outcome}"}} {count}'
+                  for outcome, count in sorted(totals["outcomes"].items())]
+        lines += [
+            "# HELP hf_upload_jobs_running Jobs currently uploading.",
+            "# TYPE hf_upload_jobs_running gauge",
+            f"hf_upload_jobs_running {totals['running']}",
+            f"# HELP hf_upload_throughput_bytes_per_second Upload rate over the last {RATE_AVERAGING_SECONDS}s.",
+            "# TYPE hf_upload_throughput_bytes_per_second gauge",
+            f"hf_upload_throughput_bytes_per_second {totals['current_rate']:.1f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def format_duration(seconds):
+    if seconds is None or math.isinf(seconds):
+        return "--"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class MetricsHttpServer:
+    """Serves ``recorder.prometheus_text()`` at http://127.0.0.1:<port>/metrics."""
+
+    def __init__(self, recorder: MetricsRecorder, port=DEFAULT_METRICS_PORT, host="127.0.0.1"):
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != METRICS_PATH:
+                    self.send_error(404)
+                    return
+                body = recorder.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{METRICS_PATH}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
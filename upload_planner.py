@@ -0,0 +1,136 @@
+"""Planning stage that splits large folder uploads into balanced batches.
+
+A dropped folder used to become one ``huggingface-cli upload`` call: a single
+transient failure late in the run threw all of it away, and nothing ran in
+parallel. ``plan_folder_job`` walks the folder with ``scan_folder`` (a
+parallel ``os.scandir`` walker), applies the job's include/exclude globs and
+packs the files into batches of at most ``max_files`` files and
+``max_bytes`` bytes. ``UploadManager`` turns each batch into a sub-job whose
+``folder_files`` lists exactly the files it uploads.
+
+Like ``huggingface_hub``'s ``upload_folder``, ``scan_folder`` leaves out
+``.git`` and ``.cache/huggingface`` (``DEFAULT_IGNORE_GLOBS``), which the Hub
+refuses to store; those directories are not even walked. Everything built on
+the scan (split parts, the upload cache, sync, pre-flight) sees the same files.
+"""
+import fnmatch
+import heapq
+import math
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from upload_engine import UploadJob
+
+# --- Constants ---
+PLAN_MAX_FILES_PER_BATCH = 500
+PLAN_MAX_BYTES_PER_BATCH = 10 * 1024 ** 3
+SCAN_WORKERS = 8
+# Same as huggingface_hub.utils.DEFAULT_IGNORE_PATTERNS, without needing huggingface_hub installed.
+DEFAULT_IGNORE_GLOBS = (".git", ".git/*", "*/.git", "**/.git/**",
+                        ".cache/huggingface", ".cache/huggingface/*", "*/.cache/huggingface",
+                        "**/.cache/huggingface/**")
+
+ScannedFile = namedtuple("ScannedFile", ["relative_path", "size", "mtime_ns"])
+
+
+def compile_globs(globs):
+    """Compile fnmatch-style globs into one regex, or None if there are none."""
+    if not globs:
+        return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(pattern)})" for pattern in globs))
+
+
+def _scan_directory(dir_path, relative_prefix, ignore_regex=None):
+    files = []
+    subdirs = []
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            relative_path = relative_prefix + entry.name
+            if ignore_regex and ignore_regex.match(relative_path):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append((entry.path, relative_path + "/"))
+            elif entry.is_file():
+                stat = entry.stat()
+                files.append(ScannedFile(relative_path, stat.st_size, stat.st_mtime_ns))
+    return files, subdirs
+
+
+def scan_folder(root, include_globs=None, exclude_globs=None, workers=SCAN_WORKERS,
+                ignore_globs=DEFAULT_IGNORE_GLOBS):
+    """Return the files under ``root`` as ``ScannedFile`` tuples, sorted by path.
+
+    Directories are listed concurrently on a thread pool (``os.scandir``
+    releases the GIL while it waits on the filesystem). Relative paths use
+    ``/``. A file is kept if it matches any include glob (or there are none)
+    and no exclude glob; like huggingface_hub, ``*`` also matches ``/``.
+    Files and directories matching ``ignore_globs`` are skipped without
+    being walked. Symlinked directories are not followed, matching ``os.walk``.
+    """
+    include_regex = compile_globs(include_globs)
+    exclude_regex = compile_globs(exclude_globs)
+    ignore_regex = compile_globs(ignore_globs)
+    results = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan") as executor:
+        pending = {executor.submit(_scan_directory, root, "", ignore_regex)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                for scanned in files:
+                    if include_regex and not include_regex.match(scanned.relative_path):
+                        continue
+                    if exclude_regex and exclude_regex.match(scanned.relative_path):
+                        continue
+                    results.append(scanned)
+                for subdir in subdirs:
+                    pending.add(executor.submit(_scan_directory, *subdir, ignore_regex))
+    results.sort()
+    return results
+
+
+def plan_batches(files, max_files=PLAN_MAX_FILES_PER_BATCH, max_bytes=PLAN_MAX_BYTES_PER_BATCH):
+    """Pack ``files`` into size-balanced batches within the file and byte limits.
+
+    Starts with the fewest batches the limits allow and places files largest
+    first into the currently lightest batch (LPT scheduling). A batch that
+    can't take the next file without exceeding ``max_bytes`` causes a new
+    batch to be opened; a single file larger than ``max_bytes`` gets a batch
+    to itself. Each returned batch is sorted by path.
+    """
+    if not files:
+        return []
+    total_bytes = sum(f.size for f in files)
+    batch_count = max(1, math.ceil(len(files) / max_files), math.ceil(total_bytes / max_bytes))
+    batches = [[] for _ in range(batch_count)]
+    batch_bytes = [0] * batch_count
+    lightest = [(0, index) for index in range(batch_count)]  # heap of batches that still have room
+
+    for scanned in sorted(files, key=lambda f: f.size, reverse=True):
+        size, index = heapq.heappop(lightest) if lightest else (None, None)
+        if index is None or (batches[index] and size + scanned.size > max_bytes):
+            if index is not None:
+                heapq.heappush(lightest, (size, index))
+            index = len(batches)
+            batches.append([])
+            batch_bytes.append(0)
+        batches[index].append(scanned)
+        batch_bytes[index] += scanned.size
+        if len(batches[index]) < max_files:
+            heapq.heappush(lightest, (batch_bytes[index], index))
+
+    return [sorted(batch) for batch in batches if batch]
+
+
+def is_single_folder_job(job: UploadJob):
+    local_paths = job.local_paths()
+    return len(local_paths) == 1 and os.path.isdir(local_paths[0])
+
+
+def plan_folder_job(job: UploadJob, max_files=PLAN_MAX_FILES_PER_BATCH, max_bytes=PLAN_MAX_BYTES_PER_BATCH):
+    """Scan a single-folder job and return its batches (lists of ``ScannedFile``)."""
+    folder = job.local_paths()[0]
+    files = scan_folder(folder, job.include_globs, job.exclude_globs)
+    return plan_batches(files, max_files, max_bytes)
@@ -0,0 +1,80 @@
+"""Pre-flight check of the files and folders a job uploads.
+
+Missing or unreadable files and empty outputs used to surface only when the
+upload itself failed, often hours after the job was queued. ``UploadManager``
+now checks every new job on its planner threads before it reaches the queue:
+``preflight_paths`` stats each path, and walks each folder with
+``upload_planner.scan_folder``, concurrently on a thread pool. A job with
+problems fails straight away listing them; otherwise its file count and byte
+total are attached to the job for the scheduler, the ETA and the queue list.
+
+Single-folder jobs don't come through here: their folder scan does the same
+job and feeds the planner.
+"""
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from upload_planner import scan_folder
+
+# --- Constants ---
+PREFLIGHT_WORKERS = 8
+MAX_REPORTED_PROBLEMS = 10
+
+
+@dataclass
+class PreflightResult:
+    file_count: int = 0
+    total_bytes: int = 0
+    problems: list = field(default_factory=list)
+
+    @property
+    def ok(self):
+        return not self.problems
+
+    def describe_problems(self, max_items=MAX_REPORTED_PROBLEMS):
+        lines = self.problems[:max_items]
+        if len(self.problems) > max_items:
+            lines.append(f"...and {len(self.problems) - max_items} more.")
+        return "\n".join(lines)
+
+
+def check_path(path):
+    """``(file_count, total_bytes, problem)`` for one local file or folder; ``problem`` is None if it's usable."""
+    try:
+        path_stat = os.stat(path)
+    except FileNotFoundError:
+        return 0, 0, f"Not found: {path}"
+    except OSError as e:
+        return 0, 0, f"Cannot access {path}: {e.strerror or e}"
+
+    if stat.S_ISDIR(path_stat.st_mode):
+        try:
+            files = scan_folder(path)
+        except OSError as e:
+            return 0, 0, f"Cannot read folder {path}: {e.strerror or e}"
+        if not files:
+            return 0, 0, f"Folder is empty: {path}"
+        return len(files), sum(f.size for f in files), None
+    if not stat.S_ISREG(path_stat.st_mode):
+        return 0, 0, f"Not a regular file: {path}"
+    if not os.access(path, os.R_OK):
+        return 0, 0, f"Not readable: {path}"
+    if path_stat.st_size == 0:
+        return 0, 0, f"Empty file (0 bytes): {path}"
+    return 1, path_stat.st_size, None
+
+
+def preflight_paths(paths, executor=None):
+    """Check ``paths`` concurrently on ``executor`` (a pool of its own if None) and total them up."""
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=PREFLIGHT_WORKERS, thread_name_prefix="preflight") as own_executor:
+            return preflight_paths(paths, own_executor)
+    result = PreflightResult()
+    for file_count, total_bytes, problem in executor.map(check_path, paths):
+        if problem:
+            result.problems.append(problem)
+        result.file_count += file_count
+        result.total_bytes += total_bytes
+    return result
@@ -0,0 +1,144 @@
+"""Optional cProfile and tracemalloc hooks for the upload pipeline.
+
+A job runs on several threads: the caller's (``enqueue``, scheduling), a
+planner thread, a worker thread per running job and, with the CLI backend,
+two output reader threads that parse its progress lines. ``ThreadProfiler``
+profiles all of them: from Python 3.12 one cProfile profiler sees every
+thread; before that, every thread started while the profiler runs gets its
+own, and their stats are merged when it stops. ``MemoryTracker`` wraps
+tracemalloc and reports the peak of traced memory and the top allocation
+sites. Both are off unless a caller starts them (``upload_headless
+--profile``/``--trace-memory``, benchmarks/bench_pipeline.py), since they
+slow everything down.
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+
+# --- Constants ---
+PER_THREAD_PROFILES = sys.version_info < (3, 12)
+PROFILE_SORT = "cumulative"
+PROFILE_TOP = 30
+TRACEMALLOC_FRAMES = 1
+MEMORY_TOP = 15
+
+
+class ThreadProfiler:
+    """cProfile over the calling thread and every thread started while it runs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profiles = []
+        self._running = False
+
+    def start(self):
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+            self._running = True
+        if PER_THREAD_PROFILES:
+            threading.setprofile(self._start_thread_profile)
+        profile.enable()
+        return self
+
+    def _start_thread_profile(self, _frame, _event, _arg):
+        # Runs as the first profile event of each new thread and replaces itself with a cProfile profiler.
+        with self._lock:
+            if not self._running:
+                sys.setprofile(None)
+                return
+            profile = cProfile.Profile()
+            self._profiles.append(profile)
+        profile.enable()
+
+    def stop(self):
+        """Stop profiling new threads and the calling thread.
+
+        Before Python 3.12, threads started while profiling keep their profiler until they exit;
+        ``stats`` includes what they recorded up to the moment it is called.
+        """
+        if PER_THREAD_PROFILES:
+            threading.setprofile(None)
+        with self._lock:
+            self._running = False
+            profiles = list(self._profiles)
+        profiles[0].disable()
+        return self
+
+    def stats(self):
+        """The merged ``pstats.Stats`` of every profiled thread."""
+        with self._lock:
+            profiles = list(self._profiles)
+        stats = pstats.Stats(profiles[0], stream=io.StringIO())
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+    def dump(self, path):
+        """Write the merged stats for ``python -m pstats`` or snakeviz."""
+        self.stats().dump_stats(path)
+
+    def report(self, limit=PROFILE_TOP, sort=PROFILE_SORT):
+        """The top ``limit`` functions as text."""
+        stream = io.StringIO()
+        stats = self.stats()
+        stats.stream = stream
+        stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+
+class MemoryTracker:
+    """tracemalloc peak and top allocation sites, measured from ``start``."""
+
+    def __init__(self, frames=TRACEMALLOC_FRAMES):
+        self.frames = frames
+        self._started_here = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_here = True
+        tracemalloc.reset_peak()
+        return self
+
+    def peak(self):
+        """``(current, peak)`` traced bytes; the peak is since ``start`` or the last ``reset_peak``."""
+        return tracemalloc.get_traced_memory()
+
+    def reset_peak(self):
+        tracemalloc.reset_peak()
+
+    def report(self, limit=MEMORY_TOP):
+        """The ``limit`` source lines holding the most traced memory right now, as text."""
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")))
+        lines = []
+        for stat in snapshot.statistics("lineno")[:limit]:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {frame.filename}:{frame.lineno}")
+        return "\n".join(lines)
+
+    def stop(self):
+        if self._started_here:
+            tracemalloc.stop()
+            self._started_here = False
+
+
+def current_rss():
+    """Resident memory of this process in bytes (its peak so far off Linux), or None if unknown."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # ru_maxrss is in KiB except on macOS
@@ -0,0 +1,239 @@
+"""Crash-safe persistence for the upload queue.
+
+``JobQueueStore`` keeps every job and its state (queued, running, paused,
+succeeded, failed, removed, cancelled) in a SQLite database in WAL mode, so
+queued work survives crashes, reboots and closing the window. On start-up
+``load_unfinished`` returns the jobs that were still queued, plus any that
+were running when the process died (they are put back to queued), and the
+paused ones.
+
+Queue order is a floating-point ``position`` column. Appending takes the
+current maximum plus one and moving a job takes the midpoint of its new
+neighbours, so insert, remove and reorder are single indexed lookups and
+updates no matter how many finished jobs the table holds.
+
+Sub-jobs created by the folder planner are stored with the file list they
+upload (``folder_files``, as JSON) and their ``parent_id``/``part_label``, so
+a half-finished split upload resumes with only the parts that are left. Sync
+jobs keep their ``sync`` flag and the repo files they delete
+(``delete_files``, as JSON). Jobs put back at the front of the queue (retried,
+resumed or requeued) keep that position, their ``attempt`` count and the paths
+they still have to send (``upload_paths``, as JSON).
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from upload_engine import UploadJob, JOB_PAUSED, JOB_QUEUED, JOB_RUNNING, JOB_REMOVED
+
+# --- Constants ---
+QUEUE_DB_FILE = "upload_queue.sqlite3"
+MIN_POSITION_GAP = 1e-9  # below this, positions are renumbered before inserting between neighbours
+# Columns added after the first release; created on open if an older database lacks them.
+ADDED_COLUMNS = (("folder_files", "TEXT"), ("total_bytes", "INTEGER"), ("parent_id", "INTEGER"),
+                 ("part_label", "TEXT NOT NULL DEFAULT ''"), ("priority", "INTEGER NOT NULL DEFAULT 0"),
+                 ("sync", "INTEGER NOT NULL DEFAULT 0"), ("delete_files", "TEXT"), ("total_files", "INTEGER"),
+                 ("attempt", "INTEGER NOT NULL DEFAULT 0"), ("upload_paths", "TEXT"))
+
+
+class JobQueueStore:
+    """SQLite-backed record of upload jobs and their state transitions."""
+
+    def __init__(self, db_path=QUEUE_DB_FILE):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                repository TEXT NOT NULL,
+                subfolder TEXT NOT NULL,
+                file_paths TEXT NOT NULL,
+                status TEXT NOT NULL,
+                position REAL NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                message TEXT,
+                folder_files TEXT,
+                total_bytes INTEGER,
+                parent_id INTEGER,
+                part_label TEXT NOT NULL DEFAULT '',
+                priority INTEGER NOT NULL DEFAULT 0,
+                sync INTEGER NOT NULL DEFAULT 0,
+                delete_files TEXT,
+                total_files INTEGER,
+                attempt INTEGER NOT NULL DEFAULT 0,
+                upload_paths TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_position ON jobs(position);
+            CREATE INDEX IF NOT EXISTS idx_jobs_active ON jobs(position)
+                WHERE status IN ('{JOB_QUEUED}', '{JOB_RUNNING}');
+            CREATE INDEX IF NOT EXISTS idx_jobs_paused ON jobs(position) WHERE status = '{JOB_PAUSED}';
+        """)
+        existing_columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for name, definition in ADDED_COLUMNS:
+            if name not in existing_columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+        self._conn.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def max_job_id(self):
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(id) FROM jobs").fetchone()
+        return row[0] or 0
+
+    def add(self, job: UploadJob):
+        """Append ``job`` to the end of the queue (or re-queue it if it already exists)."""
+        now = time.time()
+        folder_files = json.dumps(job.folder_files) if job.folder_files is not None else None
+        delete_files = json.dumps(job.delete_files) if job.delete_files is not None else None
+        upload_paths = json.dumps(job.upload_paths) if job.upload_paths is not None else None
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(position) FROM jobs").fetchone()
+            position = (row[0] or 0) + 1
+            self._conn.execute(
+                "INSERT INTO jobs (id, repository, subfolder, file_paths, status, position, created_at, updated_at, "
+                "folder_files, total_bytes, parent_id, part_label, priority, sync, delete_files, total_files, "
+                "attempt, upload_paths) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET status = excluded.status, position = excluded.position, "
+                "updated_at = excluded.updated_at, message = NULL, attempt = excluded.attempt, "
+                "upload_paths = excluded.upload_paths",
+                (job.id, job.repository, job.subfolder, job.file_paths_display_str, JOB_QUEUED, position, now, now,
+                 folder_files, job.total_bytes, job.parent_id, job.part_label, job.priority, int(job.sync),
+                 delete_files, job.total_files, job.attempt, upload_paths))
+            self._conn.commit()
+
+    def set_status(self, job_id, status, message=None):
+        self._execute("UPDATE jobs SET status = ?, updated_at = ?, message = ? WHERE id = ?",
+                      (status, time.time(), message, job_id))
+
+    def set_priority(self, job_ids, priority):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany("UPDATE jobs SET priority = ?, updated_at = ? WHERE id = ?",
+                                   [(priority, now, job_id) for job_id in job_ids])
+            self._conn.commit()
+
+    def mark_removed(self, job_ids):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                                   [(JOB_REMOVED, now, job_id) for job_id in job_ids])
+            self._conn.commit()
+
+    def save_remaining(self, jobs):
+        """Record the ``attempt`` count and remaining ``upload_paths`` of ``jobs``."""
+        with self._lock:
+            self._save_remaining_locked(jobs)
+            self._conn.commit()
+
+    def requeue_many_before(self, jobs, before_job_id=None):
+        """Mark ``jobs`` queued, in the given order, in front of ``before_job_id`` (or at the end),
+        recording what ``save_remaining`` does in the same transaction."""
+        jobs = list(jobs)
+        if not jobs:
+            return True
+        with self._lock:
+            positions = self._positions_before_locked(before_job_id, len(jobs))
+            if positions is None:
+                return False
+            now = time.time()
+            self._conn.executemany("UPDATE jobs SET status = ?, position = ?, updated_at = ? WHERE id = ?",
+                                   [(JOB_QUEUED, position, now, job.id) for position, job in zip(positions, jobs)])
+            self._save_remaining_locked(jobs)
+            self._conn.commit()
+        return True
+
+    def _save_remaining_locked(self, jobs):
+        self._conn.executemany(
+            "UPDATE jobs SET attempt = ?, upload_paths = ? WHERE id = ?",
+            [(job.attempt, json.dumps(job.upload_paths) if job.upload_paths is not None else None, job.id)
+             for job in jobs])
+
+    def move_before(self, job_id, before_job_id=None):
+        """Move a queued job in front of ``before_job_id``, or to the end if that is None."""
+        return self.move_many_before([job_id], before_job_id)
+
+    def move_many_before(self, job_ids, before_job_id=None):
+        """Move queued jobs, in the given order, in front of ``before_job_id`` (or to the end).
+
+        One transaction however many jobs move; they are spread evenly over the
+        gap in front of ``before_job_id``.
+        """
+        job_ids = list(job_ids)
+        if not job_ids:
+            return True
+        with self._lock:
+            positions = self._positions_before_locked(before_job_id, len(job_ids))
+            if positions is None:
+                return False
+            now = time.time()
+            self._conn.executemany("UPDATE jobs SET position = ?, updated_at = ? WHERE id = ?",
+                                   [(position, now, job_id) for position, job_id in zip(positions, job_ids)])
+            self._conn.commit()
+        return True
+
+    def _positions_before_locked(self, before_job_id, count):
+        if before_job_id is None:
+            base = (self._conn.execute("SELECT MAX(position) FROM jobs").fetchone()[0] or 0) + 1
+            return [base + index for index in range(count)]
+        row = self._conn.execute("SELECT position FROM jobs WHERE id = ?", (before_job_id,)).fetchone()
+        if row is None:
+            return None
+        upper = row[0]
+        # The row below may itself be one of the jobs being moved; the gap is then merely larger than needed.
+        lower_row = self._conn.execute(
+            f"SELECT MAX(position) FROM jobs WHERE position < ? "
+            f"AND status IN ('{JOB_QUEUED}', '{JOB_RUNNING}')", (upper,)).fetchone()
+        lower = lower_row[0] if lower_row[0] is not None else upper - count
+        step = (upper - lower) / (count + 1)
+        if step < MIN_POSITION_GAP:
+            self._renumber_active_locked()
+            return self._positions_before_locked(before_job_id, count)
+        return [lower + step * (index + 1) for index in range(count)]
+
+    def _renumber_active_locked(self):
+        rows = self._conn.execute(
+            f"SELECT id FROM jobs WHERE status IN ('{JOB_QUEUED}', '{JOB_RUNNING}') ORDER BY position").fetchall()
+        base = (self._conn.execute("SELECT MAX(position) FROM jobs").fetchone()[0] or 0) + 1
+        self._conn.executemany("UPDATE jobs SET position = ? WHERE id = ?",
+                               [(base + index, job_id) for index, (job_id,) in enumerate(rows)])
+
+    def load_unfinished(self):
+        """Return queued and interrupted jobs in queue order, marking them all queued, then the paused jobs."""
+        columns = ("id, repository, subfolder, file_paths, folder_files, total_bytes, parent_id, part_label, "
+                   "priority, sync, delete_files, total_files, attempt, upload_paths")
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {columns}, '{JOB_QUEUED}' "
+                f"FROM jobs WHERE status IN ('{JOB_QUEUED}', '{JOB_RUNNING}') ORDER BY position").fetchall()
+            rows += self._conn.execute(
+                f"SELECT {columns}, status FROM jobs WHERE status = '{JOB_PAUSED}' ORDER BY position").fetchall()
+            self._conn.execute(f"UPDATE jobs SET status = ?, updated_at = ? WHERE status = '{JOB_RUNNING}'",
+                               (JOB_QUEUED, time.time()))
+            self._conn.commit()
+        return [UploadJob(id=job_id, repository=repository, subfolder=subfolder, file_paths_display_str=file_paths,
+                          folder_files=json.loads(folder_files) if folder_files is not None else None,
+                          total_bytes=total_bytes, parent_id=parent_id, part_label=part_label, priority=priority,
+                          sync=bool(sync), delete_files=json.loads(delete_files) if delete_files is not None else None,
+                          total_files=total_files, attempt=attempt,
+                          upload_paths=json.loads(upload_paths) if upload_paths is not None else None, status=status)
+                for (job_id, repository, subfolder, file_paths, folder_files, total_bytes, parent_id, part_label,
+                     priority, sync, delete_files, total_files, attempt, upload_paths, status) in rows]
+
+    def count_by_status(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
@@ -0,0 +1,270 @@
+"""Incremental Tk view of the upload queue.
+
+``QueueTreeView`` shows the queue in a ``ttk.Treeview`` whose row ids are
+job ids, so selections survive reordering and rows can be found without
+scanning. ``sync`` takes the current running, scanning, pending and paused
+jobs and patches the tree instead of rebuilding it: the unchanged head and tail of
+the row order are skipped, and in between only rows that were added or
+removed, or that left the longest run of rows still in their old relative
+order, are touched. Only the running and scanning rows are re-rendered
+on every sync, because queued and paused jobs don't change their text while
+they wait. A running job that was asked to stop shows as "Stopping".
+A sync with tens of thousands of queued jobs therefore costs a list
+comparison plus a handful of Tk calls.
+
+Rows are multi-selectable. Dragging selected queued rows onto another row
+calls ``on_move(job_ids, before_job_id)`` (see ``drop_before_job_id``);
+running, scanning and paused rows can't be moved. Nothing here knows about
+the worker pool.
+"""
+import bisect
+import tkinter as tk
+from tkinter import ttk
+
+from upload_engine import UploadJob
+
+# --- Constants ---
+SECTION_RUNNING = "running"
+SECTION_PLANNING = "planning"
+SECTION_PENDING = "pending"
+SECTION_PAUSED = "paused"
+DRAG_THRESHOLD_PIXELS = 5
+
+
+def longest_ordered_subset(ids, old_index):
+    """The ids (those in ``old_index``) forming the longest run that keeps its old relative order."""
+    tail_positions = []  # old index at the end of the best run of each length
+    tail_ids = []
+    previous = {}
+    for job_id in ids:
+        position = old_index.get(job_id)
+        if position is None:
+            continue
+        length = bisect.bisect_left(tail_positions, position)
+        previous[job_id] = tail_ids[length - 1] if length else None
+        if length == len(tail_positions):
+            tail_positions.append(position)
+            tail_ids.append(job_id)
+        else:
+            tail_positions[length] = position
+            tail_ids[length] = job_id
+    keep = set()
+    job_id = tail_ids[-1] if tail_ids else None
+    while job_id is not None:
+        keep.add(job_id)
+        job_id = previous[job_id]
+    return keep
+
+
+def drop_before_job_id(order, section_of, moving, target_job_id):
+    """Where queued rows ``moving`` dropped on the row of ``target_job_id`` go, as a ``before_job_id``.
+
+    ``order`` is every row's job id, top to bottom, and ``section_of(job_id)``
+    the row's section. Rows dropped on a queued row lower down than the
+    first moving row land after it, otherwise in front of it. Dropped above
+    the queued rows they go to the front; dropped on a paused row, below the
+    last row (``target_job_id`` None) or after the last queued row they go
+    to the end of the queue (None).
+    """
+    if target_job_id is None:
+        return None
+    section = section_of(target_job_id)
+    if section in (SECTION_RUNNING, SECTION_PLANNING):
+        return next((job_id for job_id in order if section_of(job_id) == SECTION_PENDING), None)
+    if section != SECTION_PENDING:
+        return None
+    target_index = order.index(target_job_id)
+    if target_index <= order.index(moving[0]):
+        return target_job_id
+    next_job_id = order[target_index + 1] if target_index + 1 < len(order) else None
+    return next_job_id if next_job_id is not None and section_of(next_job_id) == SECTION_PENDING else None
+
+
+class QueueTreeView:
+    """A ``ttk.Treeview`` of the queue that is patched row by row."""
+
+    def __init__(self, parent, height=6, on_select=None, on_move=None):
+        self.on_select = on_select
+        self.on_move = on_move
+        self.tree = ttk.Treeview(parent, columns=("state", "job"), show="headings", height=height,
+                                 selectmode="extended")
+        self.tree.heading("state", text="State", anchor=tk.W)
+        self.tree.heading("job", text="Job", anchor=tk.W)
+        self.tree.column("state", width=110, stretch=False, anchor=tk.W)
+        self.tree.column("job", width=480, stretch=True, anchor=tk.W)
+        self.tree.tag_configure(SECTION_RUNNING, foreground="blue")
+        self.tree.tag_configure(SECTION_PLANNING, foreground="grey")
+        self.tree.tag_configure(SECTION_PAUSED, foreground="darkorange")
+        self.tree.bind("<<TreeviewSelect>>", lambda e: self.on_select and self.on_select())
+        self.tree.bind("<ButtonPress-1>", self._on_drag_start, add=True)
+        self.tree.bind("<B1-Motion>", self._on_drag_motion, add=True)
+        self.tree.bind("<ButtonRelease-1>", self._on_drag_release, add=True)
+
+        self._order = []  # job ids in row order
+        self._rows = {}  # job id -> (section, values) currently shown
+        self._drag_start_y = None
+        self._dragging = False
+
+    # --- Rendering ---
+    @staticmethod
+    def _row_values(job: UploadJob, section):
+        if section == SECTION_RUNNING:
+            state = "Stopping" if job.stop_requested else f"Running {job.progress:.0f}%"
+        elif section == SECTION_PLANNING:
+            state = "Scanning"
+        elif section == SECTION_PAUSED:
+            state = "Paused"
+        elif job.attempt:
+            state = f"Retry {job.attempt}"
+        else:
+            state = "Queued"
+        return (state, str(job))
+
+    def sync(self, running, planning, pending, paused=()):
+        """Make the rows match these jobs, in this order, touching only what changed."""
+        sections = [(SECTION_RUNNING, running), (SECTION_PLANNING, planning), (SECTION_PENDING, pending),
+                    (SECTION_PAUSED, paused)]
+        new_order = [job.id for _section, jobs in sections for job in jobs]
+        if new_order != self._order:
+            self._reorder(new_order, {job.id: (section, job) for section, jobs in sections for job in jobs})
+        for section, jobs in sections[:2]:
+            for job in jobs:
+                self._set_row(job, section)
+
+    def _reorder(self, new_order, jobs_by_id):
+        old_order = self._order
+        prefix = 0
+        limit = min(len(old_order), len(new_order))
+        while prefix < limit and old_order[prefix] == new_order[prefix]:
+            prefix += 1
+        suffix = 0
+        while (suffix < limit - prefix
+               and old_order[len(old_order) - 1 - suffix] == new_order[len(new_order) - 1 - suffix]):
+            suffix += 1
+
+        old_middle = old_order[prefix:len(old_order) - suffix]
+        new_middle = new_order[prefix:len(new_order) - suffix]
+        wanted = set(new_middle)
+        gone = [job_id for job_id in old_middle if job_id not in wanted]
+        if gone:
+            self.tree.delete(*[str(job_id) for job_id in gone])
+            for job_id in gone:
+                del self._rows[job_id]
+        staying = longest_ordered_subset(
+            new_middle, {job_id: position for position, job_id in enumerate(old_middle) if job_id in wanted})
+
+        # Rows that stay keep their relative order; every other row is placed right after its
+        # predecessor in the new order. A moved row is detached first, so the index it is moved to
+        # never counts the row itself. ``index`` stays valid across new rows only.
+        index = prefix
+        previous_iid = None
+        for job_id in new_middle:
+            section, job = jobs_by_id[job_id]
+            iid = str(job_id)
+            if job_id in staying:
+                if self._rows[job_id][0] != section:
+                    self._set_row(job, section)
+                index, previous_iid = None, iid
+                continue
+            if job_id in self._rows:
+                self.tree.detach(iid)
+                index = self.tree.index(previous_iid) + 1 if previous_iid is not None else prefix
+                self.tree.move(iid, "", index)
+                if self._rows[job_id][0] != section:
+                    self._set_row(job, section)
+            else:
+                if index is None:
+                    index = self.tree.index(previous_iid) + 1
+                values = self._row_values(job, section)
+                self.tree.insert("", index, iid=iid, values=values, tags=(section,))
+                self._rows[job_id] = (section, values)
+            index += 1
+            previous_iid = iid
+        self._order = new_order
+
+    def move_rows(self, job_ids, before_job_id=None):
+        """Mirror a reorder the caller just made, so the next ``sync`` has nothing left to do."""
+        moving = [job_id for job_id in job_ids if job_id in self._rows]
+        moving_set = set(moving)
+        if before_job_id in moving_set:
+            following = self._order[self._order.index(before_job_id):]
+            before_job_id = next((job_id for job_id in following if job_id not in moving_set), None)
+        order = [job_id for job_id in self._order if job_id not in moving_set]
+        if before_job_id in self._rows:
+            index = order.index(before_job_id)
+        else:  # the end of the queued rows, above any paused ones
+            index = len(order)
+            while index and self._rows[order[index - 1]][0] == SECTION_PAUSED:
+                index -= 1
+        order[index:index] = moving
+        self.tree.detach(*[str(job_id) for job_id in moving])
+        for offset, job_id in enumerate(moving):
+            self.tree.move(str(job_id), "", index + offset)
+        self._order = order
+
+    def remove_rows(self, job_ids):
+        """Drop rows the caller just removed from the queue."""
+        gone = [job_id for job_id in job_ids if job_id in self._rows]
+        if not gone:
+            return
+        self.tree.delete(*[str(job_id) for job_id in gone])
+        for job_id in gone:
+            del self._rows[job_id]
+        gone_set = set(gone)
+        self._order = [job_id for job_id in self._order if job_id not in gone_set]
+
+    def _set_row(self, job: UploadJob, section):
+        values = self._row_values(job, section)
+        if self._rows.get(job.id) != (section, values):
+            self.tree.item(str(job.id), values=values, tags=(section,))
+            self._rows[job.id] = (section, values)
+
+    def refresh_rows(self, jobs, section=SECTION_RUNNING):
+        """Re-render just these rows, e.g. running jobs after a progress update."""
+        for job in jobs:
+            if job.id in self._rows:
+                self._set_row(job, section)
+
+    # --- Selection ---
+    def selected_ids(self):
+        """Selected job ids in row order."""
+        return [int(iid) for iid in self.tree.selection()]
+
+    def selected_pending_ids(self):
+        return self.selected_ids_in(SECTION_PENDING)
+
+    def selected_ids_in(self, *sections):
+        """Selected job ids in row order whose rows are in one of ``sections``."""
+        return [job_id for job_id in self.selected_ids() if self.section_of(job_id) in sections]
+
+    def section_of(self, job_id):
+        row = self._rows.get(job_id)
+        return row[0] if row else None
+
+    def __len__(self):
+        return len(self._order)
+
+    # --- Drag to reorder ---
+    def _on_drag_start(self, event):
+        self._drag_start_y = event.y
+        self._dragging = False
+
+    def _on_drag_motion(self, event):
+        if self._drag_start_y is None or abs(event.y - self._drag_start_y) < DRAG_THRESHOLD_PIXELS:
+            return None
+        self._dragging = True
+        self.tree.configure(cursor="sb_v_double_arrow")
+        return "break"  # keep the selection while dragging instead of extending it
+
+    def _on_drag_release(self, event):
+        dragging, self._dragging, self._drag_start_y = self._dragging, False, None
+        if not dragging:
+            return None
+        self.tree.configure(cursor="")
+        moving = self.selected_pending_ids()
+        target = self.tree.identify_row(event.y)
+        if not moving or not self.on_move:
+            return "break"
+        self.on_move(moving, drop_before_job_id(self._order, self.section_of, moving,
+                                                int(target) if target else None))
+        return "break"
@@ -0,0 +1,96 @@
+"""Retry policy for failed upload jobs.
+
+``classify_failure`` sorts a failed job's message (backend output or
+exception text) into retryable and fatal failures: rate limiting (HTTP 429),
+server errors (5xx) and network trouble are retryable; authentication,
+missing repositories, bad input and anything unrecognised are fatal.
+
+``RetryPolicy.retry_delay`` turns a retryable failure into a delay using
+exponential backoff with "equal jitter" (half the capped backoff, plus a
+random share of the other half), honouring the Hub's "Retry after N seconds"
+hint when the message carries one. ``UploadWorkerPool`` holds the job back
+for that long without occupying a worker, so the rest of the queue keeps
+draining.
+"""
+import random
+import re
+from dataclasses import dataclass
+
+from upload_engine import UploadJob
+
+# --- Constants ---
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 2.0  # seconds before the first retry, doubled on each attempt
+DEFAULT_MAX_DELAY = 300.0
+
+RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# "429 Client Error", "503 Server Error: ...", "Server error '502 Bad Gateway'", "HTTP Error 500 thrown ..."
+STATUS_CODE_REGEX = re.compile(
+    r"\b([1-5]\d\d)(?= (?:Client|Server) Error| Too Many Requests| Service Unavailable| Bad Gateway"
+    r"| Gateway Time-?out| Internal Server Error| Request Timeout| Unauthorized| Forbidden| Not Found)"
+    r"|\b(?:HTTP Error|status code:?|status:) ?([1-5]\d\d)\b", re.IGNORECASE)
+RETRY_AFTER_REGEX = re.compile(r"retry after (\d+(?:\.\d+)?) ?s", re.IGNORECASE)
+FATAL_REGEX = re.compile(
+    r"not found\. check your path|local path not found|no files specified|could not read local files"
+    r"|could not scan folder|repository not found|revision not found|invalid (?:user )?token"
+    r"|unauthorized|permission denied|no such file or directory", re.IGNORECASE)
+RETRYABLE_REGEX = re.compile(
+    r"too many requests|rate limit|timed? ?out|temporarily unavailable|temporary failure in name resolution"
+    r"|connection (?:reset|aborted|refused|error)|remote ?(?:end closed|disconnected|protocol ?error)"
+    r"|broken pipe|network is unreachable|bad gateway|service unavailable|gateway time-?out"
+    r"|internal server error|incomplete ?read|ssl ?(?:error|eof)|protocol error", re.IGNORECASE)
+
+
+def extract_status_codes(message):
+    """HTTP status codes mentioned in an error message, in order."""
+    return [int(first or second) for first, second in STATUS_CODE_REGEX.findall(message or "")]
+
+
+def classify_failure(message):
+    """Return ``(retryable, reason)`` for a failed job's message."""
+    message = message or ""
+    status_codes = extract_status_codes(message)
+    fatal_codes = [code for code in status_codes if 400 <= code < 500 and code not in RETRYABLE_STATUS_CODES]
+    if fatal_codes:
+        return False, f"HTTP {fatal_codes[0]}"
+    if FATAL_REGEX.search(message):
+        return False, FATAL_REGEX.search(message).group(0)
+    retryable_codes = [code for code in status_codes if code in RETRYABLE_STATUS_CODES]
+    if retryable_codes:
+        return True, f"HTTP {retryable_codes[0]}"
+    match = RETRYABLE_REGEX.search(message)
+    if match:
+        return True, match.group(0)
+    return False, "unrecognised error"
+
+
+def retry_after_seconds(message):
+    """The server's "Retry after N seconds" hint in ``message``, or None."""
+    match = RETRY_AFTER_REGEX.search(message or "")
+    return float(match.group(1)) if match else None
+
+
+@dataclass
+class RetryPolicy:
+    max_retries: int = DEFAULT_MAX_RETRIES
+    base_delay: float = DEFAULT_BASE_DELAY
+    max_delay: float = DEFAULT_MAX_DELAY
+
+    def backoff(self, attempt):
+        """Jittered delay before retry number ``attempt + 1``."""
+        capped = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return capped / 2 + random.uniform(0, capped / 2)
+
+    def retry_delay(self, job: UploadJob, message):
+        """Seconds to wait before retrying ``job``, or None if it should fail now."""
+        if job.attempt >= self.max_retries:
+            return None
+        retryable, _reason = classify_failure(message)
+        if not retryable:
+            return None
+        delay = self.backoff(job.attempt)
+        hinted = retry_after_seconds(message)
+        if hinted is not None:
+            delay = max(delay, min(hinted, self.max_delay))
+        return delay
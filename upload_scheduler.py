@@ -0,0 +1,133 @@
+"""Scheduling policies for the upload queue.
+
+``UploadWorkerPool`` asks its policy which pending job to start whenever a
+worker is free. A policy sees the pending jobs in queue order together with
+a ``runnable(job)`` test (per-repository limit, retry back-off) and returns
+the job to start, or None. Policies can be swapped at any time with
+``UploadWorkerPool.set_policy``; the next free worker uses the new one.
+
+* ``fifo``: queue order, as arranged in the queue list.
+* ``priority``: highest ``UploadJob.priority`` first, queue order among equals.
+* ``fair-share``: repositories take turns. Each repository accumulates
+  "service" as its jobs start, 1/weight per job, and the repository with the
+  least service goes next, so with equal weights this is round-robin and a
+  repository with weight 2 starts twice as many jobs. A repository that
+  reappears after being idle joins at the current level instead of
+  catching up on the turns it missed.
+* ``shortest-first``: fewest bytes first (``UploadJob.total_bytes``); jobs
+  whose size isn't known yet go after all sized ones, in queue order.
+
+Each decision is a single pass over the pending jobs.
+"""
+from upload_engine import UploadJob
+
+# --- Constants ---
+POLICY_FIFO = "fifo"
+POLICY_PRIORITY = "priority"
+POLICY_FAIR_SHARE = "fair-share"
+POLICY_SHORTEST_FIRST = "shortest-first"
+POLICY_NAMES = (POLICY_FIFO, POLICY_PRIORITY, POLICY_FAIR_SHARE, POLICY_SHORTEST_FIRST)
+DEFAULT_POLICY = POLICY_FIFO
+
+
+def parse_repo_weights(text):
+    """Parse ``"user/model=3 org/data=0.5"`` into ``{repository: weight}``."""
+    weights = {}
+    for part in text.replace(",", " ").split():
+        repository, separator, weight = part.rpartition("=")
+        if not separator or not repository:
+            raise ValueError(f"Invalid repository weight {part!r}: expected REPO=WEIGHT")
+        try:
+            weights[repository] = float(weight)
+        except ValueError:
+            raise ValueError(f"Invalid repository weight {part!r}: {weight!r} is not a number") from None
+        if weights[repository] <= 0:
+            raise ValueError(f"Invalid repository weight {part!r}: weights must be positive")
+    return weights
+
+
+def format_repo_weights(weights):
+    return " ".join(f"{repository}={weight:g}" for repository, weight in weights.items())
+
+
+class FifoPolicy:
+    name = POLICY_FIFO
+
+    def select(self, jobs, runnable):
+        return next((job for job in jobs if runnable(job)), None)
+
+    def job_started(self, job: UploadJob):
+        pass
+
+
+class PriorityPolicy(FifoPolicy):
+    name = POLICY_PRIORITY
+
+    def select(self, jobs, runnable):
+        best = None
+        for job in jobs:
+            if (best is None or job.priority > best.priority) and runnable(job):
+                best = job
+        return best
+
+
+class FairSharePolicy(FifoPolicy):
+    name = POLICY_FAIR_SHARE
+
+    def __init__(self, weights=None):
+        self.weights = dict(weights or {})
+        self._service = {}  # repository -> service received so far
+        self._level = 0.0  # service of the repository that went last
+
+    def set_weights(self, weights):
+        self.weights = dict(weights)
+
+    def _service_of(self, repository):
+        return max(self._service.get(repository, 0.0), self._level)
+
+    def select(self, jobs, runnable):
+        best = None
+        best_service = None
+        seen = set()
+        for job in jobs:
+            if job.repository in seen:
+                continue  # only the first runnable job of each repository competes
+            if not runnable(job):
+                continue
+            seen.add(job.repository)
+            service = self._service_of(job.repository)
+            if best is None or service < best_service:
+                best, best_service = job, service
+        return best
+
+    def job_started(self, job: UploadJob):
+        service = self._service_of(job.repository)
+        self._level = service
+        self._service[job.repository] = service + 1.0 / self.weights.get(job.repository, 1.0)
+
+
+class ShortestFirstPolicy(FifoPolicy):
+    name = POLICY_SHORTEST_FIRST
+
+    def select(self, jobs, runnable):
+        best = None
+        for job in jobs:
+            if job.total_bytes is None:
+                if best is None and runnable(job):
+                    best = job
+            elif (best is None or best.total_bytes is None or job.total_bytes < best.total_bytes) and runnable(job):
+                best = job
+        return best
+
+
+def create_policy(name, repo_weights=None):
+    """Build a policy by name. Raises ValueError for an unknown name."""
+    if name == POLICY_FIFO:
+        return FifoPolicy()
+    if name == POLICY_PRIORITY:
+        return PriorityPolicy()
+    if name == POLICY_FAIR_SHARE:
+        return FairSharePolicy(repo_weights)
+    if name == POLICY_SHORTEST_FIRST:
+        return ShortestFirstPolicy()
+    raise ValueError(f"Unknown scheduling policy {name!r}; choose one of {', '.join(POLICY_NAMES)}")
@@ -0,0 +1,220 @@
+"""Incremental folder sync against a local manifest index.
+
+A sync job uploads a single folder like any folder job, but only the files
+that were added or modified since the last successful sync of that folder to
+the same place in the same repository, and can delete the files that were
+removed locally. ``SyncManifest`` keeps the index in SQLite: one row per
+``(repository, target, path)`` with the size, mtime and SHA-256 the file had
+when it was uploaded. ``target`` is where the folder lands in the repo (the
+job's subfolder plus the folder's name, see ``sync_target``).
+
+``SyncManifest.diff`` walks the folder with ``upload_planner.scan_folder``
+and compares size and mtime against the index, so only files whose stat
+changed are hashed (on a thread pool). A file whose hash still matches was
+merely touched; its new mtime is written straight to the index and it is not
+uploaded. Indexed files that are gone from disk, and that the job's
+include/exclude globs still cover, are reported as deleted. Re-syncing an
+unchanged tree therefore costs one directory walk and one indexed query.
+
+Deleted paths are spread over the sync job's parts by ``batch_deletions``,
+at most one batch worth of paths (and ``DELETE_BATCH_MAX_CHARS`` characters)
+per part, so no single ``huggingface-cli upload --delete`` gets an unbounded
+list of patterns to match against every file in the repository.
+
+The index only ever describes what is on the Hub. ``stage`` parks the rows a
+job will write under its job id (in the same database, so a restored job
+still updates the index when it finishes) and ``commit_staged`` applies them
+once the job succeeded; ``discard_staged`` drops them when it fails or is
+removed, and the next sync sends those files again.
+"""
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from upload_cache import HASH_WORKERS, sha256_file
+from upload_engine import UploadJob, compute_path_in_repo, format_bytes
+from upload_planner import compile_globs, scan_folder
+
+# --- Constants ---
+SYNC_MANIFEST_FILE = "upload_sync_manifest.sqlite3"
+SQL_CHUNK_SIZE = 500
+DELETE_BATCH_MAX_CHARS = 16 * 1024  # keeps a --delete command line well under Windows' 32K limit
+
+SyncEntry = namedtuple("SyncEntry", ["relative_path", "size", "mtime_ns", "sha256"])
+
+
+@dataclass
+class SyncDiff:
+    """A folder compared with its index. ``added``/``modified``/``touched`` hold ``SyncEntry`` tuples."""
+    added: list = field(default_factory=list)
+    modified: list = field(default_factory=list)
+    deleted: list = field(default_factory=list)  # relative paths
+    touched: list = field(default_factory=list)  # same content, new mtime
+    unchanged: int = 0  # includes the touched files
+    hashed: int = 0
+
+    @property
+    def changed(self):
+        return self.added + self.modified
+
+    @property
+    def bytes_to_send(self):
+        return sum(entry.size for entry in self.added) + sum(entry.size for entry in self.modified)
+
+    def summary(self):
+        return (f"{len(self.added)} added, {len(self.modified)} modified, {len(self.deleted)} deleted, "
+                f"{self.unchanged} unchanged")
+
+
+def batch_deletions(deleted, max_paths, max_chars=DELETE_BATCH_MAX_CHARS):
+    """Split deleted relative paths into lists of at most ``max_paths`` paths and about ``max_chars`` characters."""
+    batches = []
+    batch = []
+    batch_chars = 0
+    for path in deleted:
+        if batch and (len(batch) >= max_paths or batch_chars + len(path) + 1 > max_chars):
+            batches.append(batch)
+            batch = []
+            batch_chars = 0
+        batch.append(path)
+        batch_chars += len(path) + 1
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def sync_target(job: UploadJob):
+    """Where a single-folder job's folder lands in the repo."""
+    return compute_path_in_repo(job.local_paths(), job.subfolder)
+
+
+class SyncManifest:
+    """SQLite index of the files each sync target had on the Hub after its last sync."""
+
+    def __init__(self, db_path=SYNC_MANIFEST_FILE, hash_workers=HASH_WORKERS):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS synced_files (
+                repository TEXT NOT NULL,
+                target TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                PRIMARY KEY (repository, target, path)
+            ) WITHOUT ROWID;
+            -- sha256 IS NULL marks a path the job deletes.
+            CREATE TABLE IF NOT EXISTS staged_files (
+                job_id INTEGER NOT NULL,
+                repository TEXT NOT NULL,
+                target TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER,
+                mtime_ns INTEGER,
+                sha256 TEXT,
+                PRIMARY KEY (job_id, path)
+            );
+        """)
+        self._conn.commit()
+        self._executor = ThreadPoolExecutor(max_workers=hash_workers, thread_name_prefix="sync-hash")
+
+    def load(self, repository, target):
+        """Return ``{path: (size, mtime_ns, sha256)}`` for one sync target."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size, mtime_ns, sha256 FROM synced_files WHERE repository = ? AND target = ?",
+                (repository, target)).fetchall()
+        return {path: (size, mtime_ns, sha256) for path, size, mtime_ns, sha256 in rows}
+
+    def diff(self, job: UploadJob, on_status=None):
+        """Compare a single-folder job's folder with its index. Raises OSError if it can't be read."""
+        folder = job.local_paths()[0]
+        previous = self.load(job.repository, sync_target(job))
+        scanned_files = scan_folder(folder, job.include_globs, job.exclude_globs)
+
+        result = SyncDiff()
+        to_hash = []
+        for scanned in scanned_files:
+            entry = previous.get(scanned.relative_path)
+            if entry is not None and entry[0] == scanned.size and entry[1] == scanned.mtime_ns:
+                result.unchanged += 1
+            else:
+                to_hash.append(scanned)
+        if to_hash and on_status:
+            on_status(job, f"Job ID:{job.id} Hashing {len(to_hash)} new or changed file(s), "
+                           f"{format_bytes(sum(f.size for f in to_hash))}...")
+        digests = self._executor.map(lambda f: sha256_file(os.path.join(folder, f.relative_path)), to_hash)
+        for scanned, digest in zip(to_hash, digests):
+            synced = SyncEntry(scanned.relative_path, scanned.size, scanned.mtime_ns, digest)
+            entry = previous.get(scanned.relative_path)
+            if entry is None:
+                result.added.append(synced)
+            elif entry[0] == scanned.size and entry[2] == digest:
+                result.touched.append(synced)
+                result.unchanged += 1
+            else:
+                result.modified.append(synced)
+        result.hashed = len(to_hash)
+
+        if len(previous) > len(scanned_files) - len(result.added):
+            # Some indexed paths weren't seen; only those the globs still cover count as deleted.
+            include_regex = compile_globs(job.include_globs)
+            exclude_regex = compile_globs(job.exclude_globs)
+            seen = {scanned.relative_path for scanned in scanned_files}
+            result.deleted = sorted(path for path in previous
+                                    if path not in seen
+                                    and (include_regex is None or include_regex.match(path))
+                                    and not (exclude_regex and exclude_regex.match(path)))
+        return result
+
+    def record(self, repository, target, entries):
+        """Write ``entries`` to the index right away (e.g. touched files, already on the Hub)."""
+        rows = [(repository, target, *entry) for entry in entries]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO synced_files VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def stage(self, job_id, repository, target, entries=(), deleted=()):
+        """Park the index rows ``job_id`` will write: uploaded ``entries`` and ``deleted`` paths."""
+        rows = [(job_id, repository, target, *entry) for entry in entries]
+        rows.extend((job_id, repository, target, path, None, None, None) for path in deleted)
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO staged_files VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def commit_staged(self, job_id):
+        """Apply what ``job_id`` staged, in one transaction. Returns the number of rows applied."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO synced_files "
+                "SELECT repository, target, path, size, mtime_ns, sha256 FROM staged_files "
+                "WHERE job_id = ? AND sha256 IS NOT NULL", (job_id,))
+            self._conn.execute(
+                "DELETE FROM synced_files WHERE EXISTS (SELECT 1 FROM staged_files s WHERE s.job_id = ? "
+                "AND s.sha256 IS NULL AND s.repository = synced_files.repository "
+                "AND s.target = synced_files.target AND s.path = synced_files.path)", (job_id,))
+            applied = self._conn.execute("DELETE FROM staged_files WHERE job_id = ?", (job_id,)).rowcount
+            self._conn.commit()
+        return applied
+
+    def discard_staged(self, job_ids):
+        job_ids = list(job_ids)
+        with self._lock:
+            for start in range(0, len(job_ids), SQL_CHUNK_SIZE):
+                chunk = job_ids[start:start + SQL_CHUNK_SIZE]
+                self._conn.execute(f"DELETE FROM staged_files WHERE job_id IN ({','.join('?' * len(chunk))})",
+                                   chunk)
+            self._conn.commit()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            self._conn.close()